@@ -0,0 +1,141 @@
+import os
+import csv
+import time
+import uuid
+import random
+import bisect
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from cache_service.codecs import get_codec
+
+# --------------------------------------------------------------------------
+# Configuración del Benchmark
+# --------------------------------------------------------------------------
+
+BENCH_EVENTS = int(os.getenv('BENCH_EVENTS', '2000'))
+BENCH_KEYSPACE = int(os.getenv('BENCH_KEYSPACE', '50000'))
+BENCH_REQUESTS = int(os.getenv('BENCH_REQUESTS', '200000'))
+BENCH_ZIPF_S = float(os.getenv('BENCH_ZIPF_S', '0.9'))
+# Mismo presupuesto que el maxmemory de docker-compose
+BENCH_MEMORY_BYTES = int(os.getenv('BENCH_MEMORY_BYTES', str(2 * 1024 * 1024)))
+# Costo aproximado de Redis por llave (dictEntry, robj, sds y expiración)
+REDIS_KEY_OVERHEAD = int(os.getenv('REDIS_KEY_OVERHEAD', '72'))
+RESULTS_FILE = "results/codec_benchmark.csv"
+
+CONFIGS = [
+    ('json', 'none'),
+    ('msgpack', 'none'),
+    ('msgpack', 'zlib'),
+    ('struct', 'none'),
+    ('struct', 'zlib'),
+    ('struct', 'lz4'),
+]
+
+# --------------------------------------------------------------------------
+# Benchmark de Codecs: tamaño, costo y tasa de aciertos
+# --------------------------------------------------------------------------
+
+
+def build_synthetic_events(n, rng=random):
+    """
+    Eventos con la misma forma que devuelve get_events_by_uuids. Con un
+    random.Random propio en 'rng' (uuids incluidos) se repiten entre corridas.
+    """
+    base = datetime(2025, 11, 1)
+    streets = ["Av. Libertador Bernardo O'Higgins", "Gran Avenida José Miguel Carrera",
+               "Av. Vicuña Mackenna", "Costanera Norte", None]
+    cities = ["Santiago", "Providencia", "Ñuñoa", "Las Condes", "Maipú", "La Florida"]
+    events = []
+    for _ in range(n):
+        ts = base + timedelta(seconds=rng.randint(0, 30 * 86400),
+                              microseconds=rng.randint(0, 999999))
+        events.append({
+            "uuid": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "timestamp_scraped": ts.isoformat(),
+            "lon": -70.6693 + rng.uniform(-0.3, 0.3),
+            "lat": -33.4489 + rng.uniform(-0.3, 0.3),
+            "type": rng.choice(['JAM', 'ACCIDENT', 'HAZARD', 'ROAD_CLOSED']),
+            "subtype": rng.choice(['JAM_HEAVY_TRAFFIC', 'HAZARD_ON_ROAD_POT_HOLE', None]),
+            "description": rng.choice(["", "Tráfico detenido", None]),
+            "street": rng.choice(streets),
+            "city": rng.choice(cities)
+        })
+    return events
+
+
+def measure_codec(codec, events):
+    """Bytes promedio por llave y µs promedio de encode/decode."""
+    start = time.perf_counter()
+    encoded = [codec.encode(event) for event in events]
+    encode_us = (time.perf_counter() - start) * 1e6 / len(events)
+
+    start = time.perf_counter()
+    for data in encoded:
+        codec.decode(data)
+    decode_us = (time.perf_counter() - start) * 1e6 / len(events)
+
+    value_bytes = sum(len(data) for data in encoded) / len(encoded)
+    key_bytes = sum(len(codec.key(event["uuid"])) for event in events) / len(events)
+    return value_bytes, key_bytes, encode_us, decode_us
+
+
+def zipf_trace(keyspace, requests, s):
+    """Traza de accesos Zipf(s) sobre 'keyspace' llaves (reproducible)."""
+    rng = random.Random(42)
+    cumulative = []
+    total = 0.0
+    for rank in range(1, keyspace + 1):
+        total += 1.0 / rank ** s
+        cumulative.append(total)
+    return [bisect.bisect_left(cumulative, rng.random() * total) for _ in range(requests)]
+
+
+def lru_hit_rate(trace, capacity):
+    """Aproxima la política de Redis con un LRU exacto de 'capacity' llaves."""
+    cache = OrderedDict()
+    hits = 0
+    for key in trace:
+        if key in cache:
+            hits += 1
+            cache.move_to_end(key)
+            continue
+        cache[key] = None
+        if len(cache) > capacity:
+            cache.popitem(last=False)
+    return hits / len(trace) * 100
+
+
+def run_benchmark():
+    """Compara los codecs por tamaño, costo de CPU y aciertos con memoria fija."""
+    print("--- BENCHMARK DE CODECS DE CACHÉ ---")
+    events = build_synthetic_events(BENCH_EVENTS)
+    trace = zipf_trace(BENCH_KEYSPACE, BENCH_REQUESTS, BENCH_ZIPF_S)
+
+    os.makedirs("results", exist_ok=True)
+    with open(RESULTS_FILE, mode='w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["codec", "compression", "value_bytes", "bytes_per_key",
+                         "encode_us", "decode_us", "keys_in_budget", "hit_rate"])
+        for name, compression in CONFIGS:
+            try:
+                codec = get_codec(name, compression)
+            except ValueError as e:
+                print(f"{name:>8}/{compression:<5} omitido: {e}")
+                continue
+            value_bytes, key_bytes, encode_us, decode_us = measure_codec(codec, events)
+            bytes_per_key = value_bytes + key_bytes + REDIS_KEY_OVERHEAD
+            capacity = int(BENCH_MEMORY_BYTES // bytes_per_key)
+            hit_rate = lru_hit_rate(trace, capacity)
+
+            writer.writerow([name, compression, round(value_bytes, 1), round(bytes_per_key, 1),
+                             round(encode_us, 2), round(decode_us, 2), capacity,
+                             round(hit_rate, 2)])
+            print(f"{name:>8}/{compression:<5} {bytes_per_key:7.1f} B/llave | "
+                  f"enc {encode_us:6.2f} µs | dec {decode_us:6.2f} µs | "
+                  f"{capacity:>6} llaves -> hit rate {hit_rate:.1f}%")
+
+    print(f"Resultados exportados a: {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
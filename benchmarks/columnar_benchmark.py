@@ -0,0 +1,102 @@
+import io
+import os
+import csv
+import sys
+import time
+import random
+from datetime import datetime
+from benchmarks.pipeline_benchmark import install_standins, build_raw_rows, BENCH_SEED
+
+# --------------------------------------------------------------------------
+# Configuración de la Comparación de Motores del ETL
+# --------------------------------------------------------------------------
+# Ejecuta el motor por filas y el columnar sobre las mismas filas crudas,
+# verifica que el CSV y las geo_temp_key resultantes sean idénticos byte a
+# byte y reporta filas/s de cada uno en results/columnar_benchmark.csv.
+#   python -m benchmarks.columnar_benchmark
+
+COLUMNAR_BENCH_SIZES = [int(n) for n in os.getenv('COLUMNAR_BENCH_SIZES', '10000,100000,1000000').split(',')]
+COLUMNAR_BENCH_REPEAT = int(os.getenv('COLUMNAR_BENCH_REPEAT', '3'))
+RESULTS_FILE = "results/columnar_benchmark.csv"
+
+# Casos límite de redondeo, fechas y textos que ambos motores deben tratar igual
+EDGE_ROWS = [
+    ("edge-tie", datetime(2025, 11, 2, 8), 2.675, 0.0005, 'ACCIDENT', None, '', ' Calle ', '  maipú '),
+    ("edge-negzero", datetime(2025, 11, 2, 9), -0.0004, -0.0004, 'jam', '', '', None, None),
+    ("edge-zero", datetime(2025, 11, 2, 9), 0.0, 0.0, 'JAM', 'X', '', '', ''),
+    ("edge-nodate", None, -70.6, -33.4, 'HAZARD', None, '', 'Av', 'Santiago'),
+    ("edge-nan", datetime(2025, 11, 3), float('nan'), -33.4, 'POLICE', None, '', 'Av', 'Santiago'),
+    ("edge-old", datetime(1950, 1, 1), -70.6, -33.4, 'weatherhazard', None, '', 'Av', 'Straße'),
+    ("edge-type", datetime(2025, 11, 3), -70.6, -33.4, '', None, '', 'Av', 'Santiago'),
+]
+
+
+def run_engine(engine, rows):
+    """(segundos, csv, llaves) del ETL completo sobre 'rows' con el motor dado."""
+    from etl import columnar
+    from etl.homogenizer import transform_events, dedupe_by_key, TYPE_MAPPING
+
+    out, keys_out = io.StringIO(), io.StringIO()
+    writer = csv.writer(out, delimiter=',')
+    counters = {"raw": 0}
+    start = time.perf_counter()
+    if engine == 'columnar':
+        size = columnar.ETL_COLUMNAR_BATCH
+        batches = (rows[i:i + size] for i in range(0, len(rows), size))
+        for keys, csv_rows in columnar.homogenize_batches(batches, counters, TYPE_MAPPING):
+            writer.writerows(csv_rows)
+            keys_out.writelines(key + '\n' for key in keys)
+    else:
+        for geo_temp_key, csv_row in dedupe_by_key(transform_events(rows, counters)):
+            writer.writerow(csv_row)
+            keys_out.write(geo_temp_key + '\n')
+    return time.perf_counter() - start, out.getvalue(), keys_out.getvalue()
+
+
+def compare_engines(sizes=COLUMNAR_BENCH_SIZES, repeat=COLUMNAR_BENCH_REPEAT):
+    from etl import columnar
+    if not columnar.available():
+        print("El motor columnar requiere numpy (pip install -r requirements.txt)")
+        return None
+
+    results = []
+    for n in sizes:
+        rows = build_raw_rows(n, random.Random(f"{BENCH_SEED}:columnar:{n}")) + EDGE_ROWS
+        best = {}
+        outputs = {}
+        for engine in ('rows', 'columnar'):
+            timings = []
+            for _ in range(repeat):
+                elapsed, csv_text, keys_text = run_engine(engine, rows)
+                timings.append(elapsed)
+            best[engine] = min(timings)
+            outputs[engine] = (csv_text, keys_text)
+
+        identical = outputs['rows'] == outputs['columnar']
+        row = {"raw_rows": len(rows),
+               "output_rows": outputs['rows'][0].count('\n'),
+               "rows_per_sec_rows": round(len(rows) / best['rows'], 1),
+               "rows_per_sec_columnar": round(len(rows) / best['columnar'], 1),
+               "speedup": round(best['rows'] / best['columnar'], 2),
+               "identical": identical}
+        results.append(row)
+        print(f"{len(rows):>9} filas: por filas {row['rows_per_sec_rows']:>12,.0f} filas/s | "
+              f"columnar {row['rows_per_sec_columnar']:>12,.0f} filas/s | x{row['speedup']:.2f} | "
+              f"{'salida idéntica' if identical else 'SALIDA DISTINTA'}")
+
+    os.makedirs("results", exist_ok=True)
+    with open(RESULTS_FILE, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+    print(f"Resultados exportados a: {RESULTS_FILE}")
+    return results
+
+
+if __name__ == "__main__":
+    install_standins()
+    results = compare_engines()
+    if results is None:
+        sys.exit(1)
+    if not all(r["identical"] for r in results):
+        sys.exit(2)
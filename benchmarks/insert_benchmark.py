@@ -0,0 +1,110 @@
+import os
+import csv
+import time
+import uuid
+import random
+from datetime import datetime
+from storage.db_client import pg_manager
+
+# --------------------------------------------------------------------------
+# Configuración del Benchmark
+# --------------------------------------------------------------------------
+
+BENCH_ROWS = int(os.getenv('BENCH_ROWS', '5000'))
+BENCH_BATCH_SIZE = int(os.getenv('BENCH_BATCH_SIZE', '500'))
+BENCH_PREFIX = "bench-"
+RESULTS_FILE = "results/insert_benchmark.csv"
+
+# --------------------------------------------------------------------------
+# Benchmark de Inserción: fila a fila vs lote (COPY)
+# --------------------------------------------------------------------------
+
+
+def build_synthetic_events(n):
+    """Genera eventos ya procesados con el mismo esquema que process_waze_event."""
+    events = []
+    for _ in range(n):
+        events.append({
+            "event_uuid": str(uuid.uuid4()),
+            "waze_uuid": f"{BENCH_PREFIX}{uuid.uuid4()}",
+            "timestamp_scraped": datetime.utcnow().isoformat() + "Z",
+            "location": {
+                "type": "Point",
+                "coordinates": [-70.6693 + random.uniform(-0.3, 0.3),
+                                -33.4489 + random.uniform(-0.3, 0.3)]
+            },
+            "type": random.choice(['JAM', 'ACCIDENT', 'HAZARD', 'ROAD_CLOSED']),
+            "subtype": "",
+            "description": "Evento sintético de benchmark",
+            "city": "Santiago",
+            "street": "Av. Libertador Bernardo O'Higgins"
+        })
+    return events
+
+
+def cleanup_synthetic_events():
+    """Elimina las filas sintéticas insertadas por el benchmark."""
+    with pg_manager.cursor() as cur:
+        cur.execute("DELETE FROM traffic_events WHERE waze_uuid LIKE %s;",
+                    (f"{BENCH_PREFIX}%",))
+
+
+def bench_per_row(events):
+    """Mide el camino actual: un insert_event (y un round-trip) por evento."""
+    start = time.perf_counter()
+    inserted = 0
+    for event in events:
+        if pg_manager.insert_event(event):
+            inserted += 1
+    return inserted, time.perf_counter() - start
+
+
+def bench_batched(events, batch_size):
+    """Mide insert_events en lotes de tamaño fijo."""
+    start = time.perf_counter()
+    inserted = 0
+    for i in range(0, len(events), batch_size):
+        inserted += pg_manager.insert_events(events[i:i + batch_size])
+    return inserted, time.perf_counter() - start
+
+
+def run_benchmark():
+    """Ejecuta ambos caminos sobre el mismo volumen y exporta rows/sec a CSV."""
+    print(
+        f"--- BENCHMARK DE INSERCIÓN ({BENCH_ROWS} filas, lotes de {BENCH_BATCH_SIZE}) ---")
+    cleanup_synthetic_events()
+
+    results = []
+    try:
+        inserted, elapsed = bench_per_row(build_synthetic_events(BENCH_ROWS))
+        results.append(("per_row", 1, inserted, elapsed))
+
+        inserted, elapsed = bench_batched(
+            build_synthetic_events(BENCH_ROWS), BENCH_BATCH_SIZE)
+        results.append(("batched", BENCH_BATCH_SIZE, inserted, elapsed))
+
+        # Reinsertar el mismo lote verifica que los duplicados cuenten como 0 nuevos
+        duplicated = build_synthetic_events(BENCH_BATCH_SIZE)
+        pg_manager.insert_events(duplicated)
+        repeated = pg_manager.insert_events(duplicated)
+        print(f"Reinserción de lote duplicado -> nuevas filas: {repeated}")
+    finally:
+        cleanup_synthetic_events()
+
+    os.makedirs("results", exist_ok=True)
+    with open(RESULTS_FILE, mode='w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["mode", "batch_size", "rows_inserted",
+                        "elapsed_s", "rows_per_sec"])
+        for mode, batch_size, inserted, elapsed in results:
+            rate = inserted / elapsed if elapsed > 0 else 0
+            writer.writerow([mode, batch_size, inserted,
+                            round(elapsed, 3), round(rate, 1)])
+            print(
+                f"{mode:>8}: {inserted} filas en {elapsed:.2f}s -> {rate:.1f} filas/s")
+
+    print(f"Resultados exportados a: {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
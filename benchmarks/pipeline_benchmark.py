@@ -0,0 +1,392 @@
+import io
+import os
+import sys
+import csv
+import json
+import time
+import random
+import platform
+import tempfile
+import contextlib
+from datetime import datetime, timedelta
+from benchmarks.standins import FakeRedis, FakePostgres, StubElasticsearch
+
+# --------------------------------------------------------------------------
+# Configuración del Benchmark
+# --------------------------------------------------------------------------
+# Mide el throughput de las rutas críticas del pipeline sin docker-compose:
+# Redis en memoria, PostgreSQL en memoria (o uno real con BENCH_POSTGRES=real)
+# y un endpoint _bulk local en lugar de Elasticsearch.
+#   python -m benchmarks.pipeline_benchmark                 # mide y compara con la línea base
+#   python -m benchmarks.pipeline_benchmark --save-baseline # fija la línea base
+
+BENCH_SCALE = int(os.getenv('BENCH_SCALE', '20000'))
+BENCH_REPEAT = int(os.getenv('BENCH_REPEAT', '3'))
+BENCH_SEED = int(os.getenv('BENCH_SEED', '42'))
+# memory: sustituto en memoria (costo del cliente); real: DB_HOST de siempre
+BENCH_POSTGRES = os.getenv('BENCH_POSTGRES', 'memory')
+BENCH_ONLY = [name for name in os.getenv('BENCH_ONLY', '').split(',') if name]
+# Caída relativa de throughput a partir de la cual se marca una regresión
+BENCH_TOLERANCE = float(os.getenv('BENCH_TOLERANCE', '0.15'))
+BENCH_BATCH_SIZE = int(os.getenv('BENCH_BATCH_SIZE', '500'))
+RESULTS_FILE = "results/pipeline_benchmark.json"
+BASELINE_FILE = os.getenv('BENCH_BASELINE', 'results/pipeline_benchmark_baseline.json')
+
+CITIES = ["Santiago", "Providencia", "Ñuñoa", "Las Condes", "Maipú", "La Florida",
+          "Puente Alto", "San Bernardo", " Recoleta ", None]
+STREETS = ["Av. Libertador Bernardo O'Higgins", "Gran Avenida José Miguel Carrera",
+           "Av. Vicuña Mackenna", "Costanera Norte", None]
+ALERT_TYPES = ['ACCIDENT', 'HAZARD', 'ROAD_CLOSED', 'WEATHERHAZARD', 'POLICE']
+
+
+def install_standins():
+    """
+    Reemplaza redis.Redis y psycopg2.connect antes de importar los módulos
+    del pipeline, cuyos singletons (cache_manager, pg_manager) se conectan
+    al importarse.
+    """
+    import redis
+    redis.Redis = FakeRedis
+    os.environ['POPULARITY_TRACKING'] = '0'
+    if BENCH_POSTGRES == 'memory':
+        import psycopg2
+        psycopg2.connect = FakePostgres().connect
+        os.environ['DB_PARTITIONED'] = '0'
+        os.environ['DB_ROLLUPS'] = '0'
+
+# --------------------------------------------------------------------------
+# Datos Sintéticos
+# --------------------------------------------------------------------------
+
+
+def build_georss_payload(n, rng):
+    """Respuesta georss con 'n' items (60% alertas, 40% atascos con 'line')."""
+    payload = {"alerts": [], "jams": []}
+    for i in range(n):
+        x, y = -70.6693 + rng.uniform(-0.3, 0.3), -33.4489 + rng.uniform(-0.3, 0.3)
+        if rng.random() < 0.6:
+            payload["alerts"].append({
+                "uuid": f"alert-{i}", "type": rng.choice(ALERT_TYPES),
+                "subType": rng.choice(["", "HAZARD_ON_ROAD_POT_HOLE", "ACCIDENT_MINOR"]),
+                "location": {"x": x, "y": y}, "street": rng.choice(STREETS) or "",
+                "city": rng.choice(CITIES[:-1]).strip(), "reportDescription": "Reporte sintético"})
+        else:
+            payload["jams"].append({
+                "uuid": f"jam-{i}", "speed": rng.uniform(0, 10), "level": rng.randint(1, 5),
+                "line": [{"x": x, "y": y}, {"x": x + 0.001, "y": y + 0.001}],
+                "street": rng.choice(STREETS) or "", "city": rng.choice(CITIES[:-1]).strip()})
+    return payload
+
+
+def build_raw_rows(n, rng):
+    """
+    Filas con la forma de pg_manager.iter_events. Las coordenadas caen en
+    una grilla para que ~1/3 colisione en la misma geo_temp_key, y una
+    fracción trae nulos que el ETL descarta.
+    """
+    base = datetime(2025, 11, 1)
+    rows = []
+    for i in range(n):
+        lon = -70.6693 + rng.randint(0, n // 3) * 0.0007
+        lat = -33.4489 + rng.randint(0, 40) * 0.0011
+        if rng.random() < 0.02:
+            lon = None
+        rows.append((f"raw-{i}", base + timedelta(seconds=rng.randint(0, 7 * 86400)),
+                     lon, lat, rng.choice(ALERT_TYPES + ['JAM', 'jam', None]),
+                     rng.choice(["JAM_HEAVY_TRAFFIC", "", None]), "Reporte sintético",
+                     rng.choice(STREETS), rng.choice(CITIES)))
+    return rows
+
+
+def write_pig_outputs(base_path, n, rng):
+    """Salidas part-r-00000 de los tres reportes de Pig; devuelve la cantidad de filas."""
+    comunas = [c.strip().upper() for c in CITIES if c]
+    tipos = ['ACCIDENTE', 'CONGESTION', 'CORTE_RUTA', 'PELIGRO_VIAL', 'OTRO']
+    reports = {
+        'output_by_type': [[t, rng.randint(1, 10000)] for t in tipos],
+        'output_by_comuna': [[c, rng.randint(1, 10000)] for c in comunas],
+        'output_temporal': [[(datetime(2025, 1, 1) + timedelta(days=i % 365)).strftime('%Y-%m-%d'),
+                             comunas[i % len(comunas)], tipos[i % len(tipos)], rng.randint(1, 50)]
+                            for i in range(n)],
+    }
+    for folder, rows in reports.items():
+        os.makedirs(os.path.join(base_path, folder), exist_ok=True)
+        with open(os.path.join(base_path, folder, 'part-r-00000'), 'w', newline='',
+                  encoding='utf-8') as f:
+            csv.writer(f).writerows(rows)
+    return sum(len(rows) for rows in reports.values())
+
+# --------------------------------------------------------------------------
+# Rutas Medidas (cada una devuelve (preparar, ejecutar) -> ítems procesados)
+# --------------------------------------------------------------------------
+
+
+def bench_process_waze_event(rng, workdir):
+    from scraper.data_processor import process_waze_event
+    payload = build_georss_payload(BENCH_SCALE, rng)
+    items = payload["alerts"] + payload["jams"]
+
+    def run(_):
+        return sum(1 for item in items if process_waze_event(item) is not None)
+    return None, run
+
+
+def bench_homogenize_transform(rng, workdir):
+    from etl.homogenizer import transform_events, dedupe_by_key
+    rows = build_raw_rows(BENCH_SCALE, rng)
+
+    def run(_):
+        for _ in dedupe_by_key(transform_events(rows, {"raw": 0})):
+            pass
+        return len(rows)
+    return None, run
+
+
+def bench_homogenize_columnar(rng, workdir):
+    from etl import columnar
+    from etl.homogenizer import TYPE_MAPPING
+    if not columnar.available():
+        raise ImportError("ETL_ENGINE=columnar requiere numpy")
+    rows = build_raw_rows(BENCH_SCALE, rng)
+    size = columnar.ETL_COLUMNAR_BATCH
+    batches = [rows[i:i + size] for i in range(0, len(rows), size)]
+
+    def run(_):
+        for _ in columnar.homogenize_batches(batches, {"raw": 0}, TYPE_MAPPING):
+            pass
+        return len(rows)
+    return None, run
+
+
+def _cache_events(rng):
+    from benchmarks.codec_benchmark import build_synthetic_events
+    return build_synthetic_events(BENCH_SCALE, rng=rng)
+
+
+def bench_cache_save(rng, workdir):
+    from cache_service.redis_client import cache_manager
+    events = _cache_events(rng)
+
+    def setup():
+        cache_manager.client.flushall()
+
+    def run(_):
+        for event in events:
+            cache_manager.save_to_cache(event["uuid"], event)
+        return len(events)
+    return setup, run
+
+
+def bench_cache_get(rng, workdir):
+    from cache_service.redis_client import cache_manager
+    events = _cache_events(rng)
+    uuids = [event["uuid"] for event in events]
+
+    def setup():
+        cache_manager.client.flushall()
+        cache_manager.save_many({event["uuid"]: event for event in events})
+
+    def run(_):
+        for uuid in uuids:
+            cache_manager.get_event(uuid)
+        return len(uuids)
+    return setup, run
+
+
+def bench_cache_get_or_load(rng, workdir):
+    """Mitad de los uuids ya cacheados; el resto pasa por el loader (single-flight)."""
+    from cache_service.redis_client import cache_manager
+    events = {event["uuid"]: event for event in _cache_events(rng)}
+    uuids = list(events)
+
+    def loader(keys):
+        return {key: events[key] for key in keys if key in events}
+
+    def setup():
+        cache_manager.client.flushall()
+        cache_manager.save_many({uuid: events[uuid] for uuid in uuids[::2]})
+
+    def run(_):
+        for uuid in uuids:
+            cache_manager.get_or_load(uuid, loader=loader)
+        return len(uuids)
+    return setup, run
+
+
+def bench_cache_loader(rng, workdir):
+    from etl import cache_loader
+    from cache_service.redis_client import cache_manager
+    pig_dir = os.path.join(workdir, "pig")
+    rows = write_pig_outputs(pig_dir, BENCH_SCALE, rng)
+    cache_loader.PIG_OUTPUT_DIR = pig_dir
+
+    def setup():
+        # Sin generación previa no hay espera antes de borrar la anterior
+        cache_manager.client.flushall()
+
+    def run(_):
+        cache_loader.load_pig_results_to_redis()
+        return rows
+    return setup, run
+
+
+def bench_es_loader(rng, workdir):
+    from elasticsearch import Elasticsearch
+    from etl import es_loader
+    from etl.homogenizer import transform_events, dedupe_by_key
+    csv_path = os.path.join(workdir, "cleaned.csv")
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        rows = 0
+        for _, csv_row in dedupe_by_key(transform_events(build_raw_rows(BENCH_SCALE, rng),
+                                                         {"raw": 0})):
+            writer.writerow(csv_row)
+            rows += 1
+    es_loader.ES_EVENTS_FILE = csv_path
+    stub = StubElasticsearch()
+    es = Elasticsearch([stub.url])
+
+    def run(_):
+        es_loader.load_cleaned_events_to_es(es)
+        return rows
+    return None, run
+
+
+def _insert_events():
+    from benchmarks.insert_benchmark import build_synthetic_events, cleanup_synthetic_events
+
+    def setup():
+        if BENCH_POSTGRES != 'memory':
+            cleanup_synthetic_events()
+        return build_synthetic_events(BENCH_SCALE)
+    return setup
+
+
+def bench_pg_insert_row(rng, workdir):
+    from storage.db_client import pg_manager
+
+    def run(events):
+        for event in events:
+            pg_manager.insert_event(event)
+        return len(events)
+    return _insert_events(), run
+
+
+def bench_pg_insert_batch(rng, workdir):
+    from storage.db_client import pg_manager
+
+    def run(events):
+        for i in range(0, len(events), BENCH_BATCH_SIZE):
+            pg_manager.insert_events(events[i:i + BENCH_BATCH_SIZE])
+        return len(events)
+    return _insert_events(), run
+
+
+BENCHMARKS = {
+    'process_waze_event': bench_process_waze_event,
+    'homogenize_transform': bench_homogenize_transform,
+    'homogenize_columnar': bench_homogenize_columnar,
+    'cache_save': bench_cache_save,
+    'cache_get': bench_cache_get,
+    'cache_get_or_load': bench_cache_get_or_load,
+    'cache_loader': bench_cache_loader,
+    'es_loader': bench_es_loader,
+    'pg_insert_row': bench_pg_insert_row,
+    'pg_insert_batch': bench_pg_insert_batch,
+}
+
+# --------------------------------------------------------------------------
+# Ejecución y Comparación con la Línea Base
+# --------------------------------------------------------------------------
+
+
+def measure(name, factory, workdir):
+    """Mejor de BENCH_REPEAT ejecuciones; la preparación queda fuera del tiempo."""
+    rng = random.Random(f"{BENCH_SEED}:{name}")
+    setup, run = factory(rng, workdir)
+    timings = []
+    items = 0
+    for _ in range(BENCH_REPEAT):
+        state = setup() if setup else None
+        # Los prints del pipeline no forman parte de lo que se mide
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            items = run(state)
+            timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {"items": items, "best_s": round(best, 6),
+            "mean_s": round(sum(timings) / len(timings), 6),
+            "items_per_sec": round(items / best, 1) if best > 0 else 0.0}
+
+
+def compare_with_baseline(results, baseline, tolerance=BENCH_TOLERANCE):
+    """{nombre: {ratio, status}} con status ok, regression o improvement."""
+    comparison = {}
+    for name, result in results.items():
+        before = baseline.get("benchmarks", {}).get(name)
+        if not before or not before.get("items_per_sec") or "items_per_sec" not in result:
+            continue
+        ratio = result["items_per_sec"] / before["items_per_sec"]
+        status = "ok"
+        if ratio < 1 - tolerance:
+            status = "regression"
+        elif ratio > 1 + tolerance:
+            status = "improvement"
+        comparison[name] = {"baseline_items_per_sec": before["items_per_sec"],
+                            "ratio": round(ratio, 3), "status": status}
+    return comparison
+
+
+def run_benchmarks(save_baseline=False):
+    print(f"--- BENCHMARK DEL PIPELINE (escala {BENCH_SCALE}, mejor de {BENCH_REPEAT}, "
+          f"PostgreSQL {BENCH_POSTGRES}) ---")
+    install_standins()
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="waze-bench-") as workdir:
+        for name, factory in BENCHMARKS.items():
+            if BENCH_ONLY and name not in BENCH_ONLY:
+                continue
+            try:
+                results[name] = measure(name, factory, workdir)
+            except ImportError as e:
+                print(f"{name:>22}: omitido ({e})")
+                results[name] = {"skipped": str(e)}
+                continue
+            r = results[name]
+            print(f"{name:>22}: {r['items']:>8} ítems | mejor {r['best_s'] * 1000:9.1f} ms | "
+                  f"{r['items_per_sec']:>12,.0f} ítems/s")
+
+    report = {"timestamp": datetime.now().isoformat(timespec='seconds'),
+              "python": platform.python_version(), "scale": BENCH_SCALE,
+              "repeat": BENCH_REPEAT, "postgres": BENCH_POSTGRES, "benchmarks": results}
+
+    regressions = []
+    if os.path.exists(BASELINE_FILE) and not save_baseline:
+        with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get("scale") != BENCH_SCALE:
+            print(f"Advertencia: la línea base usa escala {baseline.get('scale')}")
+        report["comparison"] = compare_with_baseline(results, baseline)
+        print(f"Comparación con {BASELINE_FILE} (tolerancia {BENCH_TOLERANCE:.0%}):")
+        for name, c in report["comparison"].items():
+            print(f"{name:>22}: x{c['ratio']:.2f} {c['status']}")
+            if c["status"] == "regression":
+                regressions.append(name)
+
+    os.makedirs("results", exist_ok=True)
+    with open(RESULTS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados exportados a: {RESULTS_FILE}")
+    if save_baseline:
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Línea base guardada en: {BASELINE_FILE}")
+    return regressions
+
+
+if __name__ == "__main__":
+    regressed = run_benchmarks(save_baseline="--save-baseline" in sys.argv)
+    if regressed:
+        print(f"REGRESIONES: {', '.join(regressed)}")
+        sys.exit(1)
@@ -0,0 +1,64 @@
+import os
+import csv
+import time
+from collections import Counter
+from storage.db_client import pg_manager
+
+# --------------------------------------------------------------------------
+# Configuración del Benchmark
+# --------------------------------------------------------------------------
+
+SEED_SIZES = [int(n) for n in os.getenv(
+    'BENCH_SEED_SIZES', '50,1000,100000').split(',')]
+SEED_METHODS = os.getenv(
+    'BENCH_SEED_METHODS', 'random,bernoulli,system,id_range').split(',')
+RESULTS_FILE = "results/seed_benchmark.csv"
+
+# --------------------------------------------------------------------------
+# Benchmark de Muestreo de Semillas
+# --------------------------------------------------------------------------
+
+
+def _city_share_error(seeds, population):
+    """Máxima diferencia absoluta (en puntos %) entre la muestra y la población por comuna."""
+    if not seeds:
+        return None
+    sample = Counter(seed[3] for seed in seeds)
+    total_pop = sum(population.values())
+    return max(abs(sample.get(city, 0) / len(seeds) - n / total_pop) * 100
+               for city, n in population.items())
+
+
+def run_benchmark():
+    """Mide el tiempo de arranque del generador para cada método y tamaño de muestra."""
+    print("--- BENCHMARK DE MUESTREO DE SEMILLAS ---")
+    with pg_manager.cursor() as cur:
+        cur.execute("SELECT city, COUNT(*) FROM traffic_events GROUP BY city;")
+        population = dict(cur.fetchall())
+
+    runs = [(method, None) for method in SEED_METHODS] + [
+        ('bernoulli', 'city'), ('bernoulli', 'type')]
+
+    os.makedirs("results", exist_ok=True)
+    with open(RESULTS_FILE, mode='w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["method", "stratify_by", "requested",
+                        "returned", "elapsed_ms", "max_city_share_error_pct"])
+        for size in SEED_SIZES:
+            for method, stratify_by in runs:
+                start = time.perf_counter()
+                seeds = pg_manager.get_simulation_seeds(
+                    limit=size, method=method, stratify_by=stratify_by)
+                elapsed = (time.perf_counter() - start) * 1000
+                error = _city_share_error(seeds, population)
+
+                writer.writerow([method, stratify_by or "", size, len(seeds), round(elapsed, 2),
+                                 round(error, 3) if error is not None else ""])
+                print(f"{method:>9} {stratify_by or '':>4} n={size:<7} -> "
+                      f"{len(seeds):>7} semillas en {elapsed:.1f} ms")
+
+    print(f"Resultados exportados a: {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
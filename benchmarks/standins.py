@@ -0,0 +1,301 @@
+import json
+import time
+import fnmatch
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# --------------------------------------------------------------------------
+# Sustitutos Locales para los Benchmarks
+# --------------------------------------------------------------------------
+# Permiten medir las rutas críticas sin el stack de docker-compose. Miden el
+# costo del lado del cliente (codificación, armado de SQL/COPY, parsing),
+# no el del servidor real.
+
+# --------------------------------------------------------------------------
+# Redis en memoria
+# --------------------------------------------------------------------------
+
+
+class FakeRedis:
+    """
+    Subconjunto en memoria de redis.Redis: lo que usan CacheMiddleware y
+    analytics_store al escribir. Los clientes con el mismo host/puerto
+    comparten datos, igual que value_client y client contra un mismo servidor.
+    """
+    _servers = {}
+
+    def __init__(self, host='localhost', port=6379, decode_responses=False, **kwargs):
+        self.decode_responses = decode_responses
+        self._data = FakeRedis._servers.setdefault((host, port), {})
+
+    @staticmethod
+    def _bytes(value):
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode()
+
+    def _out(self, value):
+        if self.decode_responses and isinstance(value, bytes):
+            return value.decode()
+        return value
+
+    def _entry(self, key):
+        key = key.decode() if isinstance(key, bytes) else key
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.time():
+            del self._data[key]
+            return key, None
+        return key, entry
+
+    def ping(self):
+        return True
+
+    def get(self, key):
+        _, entry = self._entry(key)
+        return self._out(entry[0]) if entry else None
+
+    def mget(self, keys, *args):
+        keys = list(keys) if isinstance(keys, (list, tuple)) else [keys, *args]
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ex=None, px=None, nx=False):
+        key, entry = self._entry(key)
+        if nx and entry:
+            return None
+        expire_at = None
+        if px is not None:
+            expire_at = time.time() + px / 1000
+        elif ex is not None:
+            expire_at = time.time() + ex
+        self._data[key] = (self._bytes(value), expire_at)
+        return True
+
+    def setex(self, key, seconds, value):
+        return self.set(key, value, ex=seconds)
+
+    def getset(self, key, value):
+        previous = self.get(key)
+        self.set(key, value)
+        return previous
+
+    def pttl(self, key):
+        _, entry = self._entry(key)
+        if entry is None:
+            return -2
+        if entry[1] is None:
+            return -1
+        return int((entry[1] - time.time()) * 1000)
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self._data.pop(self._entry(key)[0], None))
+
+    unlink = delete
+
+    def _container(self, key):
+        key, entry = self._entry(key)
+        if entry is None:
+            entry = ({}, None)
+            self._data[key] = entry
+        return entry[0]
+
+    def zadd(self, key, mapping):
+        members = self._container(key)
+        added = sum(1 for member in mapping if member not in members)
+        members.update({member: float(score) for member, score in mapping.items()})
+        return added
+
+    def zincrby(self, key, amount, member):
+        members = self._container(key)
+        members[member] = members.get(member, 0.0) + amount
+        return members[member]
+
+    def hincrby(self, key, field, amount=1):
+        fields = self._container(key)
+        fields[field] = fields.get(field, 0) + amount
+        return fields[field]
+
+    def scan_iter(self, match=None, count=None):
+        for key in list(self._data):
+            if match is None or fnmatch.fnmatchcase(key, match):
+                yield key
+
+    def publish(self, channel, message):
+        return 0
+
+    def info(self, section=None):
+        used = sum(len(k) + (len(v) if isinstance(v, bytes) else 64)
+                   for k, (v, _) in self._data.items())
+        return {"used_memory": used, "maxmemory": 0}
+
+    def flushall(self):
+        self._data.clear()
+        return True
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Encola los comandos y los aplica en orden al ejecutar."""
+    def __init__(self, client):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        commands, self._commands = self._commands, []
+        return [method(*args, **kwargs) for method, args, kwargs in commands]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._commands = []
+
+# --------------------------------------------------------------------------
+# PostgreSQL en memoria (conexión compatible con psycopg2)
+# --------------------------------------------------------------------------
+
+
+class FakePostgres:
+    """
+    Estado compartido del 'servidor': uuids ya insertados y la tabla de
+    staging de COPY, para que ON CONFLICT DO NOTHING devuelva el rowcount real.
+    """
+    def __init__(self):
+        self.waze_uuids = set()
+        self.staging = []
+        self.statements = 0
+
+    def connect(self, *args, **kwargs):
+        return FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+        self.closed = False
+        self.autocommit = False
+
+    def cursor(self, name=None, **kwargs):
+        return FakeCursor(self.server)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakeCursor:
+    def __init__(self, server):
+        self.server = server
+        self.rowcount = -1
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        server = self.server
+        server.statements += 1
+        self.rowcount = 0
+        self._rows = []
+        if "to_regclass" in sql:
+            self._rows = [(False,)]
+        elif "TRUNCATE traffic_events_staging" in sql:
+            server.staging = []
+        elif "FROM traffic_events_staging" in sql:
+            new = {row[0] for row in server.staging} - server.waze_uuids
+            server.waze_uuids |= new
+            self.rowcount = len(new)
+        elif sql.lstrip().startswith("INSERT") and params:
+            if params[0] not in server.waze_uuids:
+                server.waze_uuids.add(params[0])
+                self.rowcount = 1
+
+    def copy_expert(self, sql, buffer):
+        for line in buffer:
+            self.server.staging.append(line.rstrip('\n').split('\t'))
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        pass
+
+# --------------------------------------------------------------------------
+# Endpoint _bulk de Elasticsearch
+# --------------------------------------------------------------------------
+
+
+class StubElasticsearch:
+    """
+    Servidor HTTP local que responde como Elasticsearch 8 a la raíz, a la
+    creación de índices y a _bulk (contando los documentos recibidos).
+    """
+    def __init__(self, port=0):
+        self.documents = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, payload, status=200):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("X-Elastic-Product", "Elasticsearch")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("X-Elastic-Product", "Elasticsearch")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                self._reply({"version": {"number": "8.11.0"}, "tagline": "You Know, for Search"})
+
+            def do_PUT(self):
+                self._reply({"acknowledged": True})
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if "_bulk" not in self.path:
+                    self._reply({"result": "created"}, status=201)
+                    return
+                lines = [line for line in body.split(b"\n") if line.strip()]
+                items = [{"index": {"status": 201, "result": "created"}}
+                         for _ in range(len(lines) // 2)]
+                stub.documents += len(items)
+                self._reply({"took": 1, "errors": False, "items": items})
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,221 @@
+import time
+import uuid
+
+# --------------------------------------------------------------------------
+# Esquema de las Analíticas Estructuradas en Redis
+# --------------------------------------------------------------------------
+# Cada carga escribe una generación nueva y luego apunta 'ax:current' a ella,
+# así los lectores nunca ven un reporte a medio cargar:
+#
+#   ax:{gen}:by_type               ZSET  tipo -> total
+#   ax:{gen}:by_comuna             ZSET  comuna -> total
+#   ax:{gen}:dates                 ZSET  fecha -> yyyymmdd (rangos de fechas)
+#   ax:{gen}:day:{fecha}           ZSET  comuna -> total del día
+#   ax:{gen}:comuna:{comuna}       ZSET  tipo -> total de la comuna
+#   ax:{gen}:cell:{fecha}:{comuna} HASH  tipo -> total
+
+ANALYTICS_PREFIX = "ax"
+CURRENT_KEY = f"{ANALYTICS_PREFIX}:current"
+PIPELINE_CHUNK = 1000
+# Segundos que un proceso reutiliza la generación vigente antes de releerla
+GENERATION_CACHE_SECONDS = 5
+
+DIMENSIONS = {'type': 'by_type', 'comuna': 'by_comuna'}
+
+
+def date_score(fecha):
+    """'2025-11-20' -> 20251120, para consultar rangos con ZRANGEBYSCORE."""
+    return int(str(fecha).replace('-', ''))
+
+# --------------------------------------------------------------------------
+# Carga
+# --------------------------------------------------------------------------
+
+
+def load_reports(client, reports):
+    """
+    Carga los reportes de Pig ({'by_type': filas, 'by_comuna': filas,
+    'temporal': filas}, como las lee cache_loader) en estructuras
+    consultables y publica la generación. Devuelve la cantidad de llaves.
+    """
+    generation = uuid.uuid4().hex[:12]
+    prefix = f"{ANALYTICS_PREFIX}:{generation}"
+    pipe = client.pipeline(transaction=False)
+    pending = 0
+    keys = set()
+
+    def flush(force=False):
+        nonlocal pipe, pending
+        if pending and (force or pending >= PIPELINE_CHUNK):
+            pipe.execute()
+            pipe = client.pipeline(transaction=False)
+            pending = 0
+
+    for dimension, report in DIMENSIONS.items():
+        rows = {row[0]: int(row[1]) for row in reports.get(report, []) if len(row) >= 2}
+        if rows:
+            pipe.zadd(f"{prefix}:{report}", rows)
+            keys.add(f"{prefix}:{report}")
+            pending += 1
+
+    dates = {}
+    for row in reports.get('temporal', []):
+        if len(row) < 4:
+            continue
+        fecha, comuna, tipo, total = row[0], row[1], row[2], int(row[3])
+        dates[fecha] = date_score(fecha)
+        cell_key = f"{prefix}:cell:{fecha}:{comuna}"
+        day_key = f"{prefix}:day:{fecha}"
+        comuna_key = f"{prefix}:comuna:{comuna}"
+        pipe.hincrby(cell_key, tipo, total)
+        pipe.zincrby(day_key, total, comuna)
+        pipe.zincrby(comuna_key, total, tipo)
+        keys.update((cell_key, day_key, comuna_key))
+        pending += 3
+        flush()
+
+    if dates:
+        pipe.zadd(f"{prefix}:dates", dates)
+        keys.add(f"{prefix}:dates")
+        pending += 1
+    flush(force=True)
+
+    previous = client.getset(CURRENT_KEY, generation)
+    if previous and previous != generation:
+        # Los lectores pueden seguir usando la generación anterior hasta
+        # GENERATION_CACHE_SECONDS; se espera ese plazo antes de borrarla
+        time.sleep(GENERATION_CACHE_SECONDS)
+        drop_generation(client, previous)
+    return len(keys)
+
+
+def drop_generation(client, generation):
+    """Elimina (UNLINK por lotes) las llaves de una generación anterior."""
+    batch = []
+    for key in client.scan_iter(match=f"{ANALYTICS_PREFIX}:{generation}:*", count=1000):
+        batch.append(key)
+        if len(batch) >= PIPELINE_CHUNK:
+            client.unlink(*batch)
+            batch = []
+    if batch:
+        client.unlink(*batch)
+
+# --------------------------------------------------------------------------
+# Consultas
+# --------------------------------------------------------------------------
+
+
+class AnalyticsReader:
+    """Consultas directas sobre la generación vigente (sin bajar reportes completos)."""
+    def __init__(self, client):
+        self.client = client
+        self._generation = None
+        self._generation_expires = 0
+
+    def prefix(self):
+        """Prefijo de la generación vigente, o None si nunca se cargó."""
+        now = time.time()
+        if self._generation is None or now >= self._generation_expires:
+            self._generation = self.client.get(CURRENT_KEY)
+            self._generation_expires = now + GENERATION_CACHE_SECONDS
+        if not self._generation:
+            return None
+        return f"{ANALYTICS_PREFIX}:{self._generation}"
+
+    def top_n(self, dimension, n=10):
+        """
+        [(miembro, total)] de mayor a menor para 'type' o 'comuna'. None si
+        no hay generación o si su llave fue desalojada (ver ax:* sin TTL).
+        """
+        prefix = self.prefix()
+        if prefix is None:
+            return None
+        key = f"{prefix}:{DIMENSIONS[dimension]}"
+        pipe = self.client.pipeline(transaction=False)
+        pipe.exists(key)
+        pipe.zrevrange(key, 0, n - 1, withscores=True)
+        exists, rows = pipe.execute()
+        if not exists:
+            return None
+        return [(member, int(score)) for member, score in rows]
+
+    def comuna(self, comuna):
+        """
+        Total de la comuna y su desglose {tipo: total}. None si falta
+        by_comuna o la llave de la comuna (desalojada o comuna sin datos).
+        """
+        prefix = self.prefix()
+        if prefix is None:
+            return None
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zscore(f"{prefix}:by_comuna", comuna)
+        pipe.exists(f"{prefix}:comuna:{comuna}")
+        pipe.zrevrange(f"{prefix}:comuna:{comuna}", 0, -1, withscores=True)
+        total, exists, by_type = pipe.execute()
+        if total is None or not exists:
+            return None
+        return {"comuna": comuna, "total": int(total),
+                "by_type": {tipo: int(score) for tipo, score in by_type}}
+
+    def date_range(self, start, end, comuna=None):
+        """
+        Filas (fecha, comuna, tipo, total) entre 'start' y 'end' (inclusive),
+        opcionalmente de una sola comuna. Usa a lo más tres pipelines. None
+        si falta alguna llave de día o celda que el índice de fechas promete.
+        """
+        prefix = self.prefix()
+        if prefix is None:
+            return None
+        pipe = self.client.pipeline(transaction=False)
+        pipe.exists(f"{prefix}:dates")
+        pipe.zrangebyscore(f"{prefix}:dates", date_score(start), date_score(end))
+        exists, fechas = pipe.execute()
+        if not exists:
+            return None
+        if not fechas:
+            return []
+
+        # Un ZSET de día nunca queda vacío en Redis: vacío significa desalojado
+        pipe = self.client.pipeline(transaction=False)
+        for fecha in fechas:
+            if comuna is None:
+                pipe.zrange(f"{prefix}:day:{fecha}", 0, -1)
+            else:
+                pipe.exists(f"{prefix}:day:{fecha}")
+                pipe.zscore(f"{prefix}:day:{fecha}", comuna)
+        replies = pipe.execute()
+        if comuna is None:
+            if not all(replies):
+                return None
+            cells = [(fecha, c) for fecha, comunas in zip(fechas, replies) for c in comunas]
+        else:
+            if not all(replies[0::2]):
+                return None
+            cells = [(fecha, comuna) for fecha, score in zip(fechas, replies[1::2])
+                     if score is not None]
+
+        pipe = self.client.pipeline(transaction=False)
+        for fecha, c in cells:
+            pipe.hgetall(f"{prefix}:cell:{fecha}:{c}")
+        rows = []
+        for (fecha, c), by_type in zip(cells, pipe.execute()):
+            # Ídem para los HASH: la celda figura en su día, así que debe existir
+            if not by_type:
+                return None
+            for tipo, total in by_type.items():
+                rows.append((fecha, c, tipo, int(total)))
+        return rows
+
+    def date_bounds(self):
+        """(primera, última) fecha cargada, o None."""
+        prefix = self.prefix()
+        if prefix is None:
+            return None
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zrange(f"{prefix}:dates", 0, 0)
+        pipe.zrange(f"{prefix}:dates", -1, -1)
+        first, last = pipe.execute()
+        if not first:
+            return None
+        return first[0], last[0]
+
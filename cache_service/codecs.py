@@ -0,0 +1,266 @@
+import os
+import abc
+import json
+import math
+import struct
+import zlib
+from datetime import datetime, timedelta
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+# --------------------------------------------------------------------------
+# Configuración de Codificación de Valores
+# --------------------------------------------------------------------------
+# CACHE_CODEC:
+#   json    -> formato original (texto, llaves sin prefijo)
+#   msgpack -> binario genérico, llaves con prefijo 'mp1:' (requiere msgpack)
+#   struct  -> layout fijo para eventos y msgpack para el resto, 'se1:'; sin
+#              msgpack el resto va en JSON binario y las llaves usan 'sj1:'
+# CACHE_COMPRESSION (solo codecs binarios): none, zlib o lz4, aplicada a los
+# valores de al menos CACHE_COMPRESS_MIN_BYTES.
+
+CACHE_CODEC = os.getenv('CACHE_CODEC', 'json')
+CACHE_COMPRESSION = os.getenv('CACHE_COMPRESSION', 'none')
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv('CACHE_COMPRESS_MIN_BYTES', '256'))
+
+# Primer byte de todo valor binario: cómo viene comprimido el resto
+_RAW, _ZLIB, _LZ4 = 0, 1, 2
+
+EVENT_FIELDS = ("uuid", "timestamp_scraped", "lon", "lat", "type",
+                "subtype", "description", "street", "city")
+_EVENT_STRINGS = ("uuid", "type", "subtype", "description", "street", "city")
+
+# --------------------------------------------------------------------------
+# Codecs
+# --------------------------------------------------------------------------
+
+
+class JsonCodec:
+    """Codec original: JSON en texto y llaves sin versión."""
+    name = 'json'
+    version = None
+    binary = False
+
+    def key(self, key):
+        return key
+
+    def strip(self, key):
+        return key
+
+    def encode(self, value):
+        return json.dumps(value)
+
+    def decode(self, data):
+        return json.loads(data)
+
+
+class BinaryCodec(abc.ABC):
+    """
+    Base de los codecs binarios: antepone la versión a las llaves (para que
+    convivan con las de otros codecs) y comprime los valores grandes. Las
+    subclases definen _dump/_load (valor <-> bytes sin comprimir).
+    """
+    name = None
+    version = None
+    binary = True
+
+    def __init__(self, compression=CACHE_COMPRESSION, min_bytes=CACHE_COMPRESS_MIN_BYTES):
+        if compression == 'lz4' and lz4_frame is None:
+            print("lz4 no está instalado; se usará zlib para comprimir.")
+            compression = 'zlib'
+        self.compression = compression
+        self.min_bytes = min_bytes
+
+    def key(self, key):
+        return f"{self.version}:{key}"
+
+    def strip(self, key):
+        prefix = f"{self.version}:"
+        return key[len(prefix):] if key.startswith(prefix) else key
+
+    def encode(self, value):
+        payload = self._dump(value)
+        if self.compression != 'none' and len(payload) >= self.min_bytes:
+            if self.compression == 'lz4':
+                compressed, flag = lz4_frame.compress(payload), _LZ4
+            else:
+                compressed, flag = zlib.compress(payload), _ZLIB
+            # Solo se guarda comprimido si efectivamente ahorra espacio
+            if len(compressed) < len(payload):
+                return bytes((flag,)) + compressed
+        return bytes((_RAW,)) + payload
+
+    def decode(self, data):
+        flag, payload = data[0], data[1:]
+        if flag == _ZLIB:
+            payload = zlib.decompress(payload)
+        elif flag == _LZ4:
+            if lz4_frame is None:
+                raise ValueError("Valor comprimido con lz4, pero lz4 no está instalado")
+            payload = lz4_frame.decompress(payload)
+        return self._load(payload)
+
+    @abc.abstractmethod
+    def _dump(self, value):
+        """Serializa 'value' a bytes, antes de comprimir."""
+
+    @abc.abstractmethod
+    def _load(self, payload):
+        """Inverso de _dump sobre los bytes ya descomprimidos."""
+
+
+class MsgpackCodec(BinaryCodec):
+    """MessagePack genérico. Sin msgpack instalado no se puede construir."""
+    name = 'msgpack'
+    version = 'mp1'
+
+    def __init__(self, *args, **kwargs):
+        if msgpack is None:
+            raise ValueError("CACHE_CODEC=msgpack requiere el paquete msgpack (pip install msgpack)")
+        super().__init__(*args, **kwargs)
+
+    def _dump(self, value):
+        return _generic_dump(value)
+
+    def _load(self, payload):
+        return _generic_load(payload)
+
+
+class StructEventCodec(BinaryCodec):
+    """
+    Layout fijo para los eventos de get_events_by_uuids: timestamp como
+    int64 (microsegundos), lon/lat como float64 y los textos con largo
+    uint16. Cualquier otro valor (analíticas, payloads simulados) se guarda
+    con el formato genérico tras un byte de tipo. Ese formato depende de si
+    msgpack está instalado, así que cada variante tiene su propia versión.
+    """
+    name = 'struct'
+    version = 'se1' if msgpack is not None else 'sj1'
+
+    _HEAD = struct.Struct('<qdd')
+    _LEN = struct.Struct('<H')
+    _NONE = 0xFFFF
+    _NO_TS = -2 ** 63
+    _EPOCH = datetime(1970, 1, 1)
+
+    def _dump(self, value):
+        packed = self._pack_event(value) if isinstance(value, dict) else None
+        if packed is None:
+            return b'G' + _generic_dump(value)
+        return b'E' + packed
+
+    def _load(self, payload):
+        if payload[:1] == b'E':
+            return self._unpack_event(payload[1:])
+        return _generic_load(payload[1:])
+
+    def _pack_event(self, event):
+        if set(event) != set(EVENT_FIELDS):
+            return None
+        ts = event["timestamp_scraped"]
+        if ts is None:
+            micros = self._NO_TS
+        else:
+            try:
+                parsed = datetime.fromisoformat(ts)
+            except (TypeError, ValueError):
+                return None
+            # Solo se empaqueta si el texto se reconstruye idéntico
+            if parsed.tzinfo is not None or parsed.isoformat() != ts:
+                return None
+            delta = parsed - self._EPOCH
+            micros = (delta.days * 86400 + delta.seconds) * 10 ** 6 + delta.microseconds
+
+        coords = []
+        for field in ("lon", "lat"):
+            coord = event[field]
+            if coord is not None and not isinstance(coord, (int, float)):
+                return None
+            coords.append(math.nan if coord is None else float(coord))
+
+        parts = [self._HEAD.pack(micros, *coords)]
+        for field in _EVENT_STRINGS:
+            text = event[field]
+            if text is None:
+                parts.append(self._LEN.pack(self._NONE))
+                continue
+            if not isinstance(text, str):
+                return None
+            raw = text.encode('utf-8')
+            if len(raw) >= self._NONE:
+                return None
+            parts.append(self._LEN.pack(len(raw)))
+            parts.append(raw)
+        return b''.join(parts)
+
+    def _unpack_event(self, payload):
+        micros, lon, lat = self._HEAD.unpack_from(payload, 0)
+        offset = self._HEAD.size
+        event = {}
+        for field in _EVENT_STRINGS:
+            (length,) = self._LEN.unpack_from(payload, offset)
+            offset += self._LEN.size
+            if length == self._NONE:
+                event[field] = None
+                continue
+            event[field] = payload[offset:offset + length].decode('utf-8')
+            offset += length
+
+        if micros == self._NO_TS:
+            ts = None
+        else:
+            ts = (self._EPOCH + timedelta(microseconds=micros)).isoformat()
+        return {
+            "uuid": event["uuid"],
+            "timestamp_scraped": ts,
+            "lon": None if math.isnan(lon) else lon,
+            "lat": None if math.isnan(lat) else lat,
+            "type": event["type"],
+            "subtype": event["subtype"],
+            "description": event["description"],
+            "street": event["street"],
+            "city": event["city"]
+        }
+
+
+def _generic_dump(value):
+    if msgpack is not None:
+        return msgpack.packb(value, use_bin_type=True)
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+def _generic_load(payload):
+    if msgpack is not None:
+        return msgpack.unpackb(payload, raw=False)
+    return json.loads(payload)
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec, MsgpackCodec, StructEventCodec)}
+
+
+def get_codec(name=CACHE_CODEC, compression=CACHE_COMPRESSION, min_bytes=CACHE_COMPRESS_MIN_BYTES):
+    """Construye el codec configurado; ante uno desconocido vuelve a JSON."""
+    codec_cls = CODECS.get(name)
+    if codec_cls is None:
+        print(f"Codec de caché desconocido '{name}'; se usará json.")
+        return JsonCodec()
+    if codec_cls is JsonCodec:
+        return JsonCodec()
+    if codec_cls is StructEventCodec and msgpack is None:
+        print(f"msgpack no está instalado; el codec '{name}' usará JSON binario como "
+              f"formato genérico (llaves '{codec_cls.version}:').")
+    return codec_cls(compression=compression, min_bytes=min_bytes)
+
+
+def codec_label(codec):
+    """Nombre y versión del codec: dos procesos leen las mismas llaves solo si coinciden."""
+    return codec.name if codec.version is None else f"{codec.name}:{codec.version}"
+
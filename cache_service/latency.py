@@ -0,0 +1,188 @@
+import os
+import json
+import math
+import time
+import threading
+
+# --------------------------------------------------------------------------
+# Configuración de los Histogramas de Latencia
+# --------------------------------------------------------------------------
+# Buckets logarítmicos: el error relativo de cada percentil queda acotado
+# por LATENCY_PRECISION sin importar la escala (µs o segundos).
+
+LATENCY_MIN_MS = 0.001
+LATENCY_PRECISION = float(os.getenv('LATENCY_PRECISION', '0.02'))
+PERCENTILES = (("p50_ms", 50), ("p90_ms", 90), ("p99_ms", 99), ("p999_ms", 99.9))
+
+# --------------------------------------------------------------------------
+# Histograma Logarítmico
+# --------------------------------------------------------------------------
+
+
+class LatencyHistogram:
+    """
+    Histograma de latencias con buckets de ancho relativo constante, al
+    estilo HDR: registrar es O(1), la memoria crece con el rango de valores
+    y no con la cantidad, y dos histogramas con la misma precisión se
+    combinan sumando sus buckets (también entre procesos, vía to_dict).
+    """
+    def __init__(self, precision=LATENCY_PRECISION):
+        self.precision = precision
+        self._log_base = math.log1p(precision)
+        self._lock = threading.Lock()
+        self.counts = {}
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def _index(self, latency_ms):
+        if latency_ms <= LATENCY_MIN_MS:
+            return 0
+        return int(math.log(latency_ms / LATENCY_MIN_MS) / self._log_base) + 1
+
+    def _value(self, index):
+        """Punto medio (geométrico) del bucket."""
+        if index == 0:
+            return LATENCY_MIN_MS
+        return LATENCY_MIN_MS * math.exp((index - 0.5) * self._log_base)
+
+    def record(self, latency_ms):
+        index = self._index(latency_ms)
+        with self._lock:
+            self.counts[index] = self.counts.get(index, 0) + 1
+            self.count += 1
+            self.total_ms += latency_ms
+            if latency_ms > self.max_ms:
+                self.max_ms = latency_ms
+
+    def merge(self, other):
+        """Suma los buckets de otro histograma de la misma precisión."""
+        if other.precision != self.precision:
+            raise ValueError("Solo se pueden combinar histogramas con la misma precisión")
+        with other._lock:
+            counts = dict(other.counts)
+            count, total_ms, max_ms = other.count, other.total_ms, other.max_ms
+        with self._lock:
+            for index, n in counts.items():
+                self.counts[index] = self.counts.get(index, 0) + n
+            self.count += count
+            self.total_ms += total_ms
+            self.max_ms = max(self.max_ms, max_ms)
+        return self
+
+    def percentile(self, pct):
+        with self._lock:
+            if self.count == 0:
+                return 0.0
+            rank = max(1, math.ceil(self.count * pct / 100))
+            seen = 0
+            for index in sorted(self.counts):
+                seen += self.counts[index]
+                if seen >= rank:
+                    return min(self._value(index), self.max_ms)
+            return self.max_ms
+
+    def summary(self):
+        """count, media, p50/p90/p99/p999 y máximo, en ms."""
+        result = {"count": self.count,
+                  "mean_ms": self.total_ms / self.count if self.count else 0.0}
+        for name, pct in PERCENTILES:
+            result[name] = self.percentile(pct)
+        result["max_ms"] = self.max_ms
+        return result
+
+    def to_dict(self):
+        with self._lock:
+            return {"precision": self.precision, "count": self.count,
+                    "total_ms": self.total_ms, "max_ms": self.max_ms,
+                    "counts": {str(index): n for index, n in self.counts.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        hist = cls(precision=data["precision"])
+        hist.counts = {int(index): n for index, n in data["counts"].items()}
+        hist.count = data["count"]
+        hist.total_ms = data["total_ms"]
+        hist.max_ms = data["max_ms"]
+        return hist
+
+# --------------------------------------------------------------------------
+# Registro por Operación
+# --------------------------------------------------------------------------
+
+
+class LatencyRecorder:
+    """
+    Un histograma acumulado y otro de la ventana actual por operación
+    (get_event, save, get_analytics, db_fallback, ...). roll_window()
+    entrega la ventana transcurrida y abre una nueva, para reportar
+    percentiles por intervalo sin perder los acumulados.
+    """
+    def __init__(self, precision=LATENCY_PRECISION):
+        self.precision = precision
+        self._lock = threading.Lock()
+        self._total = {}
+        self._window = {}
+        self.window_start = time.time()
+
+    def _histograms(self, op):
+        hists = self._total.get(op)
+        if hists is None:
+            with self._lock:
+                if op not in self._total:
+                    self._window[op] = LatencyHistogram(self.precision)
+                    self._total[op] = LatencyHistogram(self.precision)
+                hists = self._total[op]
+        return hists, self._window[op]
+
+    def record(self, op, latency_ms):
+        total, window = self._histograms(op)
+        total.record(latency_ms)
+        window.record(latency_ms)
+
+    def roll_window(self):
+        """Devuelve ({op: histograma}, segundos) de la ventana y la reinicia."""
+        with self._lock:
+            window, now = self._window, time.time()
+            elapsed = now - self.window_start
+            self._window = {op: LatencyHistogram(self.precision) for op in self._total}
+            self.window_start = now
+        return window, elapsed
+
+    def merged(self, ops=None):
+        """Histograma acumulado combinando las operaciones indicadas (o todas)."""
+        result = LatencyHistogram(self.precision)
+        for op, hist in list(self._total.items()):
+            if ops is None or op in ops:
+                result.merge(hist)
+        return result
+
+    def snapshot(self):
+        """Resumen acumulado por operación."""
+        return {op: hist.summary() for op, hist in list(self._total.items())}
+
+    def to_dict(self):
+        return {op: hist.to_dict() for op, hist in list(self._total.items())}
+
+    def merge_dict(self, data):
+        """Incorpora los acumulados exportados por otro proceso."""
+        for op, hist_data in data.items():
+            total, _ = self._histograms(op)
+            total.merge(LatencyHistogram.from_dict(hist_data))
+
+    def dump(self, path):
+        """Persiste los acumulados para combinarlos luego (p. ej. en es_loader)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+
+def merge_histograms(histograms):
+    """Combina una colección de histogramas en uno nuevo."""
+    result = None
+    for hist in histograms:
+        if result is None:
+            result = LatencyHistogram(hist.precision)
+        result.merge(hist)
+    return result if result is not None else LatencyHistogram()
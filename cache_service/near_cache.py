@@ -0,0 +1,214 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict, defaultdict
+
+# --------------------------------------------------------------------------
+# Configuración de la Caché L1 (en proceso)
+# --------------------------------------------------------------------------
+
+L1_MAX_KEYS = int(os.getenv('L1_MAX_KEYS', '1000'))
+L1_TTL_SECONDS = float(os.getenv('L1_TTL_SECONDS', '5'))
+L1_POLICY = os.getenv('L1_POLICY', 'lru')
+L1_INVALIDATION = os.getenv('L1_INVALIDATION', 'pubsub')
+INVALIDATION_CHANNEL = "cache:invalidate"
+# Segundos durante los que el 'set' de keyspace de una escritura propia se ignora
+L1_OWN_WRITE_SECONDS = float(os.getenv('L1_OWN_WRITE_SECONDS', '2'))
+
+# --------------------------------------------------------------------------
+# Caché Cercana Acotada (LRU / LFU con TTL)
+# --------------------------------------------------------------------------
+
+
+class NearCache:
+    """
+    Caché en memoria del proceso, acotada a 'max_keys' entradas y con TTL
+    propio. Con policy='lru' desaloja la menos reciente; con policy='lfu'
+    la menos frecuente (empates por antigüedad), ambas en O(1).
+    """
+    def __init__(self, max_keys=L1_MAX_KEYS, ttl_seconds=L1_TTL_SECONDS, policy=L1_POLICY):
+        self.max_keys = max_keys
+        self.ttl_seconds = ttl_seconds
+        self.policy = policy
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._lru = OrderedDict()
+        self._freq = {}
+        self._buckets = defaultdict(OrderedDict)
+        self._min_freq = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _touch(self, key):
+        if self.policy == 'lfu':
+            freq = self._freq[key]
+            del self._buckets[freq][key]
+            if not self._buckets[freq]:
+                del self._buckets[freq]
+                if self._min_freq == freq:
+                    self._min_freq = freq + 1
+            self._freq[key] = freq + 1
+            self._buckets[freq + 1][key] = None
+        else:
+            self._lru.move_to_end(key)
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        if self.policy == 'lfu':
+            freq = self._freq.pop(key, None)
+            if freq is not None:
+                del self._buckets[freq][key]
+                if not self._buckets[freq]:
+                    del self._buckets[freq]
+        else:
+            self._lru.pop(key, None)
+
+    def _evict(self):
+        if self.policy == 'lfu':
+            if self._min_freq not in self._buckets:
+                self._min_freq = min(self._buckets)
+            key = next(iter(self._buckets[self._min_freq]))
+        else:
+            key = next(iter(self._lru))
+        self._remove(key)
+
+    def get(self, key):
+        """Devuelve el valor si está vigente; None si no está o expiró."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                self._remove(key)
+                return None
+            self._touch(key)
+            return value
+
+    def set(self, key, value):
+        """Inserta o actualiza una entrada, desalojando si se supera el límite."""
+        with self._lock:
+            if key in self._entries:
+                self._entries[key] = (value, time.time() + self.ttl_seconds)
+                self._touch(key)
+                return
+            if len(self._entries) >= self.max_keys:
+                self._evict()
+            self._entries[key] = (value, time.time() + self.ttl_seconds)
+            if self.policy == 'lfu':
+                self._freq[key] = 1
+                self._buckets[1][key] = None
+                self._min_freq = 1
+            else:
+                self._lru[key] = None
+
+    def invalidate(self, key):
+        """Elimina una entrada (p. ej. al recibir una invalidación desde Redis)."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._lru.clear()
+            self._freq.clear()
+            self._buckets.clear()
+            self._min_freq = 0
+
+# --------------------------------------------------------------------------
+# Invalidación vía Redis
+# --------------------------------------------------------------------------
+
+
+class InvalidationListener:
+    """
+    Escucha invalidaciones en un hilo de fondo y las aplica sobre la L1.
+    Con mode='pubsub' las escrituras de CacheMiddleware publican las llaves
+    en INVALIDATION_CHANNEL (ignorando las propias); con mode='keyspace' se
+    usan las notificaciones de Redis para set/del/expired/evicted, lo que
+    también cubre escrituras hechas fuera del middleware; el 'set' que
+    generan las escrituras propias (anotadas con own_writes antes de
+    hacerlas) se ignora para no desalojar la entrada recién escrita en la
+    L1. 'key_of' traduce la llave de Redis a la de la L1 (p. ej. quitando
+    el prefijo del codec).
+    """
+    KEYEVENTS = ("set", "del", "expired", "evicted")
+
+    def __init__(self, client, near_cache, mode=L1_INVALIDATION, key_of=None):
+        self.client = client
+        self.near_cache = near_cache
+        self.mode = mode
+        self.key_of = key_of or (lambda key: key)
+        self.instance_id = uuid.uuid4().hex
+        self._pubsub = None
+        self._thread = None
+        # llave -> (escrituras propias pendientes de su 'set', vencimiento)
+        self._own_writes = {}
+        self._own_lock = threading.Lock()
+
+    def start(self):
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        if self.mode == 'keyspace':
+            try:
+                self.client.config_set('notify-keyspace-events', 'E$gxe')
+            except Exception as e:
+                print(f"No se pudieron activar las notificaciones de keyspace: {e}")
+            self._pubsub.psubscribe(**{
+                f"__keyevent@*__:{event}": self._on_keyevent for event in self.KEYEVENTS})
+        else:
+            self._pubsub.subscribe(**{INVALIDATION_CHANNEL: self._on_message})
+        self._thread = self._pubsub.run_in_thread(sleep_time=0.1, daemon=True)
+
+    def stop(self):
+        if self._thread:
+            self._thread.stop()
+            self._thread = None
+        if self._pubsub:
+            self._pubsub.close()
+            self._pubsub = None
+
+    def own_writes(self, keys):
+        """Anota llaves que este proceso está por escribir en Redis (modo keyspace)."""
+        if self.mode != 'keyspace':
+            return
+        expires_at = time.monotonic() + L1_OWN_WRITE_SECONDS
+        with self._own_lock:
+            for key in keys:
+                pending, _ = self._own_writes.get(key, (0, 0))
+                self._own_writes[key] = (pending + 1, expires_at)
+
+    def _consume_own_write(self, key):
+        """True si el 'set' de 'key' corresponde a una escritura propia reciente."""
+        now = time.monotonic()
+        with self._own_lock:
+            entry = self._own_writes.pop(key, None)
+            if entry is None or entry[1] < now:
+                return False
+            if entry[0] > 1:
+                self._own_writes[key] = (entry[0] - 1, entry[1])
+            if len(self._own_writes) > self.near_cache.max_keys:
+                self._own_writes = {k: v for k, v in self._own_writes.items() if v[1] >= now}
+            return True
+
+    def publish(self, keys):
+        """Anuncia a las demás instancias que estas llaves cambiaron."""
+        if self.mode != 'pubsub' or not keys:
+            return
+        self.client.publish(INVALIDATION_CHANNEL,
+                            f"{self.instance_id}|" + "\n".join(keys))
+
+    def _on_message(self, message):
+        sender, _, payload = message['data'].partition('|')
+        if sender == self.instance_id:
+            return
+        for key in payload.split("\n"):
+            self.near_cache.invalidate(key)
+
+    def _on_keyevent(self, message):
+        key = self.key_of(message['data'])
+        if message['channel'].endswith(':set') and self._consume_own_write(key):
+            return
+        self.near_cache.invalidate(key)
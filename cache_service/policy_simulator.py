@@ -0,0 +1,379 @@
+import os
+import sys
+import csv
+import json
+import time
+import hashlib
+from collections import OrderedDict, defaultdict
+
+# --------------------------------------------------------------------------
+# Configuración del Simulador
+# --------------------------------------------------------------------------
+# Reproduce offline una traza de llaves (la de CACHE_TRACE_FILE o una traza
+# estilo requests.jsonl) contra varias políticas de desalojo y tamaños, para
+# elegir maxmemory y maxmemory-policy antes de desplegar.
+#
+# Uso: python -m cache_service.policy_simulator <traza> [tamaños separados por coma]
+
+SIM_POLICIES = os.getenv('SIM_POLICIES', 'lru,lfu,fifo,arc,2q,wtinylfu').split(',')
+# Sin tamaños explícitos se barre una fracción de las llaves únicas de la traza
+SIM_SIZE_FRACTIONS = [float(f) for f in os.getenv(
+    'SIM_SIZE_FRACTIONS', '0.01,0.02,0.05,0.1,0.2,0.5').split(',')]
+RESULTS_FILE = "results/policy_simulation.csv"
+
+# Operaciones de la traza que son escrituras y no cuentan como acceso
+WRITE_OPS = {"save", "set", "save_many"}
+
+# --------------------------------------------------------------------------
+# Políticas (capacidad en número de llaves)
+# --------------------------------------------------------------------------
+
+
+class LRUPolicy:
+    """Desaloja la llave usada hace más tiempo."""
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+
+    def access(self, key):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return True
+        self._entries[key] = None
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+        return False
+
+
+class FIFOPolicy:
+    """Desaloja la llave insertada hace más tiempo, sin importar sus accesos."""
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+
+    def access(self, key):
+        if key in self._entries:
+            return True
+        self._entries[key] = None
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+        return False
+
+
+class LFUPolicy:
+    """LFU en O(1) con listas por frecuencia; empates por antigüedad."""
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._freq = {}
+        self._buckets = defaultdict(OrderedDict)
+        self._min_freq = 0
+
+    def access(self, key):
+        freq = self._freq.get(key)
+        if freq is not None:
+            del self._buckets[freq][key]
+            if not self._buckets[freq]:
+                del self._buckets[freq]
+                if self._min_freq == freq:
+                    self._min_freq = freq + 1
+            self._freq[key] = freq + 1
+            self._buckets[freq + 1][key] = None
+            return True
+
+        if len(self._freq) >= self.capacity:
+            victim, _ = self._buckets[self._min_freq].popitem(last=False)
+            if not self._buckets[self._min_freq]:
+                del self._buckets[self._min_freq]
+            del self._freq[victim]
+        self._freq[key] = 1
+        self._buckets[1][key] = None
+        self._min_freq = 1
+        return False
+
+
+class ARCPolicy:
+    """
+    Adaptive Replacement Cache (Megiddo y Modha): T1/T2 guardan llaves vistas
+    una y varias veces, B1/B2 son sus fantasmas y 'p' se adapta según en
+    cuál fantasma ocurren los aciertos.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.p = 0
+        self.t1, self.t2 = OrderedDict(), OrderedDict()
+        self.b1, self.b2 = OrderedDict(), OrderedDict()
+
+    def _replace(self, in_b2):
+        if not self.t1 and not self.t2:
+            return
+        if self.t1 and (not self.t2 or len(self.t1) > self.p
+                        or (in_b2 and len(self.t1) == self.p)):
+            key, _ = self.t1.popitem(last=False)
+            self.b1[key] = None
+        else:
+            key, _ = self.t2.popitem(last=False)
+            self.b2[key] = None
+
+    def access(self, key):
+        c = self.capacity
+        if key in self.t1:
+            del self.t1[key]
+            self.t2[key] = None
+            return True
+        if key in self.t2:
+            self.t2.move_to_end(key)
+            return True
+
+        if key in self.b1:
+            self.p = min(c, self.p + max(len(self.b2) // len(self.b1), 1))
+            self._replace(False)
+            del self.b1[key]
+            self.t2[key] = None
+            return False
+        if key in self.b2:
+            self.p = max(0, self.p - max(len(self.b1) // len(self.b2), 1))
+            self._replace(True)
+            del self.b2[key]
+            self.t2[key] = None
+            return False
+
+        l1 = len(self.t1) + len(self.b1)
+        if l1 == c:
+            if len(self.t1) < c:
+                self.b1.popitem(last=False)
+                self._replace(False)
+            else:
+                self.t1.popitem(last=False)
+        elif l1 < c:
+            total = l1 + len(self.t2) + len(self.b2)
+            if total >= c:
+                if total == 2 * c:
+                    self.b2.popitem(last=False)
+                self._replace(False)
+        self.t1[key] = None
+        return False
+
+
+class TwoQPolicy:
+    """
+    2Q completo (Johnson y Shasha): las llaves nuevas entran a A1in (FIFO);
+    al salir quedan como fantasmas en A1out, y solo un nuevo acceso desde
+    ahí las promueve a Am (LRU).
+    """
+    def __init__(self, capacity, kin=0.25, kout=0.5):
+        self.capacity = capacity
+        self.kin = max(1, int(capacity * kin))
+        self.kout = max(1, int(capacity * kout))
+        self.a1in, self.a1out, self.am = OrderedDict(), OrderedDict(), OrderedDict()
+
+    def _reclaim(self):
+        if len(self.a1in) + len(self.am) < self.capacity:
+            return
+        if len(self.a1in) > self.kin or not self.am:
+            key, _ = self.a1in.popitem(last=False)
+            self.a1out[key] = None
+            if len(self.a1out) > self.kout:
+                self.a1out.popitem(last=False)
+        else:
+            self.am.popitem(last=False)
+
+    def access(self, key):
+        if key in self.am:
+            self.am.move_to_end(key)
+            return True
+        if key in self.a1in:
+            return True
+        if key in self.a1out:
+            del self.a1out[key]
+            self._reclaim()
+            self.am[key] = None
+            return False
+        self._reclaim()
+        self.a1in[key] = None
+        return False
+
+
+class CountMinSketch:
+    """
+    Frecuencias aproximadas con 4 filas y envejecimiento periódico (reset a
+    la mitad). Cada fila usa blake2b con su propia sal: hashes estables entre
+    procesos (hash() de Python cambia con PYTHONHASHSEED) e independientes
+    entre filas.
+    """
+    SALTS = tuple(f"cms-row-{i}".encode() for i in range(4))
+
+    def __init__(self, capacity, max_count=15):
+        self.width = max(16, 1 << (max(1, capacity) * 2 - 1).bit_length())
+        self.rows = [[0] * self.width for _ in self.SALTS]
+        self.max_count = max_count
+        self.sample_size = 10 * max(1, capacity)
+        self.additions = 0
+
+    def _slots(self, key):
+        data = str(key).encode()
+        mask = self.width - 1
+        return [int.from_bytes(hashlib.blake2b(data, digest_size=8, salt=salt).digest(),
+                               'little') & mask for salt in self.SALTS]
+
+    def increment(self, key):
+        for row, slot in zip(self.rows, self._slots(key)):
+            if row[slot] < self.max_count:
+                row[slot] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.rows = [[count >> 1 for count in row] for row in self.rows]
+            self.additions //= 2
+
+    def estimate(self, key):
+        return min(row[slot] for row, slot in zip(self.rows, self._slots(key)))
+
+
+class WTinyLFUPolicy:
+    """
+    W-TinyLFU (Einziger et al., el de Caffeine): una ventana LRU pequeña
+    absorbe ráfagas y sus expulsados solo entran a la región principal
+    (SLRU probation/protected) si el sketch estima que son más frecuentes
+    que la víctima de probation.
+    """
+    def __init__(self, capacity, window=0.01, protected=0.8):
+        self.capacity = capacity
+        self.window_cap = max(1, int(capacity * window))
+        main_cap = max(1, capacity - self.window_cap)
+        self.protected_cap = max(1, int(main_cap * protected))
+        self.main_cap = main_cap
+        self.window, self.probation, self.protected = OrderedDict(), OrderedDict(), OrderedDict()
+        self.sketch = CountMinSketch(capacity)
+
+    def access(self, key):
+        self.sketch.increment(key)
+        if key in self.window:
+            self.window.move_to_end(key)
+            return True
+        if key in self.protected:
+            self.protected.move_to_end(key)
+            return True
+        if key in self.probation:
+            del self.probation[key]
+            self.protected[key] = None
+            if len(self.protected) > self.protected_cap:
+                demoted, _ = self.protected.popitem(last=False)
+                self.probation[demoted] = None
+            return True
+
+        self.window[key] = None
+        if len(self.window) <= self.window_cap:
+            return False
+        candidate, _ = self.window.popitem(last=False)
+        if len(self.probation) + len(self.protected) < self.main_cap:
+            self.probation[candidate] = None
+            return False
+
+        victim = next(iter(self.probation)) if self.probation else next(iter(self.protected))
+        if self.sketch.estimate(candidate) > self.sketch.estimate(victim):
+            if victim in self.probation:
+                del self.probation[victim]
+            else:
+                del self.protected[victim]
+            self.probation[candidate] = None
+        return False
+
+
+POLICIES = {
+    'lru': LRUPolicy,
+    'lfu': LFUPolicy,
+    'fifo': FIFOPolicy,
+    'arc': ARCPolicy,
+    '2q': TwoQPolicy,
+    'wtinylfu': WTinyLFUPolicy,
+}
+
+# --------------------------------------------------------------------------
+# Trazas y Simulación
+# --------------------------------------------------------------------------
+
+
+def trace_key(record):
+    """Llave de un registro de traza JSON (None si es una escritura)."""
+    if record.get("op") in WRITE_OPS:
+        return None
+    if record.get("key") is not None:
+        return record["key"]
+    if record.get("uuid") is not None:
+        return record["uuid"]
+    if record.get("report") is not None:
+        return f"analytics:{record['report']}"
+    return None
+
+
+def load_trace(path):
+    """
+    Lee una traza: JSON por línea (campos 'key', 'uuid' o 'report'; las
+    entradas con 'keys' se expanden) o una llave por línea en texto plano.
+    """
+    keys = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if not line.startswith('{'):
+                keys.append(line)
+                continue
+            record = json.loads(line)
+            if record.get("keys") and record.get("op") not in WRITE_OPS:
+                keys.extend(record["keys"])
+                continue
+            key = trace_key(record)
+            if key is not None:
+                keys.append(key)
+    return keys
+
+
+def simulate(trace, policy, capacity):
+    """Reproduce la traza y devuelve la cantidad de aciertos."""
+    cache = POLICIES[policy](capacity)
+    access = cache.access
+    return sum(1 for key in trace if access(key))
+
+
+def default_sizes(trace):
+    unique = len(set(trace))
+    return sorted({max(1, int(unique * fraction)) for fraction in SIM_SIZE_FRACTIONS})
+
+
+def run_simulation(trace, sizes=None, policies=None, output=RESULTS_FILE):
+    """
+    Barre políticas x tamaños y escribe la curva de hit rate por tamaño en
+    'output'. Devuelve las filas (policy, size, hits, hit_rate, elapsed_ms).
+    """
+    sizes = sizes or default_sizes(trace)
+    policies = policies or SIM_POLICIES
+    rows = []
+    print(f"--- SIMULANDO {len(trace)} accesos ({len(set(trace))} llaves únicas) ---")
+    for policy in policies:
+        for size in sizes:
+            start = time.perf_counter()
+            hits = simulate(trace, policy, size)
+            elapsed = (time.perf_counter() - start) * 1000
+            hit_rate = hits / len(trace) * 100 if trace else 0
+            rows.append((policy, size, hits, hit_rate, elapsed))
+            print(f"{policy:>9} size={size:<8} hit rate {hit_rate:6.2f}%  ({elapsed:.0f} ms)")
+
+    if output:
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, mode='w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["policy", "cache_size", "requests", "hits", "hit_rate", "elapsed_ms"])
+            for policy, size, hits, hit_rate, elapsed in rows:
+                writer.writerow([policy, size, len(trace), hits, round(hit_rate, 3),
+                                 round(elapsed, 1)])
+        print(f"Curvas de hit rate exportadas a: {output}")
+    return rows
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python -m cache_service.policy_simulator <traza> [tamaños]")
+        sys.exit(1)
+    cli_sizes = [int(n) for n in sys.argv[2].split(',')] if len(sys.argv) > 2 else None
+    run_simulation(load_trace(sys.argv[1]), cli_sizes)
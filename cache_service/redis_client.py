@@ -1,7 +1,17 @@
 import os
+import math
 import time
 import json
+import atexit
+import random
+import threading
 import redis
+from concurrent.futures import ThreadPoolExecutor
+from cache_service.near_cache import NearCache, InvalidationListener
+from cache_service.codecs import get_codec, codec_label
+from cache_service.latency import LatencyRecorder
+from cache_service import analytics_store
+from cache_service.warmup import PopularityTracker, POPULARITY_TRACKING
 
 # --------------------------------------------------------------------------
 # Configuración
@@ -10,6 +20,30 @@ import redis
 REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
 REDIS_PORT = 6379
 TTL_SECONDS = 60
+L1_CACHE = os.getenv('L1_CACHE', '0') == '1'
+
+# Read-through: los uuids inexistentes se cachean brevemente con un centinela
+NEGATIVE_TTL_SECONDS = int(os.getenv('NEGATIVE_TTL_SECONDS', '5'))
+NEGATIVE_SENTINEL = "__not_found__"
+_NEGATIVE_SENTINEL_BYTES = NEGATIVE_SENTINEL.encode()
+LOAD_TIMEOUT_SECONDS = float(os.getenv('LOAD_TIMEOUT_SECONDS', '5'))
+
+# Expiración: jitter relativo sobre TTL_SECONDS para que las llaves cargadas
+# en una misma ráfaga no expiren juntas; ventana stale-while-revalidate
+# durante la cual se sirve el valor vencido mientras un único refresco en
+# segundo plano lo repone; y refresco anticipado probabilístico (XFetch)
+# con intensidad XFETCH_BETA (0 lo desactiva).
+TTL_JITTER = float(os.getenv('TTL_JITTER', '0'))
+SWR_SECONDS = float(os.getenv('SWR_SECONDS', '0'))
+XFETCH_BETA = float(os.getenv('XFETCH_BETA', '0'))
+REFRESH_WORKERS = int(os.getenv('REFRESH_WORKERS', '4'))
+
+# Codec con que se cargaron las analíticas (sin prefijo, legible con cualquier
+# CACHE_CODEC): sus llaves 'analytics:*' solo se encuentran con el mismo codec
+ANALYTICS_CODEC_KEY = "analytics:codec"
+
+# Traza de accesos (JSON por línea) para cache_service.policy_simulator
+CACHE_TRACE_FILE = os.getenv('CACHE_TRACE_FILE')
 
 # --------------------------------------------------------------------------
 # Middleware de Caché
@@ -22,11 +56,119 @@ class CacheMiddleware:
     """
     def __init__(self):
         self.client = None
-        self.stats = {"hits": 0, "misses": 0, "total_time": 0}
+        # Con un codec binario los valores se leen con un cliente sin decode_responses
+        self.value_client = None
+        self.codec = get_codec()
+        # 'hits' agrupa L1 + L2; 'misses' son las consultas sin el valor en
+        # caché, incluidos los negativos cacheados ('negative_hits', sin DB)
+        self.stats = {"hits": 0, "misses": 0, "total_time": 0,
+                      "l1_hits": 0, "l2_hits": 0, "negative_hits": 0, "coalesced": 0,
+                      "stale_served": 0, "early_refreshes": 0}
+        # Histogramas por operación: get_event, save, get_analytics, db_fallback
+        self.latency = LatencyRecorder()
+        self.l1 = None
+        self._invalidator = None
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._trace = None
+        self._trace_lock = threading.Lock()
+        self._trace_atexit = False
+        # Refrescos en segundo plano (a lo más uno en curso por llave)
+        self._refreshing = set()
+        self._refresher = None
+        self._recompute_ms = None
+        self.analytics = None
+        # Conteo de accesos por uuid, persistido para el warm-up (cache_service.warmup)
+        self.popularity = PopularityTracker() if POPULARITY_TRACKING else None
 
         print(
-            f"Configuración detectada -> Host Redis: '{REDIS_HOST}' Puerto: {REDIS_PORT}")
+            f"Configuración detectada -> Host Redis: '{REDIS_HOST}' Puerto: {REDIS_PORT}"
+            f" | Codec: {self.codec.name}")
         self._connect_with_retries()
+        if L1_CACHE:
+            self.enable_l1()
+        if CACHE_TRACE_FILE:
+            self.enable_trace(CACHE_TRACE_FILE)
+        if self.popularity is not None:
+            atexit.register(self.save_popularity)
+
+    def enable_trace(self, path):
+        """Registra cada lectura en 'path' para simular políticas offline."""
+        self.disable_trace()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._trace = open(path, 'a', encoding='utf-8')
+        if not self._trace_atexit:
+            atexit.register(self.disable_trace)
+            self._trace_atexit = True
+        print(f"Capturando traza de accesos en: {path}")
+
+    def disable_trace(self):
+        with self._trace_lock:
+            if self._trace:
+                self._trace.close()
+                self._trace = None
+
+    def save_popularity(self):
+        """Persiste los conteos de acceso acumulados (ver cache_service.warmup)."""
+        if self.popularity is None:
+            return
+        try:
+            self.popularity.save()
+        except Exception as e:
+            print(f"No se pudo persistir la popularidad de las llaves: {e}")
+
+    def _record_access(self, op, keys):
+        if self.popularity is not None and op != "get_analytics":
+            self.popularity.record(keys)
+        if self._trace is None:
+            return
+        record = {"ts": round(time.time(), 6), "op": op}
+        if len(keys) == 1:
+            record["key"] = keys[0]
+        else:
+            record["keys"] = list(keys)
+        with self._trace_lock:
+            if self._trace:
+                self._trace.write(json.dumps(record) + "\n")
+
+    def enable_l1(self, max_keys=None, ttl_seconds=None, policy=None):
+        """
+        Activa la caché L1 en proceso delante de Redis, con invalidación por
+        pub/sub o notificaciones de keyspace (ver cache_service.near_cache).
+        """
+        kwargs = {k: v for k, v in (("max_keys", max_keys), ("ttl_seconds", ttl_seconds),
+                                    ("policy", policy)) if v is not None}
+        self.disable_l1()
+        self.l1 = NearCache(**kwargs)
+        if self.client:
+            try:
+                self._invalidator = InvalidationListener(
+                    self.client, self.l1, key_of=self.codec.strip)
+                self._invalidator.start()
+            except Exception as e:
+                print(f"Invalidación de L1 no disponible ({e}); solo se aplicará su TTL.")
+                self._invalidator = None
+        print(
+            f"Caché L1 activada ({self.l1.policy.upper()}, {self.l1.max_keys} llaves, TTL {self.l1.ttl_seconds}s)")
+
+    def disable_l1(self):
+        """Desactiva la caché L1 (modo solo L2)."""
+        if self._invalidator:
+            self._invalidator.stop()
+            self._invalidator = None
+        self.l1 = None
+
+    def _own_writes(self, keys):
+        """Avisa al listener de keyspace de escrituras propias (ver near_cache)."""
+        if self._invalidator:
+            self._invalidator.own_writes(keys)
+
+    def _publish_invalidation(self, keys):
+        if self._invalidator:
+            try:
+                self._invalidator.publish(keys)
+            except Exception as e:
+                print(f"No se pudo publicar la invalidación: {e}")
 
     def _connect_with_retries(self):
         """Intenta conectar con Redis con varios reintentos."""
@@ -36,36 +178,54 @@ class CacheMiddleware:
                 self.client = redis.Redis(
                     host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
                 self.client.ping()
+                self.value_client = self.client
+                self.analytics = analytics_store.AnalyticsReader(self.client)
+                if self.codec.binary:
+                    self.value_client = redis.Redis(
+                        host=REDIS_HOST, port=REDIS_PORT, decode_responses=False)
                 print(f"¡Conexión exitosa a Redis en '{REDIS_HOST}'!")
                 return
             except redis.ConnectionError as e:
                 print(
                     f"Intento {i+1}/{max_retries} fallido conectando a Redis ({e}). Reintentando en 2s...")
                 self.client = None
+                self.value_client = None
+                self.analytics = None
                 time.sleep(2)
             except Exception as e:
                 print(f"Error desconocido en Redis: {e}")
 
         print("ERROR: No se pudo conectar a Redis tras varios intentos. El Cache estará DESACTIVADO.")
 
-    def get_event(self, event_uuid):
+    def get_event(self, event_uuid, loader=None):
         """
         Obtiene un evento desde el caché. Si no lo encuentra, incrementa el
-        contador de misses.
+        contador de misses. Con SWR_SECONDS o XFETCH_BETA, un acierto vencido
+        o próximo a vencer se refresca en segundo plano con 'loader' (como en
+        get_or_load).
         """
         start_time = time.time()
         result = None
         source = "DB"
+        self._record_access("get_event", [event_uuid])
+
+        if self.l1 is not None:
+            result = self.l1.get(event_uuid)
+            if result is not None:
+                source = self._count_cached(result, "l1")
+                elapsed = (time.time() - start_time) * 1000
+                self.stats["total_time"] += elapsed
+                self.latency.record("get_event", elapsed)
+                return source, elapsed
 
         if not self.client:
             return "DB (Cache Down)", 0
 
         try:
-            cached_data = self.client.get(event_uuid)
+            cached_data, pttl = self._get_with_ttl(event_uuid)
             if cached_data:
-                self.stats["hits"] += 1
-                result = json.loads(cached_data)
-                source = "CACHE"
+                result = self._decode(cached_data)
+                source = self._revalidate(event_uuid, result, pttl, loader)
             else:
                 self.stats["misses"] += 1
 
@@ -75,40 +235,399 @@ class CacheMiddleware:
 
         elapsed = (time.time() - start_time) * 1000
         self.stats["total_time"] += elapsed
+        self.latency.record("get_event", elapsed)
         return source, elapsed
 
     def save_to_cache(self, event_uuid, data_dict):
         """Guarda datos en el caché con un TTL (Time To Live) definido."""
+        if self.l1 is not None:
+            self.l1.set(event_uuid, data_dict)
         if self.client:
+            start_time = time.time()
             try:
-                self.client.setex(event_uuid, TTL_SECONDS,
-                                  json.dumps(data_dict))
+                self._own_writes([event_uuid])
+                self.value_client.set(self.codec.key(event_uuid),
+                                      self.codec.encode(data_dict), px=self._ttl_ms())
+                self._publish_invalidation([event_uuid])
+                self.latency.record("save", (time.time() - start_time) * 1000)
             except Exception as e:
                 print(f"No se pudo guardar en cache: {e}")
 
+    def get_events(self, event_uuids, loader=None):
+        """
+        Versión por lotes de get_event: resuelve todos los uuids con un solo
+        MGET. Devuelve una lista de (uuid, source, latency_ms) en el mismo
+        orden; la latencia de cada llave es la del viaje completo del lote,
+        que es lo que esperó cada solicitud. Los aciertos vencidos se
+        refrescan con 'loader' igual que en get_event.
+        """
+        if not event_uuids:
+            return []
+
+        start_time = time.time()
+        results = {}
+        from_l1 = set()
+        pending = list(event_uuids)
+        self._record_access("get_events", event_uuids)
+        if self.l1 is not None:
+            pending = []
+            for uuid in event_uuids:
+                cached = self.l1.get(uuid)
+                if cached is not None:
+                    results[uuid] = "NEGATIVE" if cached == NEGATIVE_SENTINEL else "L1"
+                    from_l1.add(uuid)
+                else:
+                    pending.append(uuid)
+
+        l1_elapsed = (time.time() - start_time) * 1000
+        cached_values, pttls = [], []
+        if pending and not self.client:
+            return self._batch_results(event_uuids, results, from_l1, "DB (Cache Down)",
+                                       l1_elapsed, 0)
+        if pending:
+            try:
+                cached_values, pttls = self._mget_with_ttl(pending)
+            except redis.ConnectionError:
+                print("Error de conexión leyendo Cache")
+                elapsed = (time.time() - start_time) * 1000
+                return self._batch_results(event_uuids, results, from_l1, "DB (Redis Error)",
+                                           l1_elapsed, elapsed)
+
+        for uuid, cached_data, pttl in zip(pending, cached_values, pttls):
+            if cached_data:
+                cached = self._decode(cached_data)
+                if cached == NEGATIVE_SENTINEL:
+                    results[uuid] = "NEGATIVE"
+                    if self.l1 is not None:
+                        self.l1.set(uuid, cached)
+                else:
+                    results[uuid] = self._revalidate(uuid, cached, pttl, loader, count=False)
+            else:
+                results[uuid] = "DB"
+
+        elapsed = (time.time() - start_time) * 1000
+        return self._batch_results(event_uuids, results, from_l1, "DB", l1_elapsed, elapsed)
+
+    def _batch_results(self, event_uuids, sources, from_l1, default_source, l1_elapsed, elapsed):
+        """Contabiliza hits/misses por llave y arma la respuesta de get_events."""
+        results = []
+        for uuid in event_uuids:
+            source = sources.get(uuid, default_source)
+            latency = l1_elapsed if uuid in from_l1 else elapsed
+            if source == "L1":
+                self.stats["hits"] += 1
+                self.stats["l1_hits"] += 1
+            elif source.startswith("CACHE"):
+                self.stats["hits"] += 1
+                self.stats["l2_hits"] += 1
+            elif source == "NEGATIVE":
+                self.stats["misses"] += 1
+                self.stats["negative_hits"] += 1
+            elif source == "DB":
+                self.stats["misses"] += 1
+            if source in ("L1", "CACHE", "CACHE (stale)", "NEGATIVE", "DB"):
+                self.stats["total_time"] += latency
+                self.latency.record("get_event", latency)
+            results.append((uuid, source, latency))
+        return results
+
+    def save_many(self, items):
+        """
+        Guarda varios eventos con su TTL en un solo pipeline. 'items' es un
+        dict {uuid: data_dict} o una lista de pares (uuid, data_dict).
+        """
+        if not items:
+            return
+        pairs = list(items.items() if isinstance(items, dict) else items)
+        if self.l1 is not None:
+            for event_uuid, data_dict in pairs:
+                self.l1.set(event_uuid, data_dict)
+        if not self.client:
+            return
+        start_time = time.time()
+        try:
+            self._own_writes([event_uuid for event_uuid, _ in pairs])
+            pipe = self.value_client.pipeline(transaction=False)
+            for event_uuid, data_dict in pairs:
+                pipe.set(self.codec.key(event_uuid), self.codec.encode(data_dict),
+                         px=self._ttl_ms())
+            pipe.execute()
+            self._publish_invalidation([event_uuid for event_uuid, _ in pairs])
+            self.latency.record("save", (time.time() - start_time) * 1000)
+        except Exception as e:
+            print(f"No se pudo guardar el lote en cache: {e}")
+
+    def get_or_load(self, event_uuid, loader=None):
+        """
+        Lectura read-through: L1 -> Redis -> PostgreSQL. En un miss, las
+        cargas concurrentes de la misma llave se agrupan en una sola consulta
+        (single-flight) y los uuids inexistentes se cachean
+        NEGATIVE_TTL_SECONDS. 'loader' recibe una lista de uuids y devuelve
+        {uuid: evento} o None ante error (por defecto, WazePostgresClient).
+        Con SWR_SECONDS o XFETCH_BETA, los aciertos vencidos o próximos a
+        vencer se refrescan en segundo plano sin bloquear la lectura.
+        Devuelve (evento o None, source, latency_ms).
+        """
+        start_time = time.time()
+        self._record_access("get_event", [event_uuid])
+
+        if self.l1 is not None:
+            cached = self.l1.get(event_uuid)
+            if cached is not None:
+                self._count_cached(cached, "l1")
+                return self._finish_load(cached, "L1", start_time)
+
+        if self.client:
+            try:
+                cached_data, pttl = self._get_with_ttl(event_uuid)
+                if cached_data:
+                    cached = self._decode(cached_data)
+                    source = self._revalidate(event_uuid, cached, pttl, loader)
+                    if source == "NEGATIVE":
+                        source = "CACHE"
+                    return self._finish_load(cached, source, start_time)
+            except redis.ConnectionError:
+                print("Error de conexión leyendo Cache")
+
+        with self._inflight_lock:
+            flight = self._inflight.get(event_uuid)
+            leader = flight is None
+            if leader:
+                flight = {"done": threading.Event(), "value": None}
+                self._inflight[event_uuid] = flight
+
+        self.stats["misses"] += 1
+        if not leader:
+            self.stats["coalesced"] += 1
+            flight["done"].wait(LOAD_TIMEOUT_SECONDS)
+            return self._finish_load(flight["value"], "DB (coalesced)", start_time)
+
+        try:
+            loaded = self._timed_load(loader, [event_uuid])
+            if loaded is not None:
+                value = loaded.get(event_uuid)
+                flight["value"] = value
+                if value is None:
+                    self._save_negative([event_uuid])
+                else:
+                    self.save_to_cache(event_uuid, value)
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(event_uuid, None)
+            flight["done"].set()
+
+        return self._finish_load(flight["value"], "DB", start_time)
+
+    def _timed_load(self, loader, event_uuids):
+        """Ejecuta el loader y actualiza la estimación del costo de recarga (EWMA)."""
+        load_start = time.time()
+        loaded = (loader or _load_from_postgres)(event_uuids)
+        load_ms = (time.time() - load_start) * 1000
+        self.latency.record("db_fallback", load_ms)
+        self._recompute_ms = load_ms if self._recompute_ms is None else (
+            0.8 * self._recompute_ms + 0.2 * load_ms)
+        return loaded
+
+    def _ttl_ms(self):
+        """TTL físico de una escritura: TTL con jitter más la ventana stale."""
+        ttl = TTL_SECONDS
+        if TTL_JITTER > 0:
+            ttl *= 1 + random.uniform(-TTL_JITTER, TTL_JITTER)
+        return int((ttl + SWR_SECONDS) * 1000)
+
+    def _get_with_ttl(self, event_uuid):
+        """GET (y PTTL en el mismo viaje si se usa SWR o XFetch)."""
+        key = self.codec.key(event_uuid)
+        if SWR_SECONDS <= 0 and XFETCH_BETA <= 0:
+            return self.value_client.get(key), None
+        pipe = self.value_client.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.pttl(key)
+        return tuple(pipe.execute())
+
+    def _mget_with_ttl(self, event_uuids):
+        """MGET (y un PTTL por llave en el mismo viaje si se usa SWR o XFetch)."""
+        keys = [self.codec.key(uuid) for uuid in event_uuids]
+        if SWR_SECONDS <= 0 and XFETCH_BETA <= 0:
+            return self.value_client.mget(keys), [None] * len(keys)
+        pipe = self.value_client.pipeline(transaction=False)
+        pipe.mget(keys)
+        for key in keys:
+            pipe.pttl(key)
+        replies = pipe.execute()
+        return replies[0], replies[1:]
+
+    def _revalidate(self, event_uuid, cached, pttl, loader, count=True):
+        """
+        Acierto de Redis: lo contabiliza (salvo count=False), lo copia a la
+        L1 y, si está vencido o XFetch lo adelanta, lanza su refresco.
+        Devuelve el source del acierto.
+        """
+        source = self._count_cached(cached, "l2") if count else "CACHE"
+        refresh = None
+        if cached != NEGATIVE_SENTINEL:
+            refresh = self._refresh_reason(pttl)
+        # Un valor vencido no se copia a la L1 para no prolongarlo
+        if self.l1 is not None and refresh != "stale":
+            self.l1.set(event_uuid, cached)
+        if refresh:
+            source = self._refresh_async(event_uuid, loader, refresh)
+        return source
+
+    def _refresh_reason(self, pttl):
+        """
+        Decide si un acierto debe refrescarse: "stale" si ya está en la
+        ventana stale-while-revalidate; "early" si XFetch lo adelanta, con
+        probabilidad creciente al acercarse la expiración lógica
+        (delta * beta * -ln(U) >= tiempo restante); None en otro caso.
+        """
+        if pttl is None or pttl < 0:
+            return None
+        remaining = pttl / 1000 - SWR_SECONDS
+        if remaining <= 0:
+            return "stale" if SWR_SECONDS > 0 else None
+        if XFETCH_BETA <= 0:
+            return None
+        delta = (self._recompute_ms if self._recompute_ms is not None else 100) / 1000
+        if delta * XFETCH_BETA * -math.log(1 - random.random()) >= remaining:
+            return "early"
+        return None
+
+    def _refresh_async(self, event_uuid, loader, reason):
+        """
+        Lanza en segundo plano el refresco de la llave, salvo que ya haya
+        uno en curso; mientras tanto se sigue sirviendo el valor actual.
+        Devuelve el source con que se reporta el acierto.
+        """
+        with self._inflight_lock:
+            start = event_uuid not in self._refreshing
+            if start:
+                self._refreshing.add(event_uuid)
+                if self._refresher is None:
+                    self._refresher = ThreadPoolExecutor(
+                        max_workers=REFRESH_WORKERS, thread_name_prefix="cache-refresh")
+        if start:
+            if reason == "early":
+                self.stats["early_refreshes"] += 1
+            self._refresher.submit(self._refresh, event_uuid, loader)
+        if reason == "stale":
+            self.stats["stale_served"] += 1
+            return "CACHE (stale)"
+        return "CACHE"
+
+    def _refresh(self, event_uuid, loader):
+        try:
+            loaded = self._timed_load(loader, [event_uuid])
+            if loaded is not None:
+                value = loaded.get(event_uuid)
+                if value is None:
+                    self._save_negative([event_uuid])
+                else:
+                    self.save_to_cache(event_uuid, value)
+        except Exception as e:
+            print(f"No se pudo refrescar {event_uuid} en segundo plano: {e}")
+        finally:
+            with self._inflight_lock:
+                self._refreshing.discard(event_uuid)
+
+    def _count_cached(self, value, tier):
+        """
+        Contabiliza un valor leído de la L1 ('l1') o de Redis ('l2') y
+        devuelve su source. El centinela negativo no es un acierto.
+        """
+        if value == NEGATIVE_SENTINEL:
+            self.stats["misses"] += 1
+            self.stats["negative_hits"] += 1
+            return "NEGATIVE"
+        self.stats["hits"] += 1
+        self.stats[f"{tier}_hits"] += 1
+        return "L1" if tier == "l1" else "CACHE"
+
+    def _finish_load(self, value, source, start_time):
+        elapsed = (time.time() - start_time) * 1000
+        self.stats["total_time"] += elapsed
+        self.latency.record("get_event", elapsed)
+        if value == NEGATIVE_SENTINEL:
+            return None, f"{source} (negative)", elapsed
+        return value, source, elapsed
+
+    def load_many(self, event_uuids, loader=None):
+        """
+        Carga desde PostgreSQL, en una sola consulta, los uuids que fallaron
+        en get_events y los deja en caché (con negativos para los que no
+        existen). El tiempo de la carga se suma a cada solicitud que la
+        esperó: 'event_uuids' puede repetir uuids (una vez por miss) y se
+        consultan sin repetir.
+        """
+        if not event_uuids:
+            return {}
+        start_time = time.time()
+        waiting = len(event_uuids)
+        event_uuids = list(dict.fromkeys(event_uuids))
+        loaded = self._timed_load(loader, event_uuids)
+        if loaded is None:
+            return {}
+
+        self.save_many(loaded)
+        self._save_negative([uuid for uuid in event_uuids if uuid not in loaded])
+
+        elapsed = (time.time() - start_time) * 1000
+        self.stats["total_time"] += elapsed * waiting
+        return loaded
+
+    def _save_negative(self, event_uuids):
+        """Cachea brevemente la ausencia de los uuids indicados."""
+        if not event_uuids:
+            return
+        if self.l1 is not None:
+            for event_uuid in event_uuids:
+                self.l1.set(event_uuid, NEGATIVE_SENTINEL)
+        if self.client:
+            try:
+                self._own_writes(event_uuids)
+                pipe = self.value_client.pipeline(transaction=False)
+                for event_uuid in event_uuids:
+                    pipe.setex(self.codec.key(event_uuid), NEGATIVE_TTL_SECONDS,
+                               NEGATIVE_SENTINEL)
+                pipe.execute()
+                self._publish_invalidation(event_uuids)
+            except Exception as e:
+                print(f"No se pudo guardar el resultado negativo en cache: {e}")
+
     def set_analytics(self, report_name, data_list):
         """Guarda reportes analíticos en el caché sin TTL."""
         if self.client:
             try:
-                key = f"analytics:{report_name}"
-                self.client.set(key, json.dumps(data_list))
+                key = self.codec.key(f"analytics:{report_name}")
+                self.value_client.set(key, self.codec.encode(data_list))
+                self.client.set(ANALYTICS_CODEC_KEY, codec_label(self.codec))
             except Exception as e:
                 print(f"No se pudo guardar analítica en cache: {e}")
 
+    def get_analytics_codec(self):
+        """Codec (nombre:versión) con que se cargaron las analíticas, o None."""
+        if not self.client:
+            return None
+        try:
+            return self.client.get(ANALYTICS_CODEC_KEY)
+        except redis.ConnectionError:
+            return None
+
     def get_analytics(self, report_name):
         """Obtiene reportes analíticos desde el caché."""
         start_time = time.time()
         result = None
+        self._record_access("get_analytics", [f"analytics:{report_name}"])
 
         if not self.client:
             return None, 0
 
         try:
-            key = f"analytics:{report_name}"
-            cached_data = self.client.get(key)
+            key = self.codec.key(f"analytics:{report_name}")
+            cached_data = self.value_client.get(key)
             if cached_data:
                 self.stats["hits"] += 1
-                result = json.loads(cached_data)
+                result = self.codec.decode(cached_data)
             else:
                 self.stats["misses"] += 1
 
@@ -116,15 +635,98 @@ class CacheMiddleware:
             print("Error de conexión leyendo Cache de Analíticas")
 
         elapsed = (time.time() - start_time) * 1000
+        self.latency.record("get_analytics", elapsed)
         return result, elapsed
 
+    def set_structured_analytics(self, reports):
+        """
+        Carga los reportes de Pig como sorted sets y hashes consultables
+        (ver cache_service.analytics_store). Devuelve la cantidad de llaves.
+        """
+        if not self.client:
+            return 0
+        try:
+            return analytics_store.load_reports(self.client, reports)
+        except Exception as e:
+            print(f"No se pudieron guardar las analíticas estructuradas: {e}")
+            return 0
+
+    def get_top_n(self, dimension, n=10):
+        """Top-N de 'type' o 'comuna' por total: ([(miembro, total)], latency_ms)."""
+        return self._structured_query(lambda: self.analytics.top_n(dimension, n))
+
+    def get_comuna_analytics(self, comuna):
+        """Total y desglose por tipo de una comuna: (dict, latency_ms)."""
+        return self._structured_query(lambda: self.analytics.comuna(comuna))
+
+    def get_analytics_range(self, start, end, comuna=None):
+        """
+        Filas (fecha, comuna, tipo, total) del reporte temporal entre dos
+        fechas 'YYYY-MM-DD', opcionalmente de una comuna: (filas, latency_ms).
+        """
+        return self._structured_query(lambda: self.analytics.date_range(start, end, comuna))
+
+    def get_analytics_date_bounds(self):
+        """(primera, última) fecha del reporte temporal, o None."""
+        if not self.analytics:
+            return None
+        try:
+            return self.analytics.date_bounds()
+        except redis.ConnectionError:
+            return None
+
+    def _structured_query(self, query):
+        start_time = time.time()
+        if not self.client:
+            return None, 0
+
+        result = None
+        try:
+            result = query()
+            # None = llave desalojada o sin generación; vacío tampoco es un acierto
+            if result:
+                self.stats["hits"] += 1
+            else:
+                self.stats["misses"] += 1
+        except redis.ConnectionError:
+            print("Error de conexión leyendo Cache de Analíticas")
+
+        elapsed = (time.time() - start_time) * 1000
+        self.latency.record("analytics_query", elapsed)
+        return result, elapsed
+
+    def _decode(self, cached_data):
+        """Decodifica un valor de Redis, respetando el centinela de resultado negativo."""
+        if cached_data in (NEGATIVE_SENTINEL, _NEGATIVE_SENTINEL_BYTES):
+            return NEGATIVE_SENTINEL
+        return self.codec.decode(cached_data)
+
     def get_metrics(self):
         """Devuelve las métricas de rendimiento del caché."""
         total = self.stats["hits"] + self.stats["misses"]
         if total == 0:
             return "Sin datos (0 consultas)"
         hit_rate = (self.stats["hits"] / total) * 100
-        return f"Hits: {self.stats['hits']} | Misses: {self.stats['misses']} | Hit Rate: {hit_rate:.1f}%"
+        summary = f"Hits: {self.stats['hits']} | Misses: {self.stats['misses']} | Hit Rate: {hit_rate:.1f}%"
+        if self.l1 is not None:
+            summary += (f" | L1: {self.stats['l1_hits']} | L2: {self.stats['l2_hits']}"
+                        f" | DB: {self.stats['misses'] - self.stats['negative_hits']}")
+        if self.stats["negative_hits"]:
+            summary += f" | Negativos: {self.stats['negative_hits']}"
+        if self.stats["stale_served"] or self.stats["early_refreshes"]:
+            summary += (f" | Stale: {self.stats['stale_served']}"
+                        f" | Refrescos anticipados: {self.stats['early_refreshes']}")
+        lookups = self.latency.snapshot().get("get_event")
+        if lookups:
+            summary += (f" | p50: {lookups['p50_ms']:.2f} ms | p99: {lookups['p99_ms']:.2f} ms"
+                        f" | max: {lookups['max_ms']:.2f} ms")
+        return summary
+
+
+def _load_from_postgres(event_uuids):
+    """Loader por defecto del read-through (importado al usarse para no abrir la DB en vano)."""
+    from storage.db_client import pg_manager
+    return pg_manager.get_events_by_uuids(event_uuids)
 
 
 cache_manager = CacheMiddleware()
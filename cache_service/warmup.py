@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import threading
+from collections import Counter
+
+# --------------------------------------------------------------------------
+# Configuración del Calentamiento (warm-up)
+# --------------------------------------------------------------------------
+# Con POPULARITY_TRACKING=1, CacheMiddleware cuenta los accesos por uuid y los
+# persiste (con decaimiento) en POPULARITY_FILE; WARMUP=access precarga luego
+# los más populares en Redis. Apagado por defecto: el conteo agrega un lock
+# por lectura.
+
+POPULARITY_TRACKING = os.getenv('POPULARITY_TRACKING', '0') == '1'
+POPULARITY_FILE = os.getenv('POPULARITY_FILE', '/app/shared_data/cache_popularity.json')
+POPULARITY_DECAY = float(os.getenv('POPULARITY_DECAY', '0.5'))
+POPULARITY_MAX_KEYS = int(os.getenv('POPULARITY_MAX_KEYS', '50000'))
+
+WARMUP_MAX_KEYS = int(os.getenv('WARMUP_MAX_KEYS', '5000'))
+# Fracción de maxmemory que el warm-up puede ocupar (el resto queda para el tráfico vivo)
+WARMUP_MEMORY_FRACTION = float(os.getenv('WARMUP_MEMORY_FRACTION', '0.5'))
+WARMUP_RATE = float(os.getenv('WARMUP_RATE', '2000'))
+WARMUP_BATCH_SIZE = int(os.getenv('WARMUP_BATCH_SIZE', '100'))
+
+# --------------------------------------------------------------------------
+# Popularidad Persistida
+# --------------------------------------------------------------------------
+
+
+class PopularityTracker:
+    """
+    Cuenta accesos por llave en memoria (thread-safe). save() los combina
+    con lo ya persistido, multiplicando los conteos anteriores por
+    POPULARITY_DECAY para que pese más la actividad reciente. En memoria se
+    guardan a lo más 2 * max_keys llaves: al pasarse se conservan las
+    max_keys más contadas (las demás no entrarían al archivo de todos modos).
+    """
+    def __init__(self, path=POPULARITY_FILE, decay=POPULARITY_DECAY, max_keys=POPULARITY_MAX_KEYS):
+        self.path = path
+        self.decay = decay
+        self.max_keys = max_keys
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, keys):
+        with self._lock:
+            self._counts.update(keys)
+            if len(self._counts) > 2 * self.max_keys:
+                self._counts = Counter(dict(self._counts.most_common(self.max_keys)))
+
+    def save(self):
+        """Persiste los conteos acumulados desde el último save()."""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        if not counts:
+            return 0
+
+        merged = Counter({key: score * self.decay
+                          for key, score in load_popularity_scores(self.path).items()})
+        merged.update(counts)
+        top = dict(merged.most_common(self.max_keys))
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"updated_at": time.time(), "scores": top}, f)
+        os.replace(tmp_path, self.path)
+        return len(top)
+
+
+def load_popularity_scores(path=POPULARITY_FILE):
+    """{uuid: puntaje} persistido, o vacío si no existe."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get("scores", {})
+    except (OSError, ValueError) as e:
+        print(f"No se pudo leer la popularidad persistida ({e}); se ignora.")
+        return {}
+
+
+def hottest_keys(path=POPULARITY_FILE, limit=WARMUP_MAX_KEYS):
+    """Las 'limit' llaves con mayor puntaje, de más a menos popular."""
+    scores = load_popularity_scores(path)
+    return [key for key, _ in Counter(scores).most_common(limit)]
+
+# --------------------------------------------------------------------------
+# Precarga
+# --------------------------------------------------------------------------
+
+
+def memory_headroom(client, fraction=WARMUP_MEMORY_FRACTION):
+    """
+    Bytes que aún puede ocupar el warm-up: fracción de maxmemory menos lo
+    usado. None si Redis no tiene maxmemory (sin límite propio).
+    """
+    info = client.info('memory')
+    maxmemory = info.get('maxmemory', 0)
+    if not maxmemory:
+        return None
+    return maxmemory * fraction - info.get('used_memory', 0)
+
+
+def warm_cache(cache, keys, loader=None, rate=WARMUP_RATE, batch_size=WARMUP_BATCH_SIZE,
+               memory_fraction=WARMUP_MEMORY_FRACTION):
+    """
+    Precarga 'keys' (ordenadas por popularidad) en Redis: lee los eventos
+    por lotes con una consulta, los escribe con un pipeline (save_many) y
+    se detiene al agotar el presupuesto de memoria. El ritmo se limita a
+    'rate' llaves/s para no competir con el tráfico vivo.
+    """
+    stats = {"requested": len(keys), "loaded": 0, "missing": 0, "batches": 0,
+             "stopped_by_memory": False, "elapsed_s": 0.0}
+    if not keys or not cache.client:
+        return stats
+
+    start = time.time()
+    for i in range(0, len(keys), batch_size):
+        headroom = memory_headroom(cache.client, memory_fraction)
+        if headroom is not None and headroom <= 0:
+            stats["stopped_by_memory"] = True
+            break
+
+        batch = keys[i:i + batch_size]
+        # Se carga por fuera de load_many para no mezclar el warm-up con las
+        # métricas de hits/misses del tráfico
+        loaded = (loader or _load_from_postgres)(batch) or {}
+        cache.save_many(loaded)
+        stats["loaded"] += len(loaded)
+        stats["missing"] += len(batch) - len(loaded)
+        stats["batches"] += 1
+
+        # Limitador: no superar 'rate' llaves por segundo en promedio
+        if rate > 0:
+            ahead = (i + len(batch)) / rate - (time.time() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+
+    stats["elapsed_s"] = time.time() - start
+    return stats
+
+
+def _load_from_postgres(keys):
+    from storage.db_client import pg_manager
+    return pg_manager.get_events_by_uuids(keys)
+
+
+def start_warmup(cache, keys, loader=None, **kwargs):
+    """Ejecuta warm_cache en un hilo de fondo y devuelve el hilo."""
+    def run():
+        stats = warm_cache(cache, keys, loader=loader, **kwargs)
+        print(f"Warm-up: {stats['loaded']}/{stats['requested']} llaves precargadas en "
+              f"{stats['elapsed_s']:.1f}s ({stats['batches']} lotes"
+              f"{', detenido por memoria' if stats['stopped_by_memory'] else ''})")
+
+    thread = threading.Thread(target=run, name="cache-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    from cache_service.redis_client import cache_manager
+    hot = hottest_keys()
+    if not hot:
+        print(f"Sin popularidad persistida en {POPULARITY_FILE}; no hay nada que precargar.")
+    else:
+        start_warmup(cache_manager, hot).join()
@@ -2,6 +2,11 @@ import os
 import csv
 from cache_service.redis_client import cache_manager
 
+# Carpeta con las salidas de Pig (p. ej. la del delta incremental)
+PIG_OUTPUT_DIR = os.getenv('PIG_OUTPUT_DIR', '/app/shared_data')
+# Además del JSON por reporte, cargar sorted sets/hashes para top-N y filtros
+ANALYTICS_STRUCTURED = os.getenv('ANALYTICS_STRUCTURED', '1') == '1'
+
 # --------------------------------------------------------------------------
 # Cargador de Resultados de Pig a Redis
 # --------------------------------------------------------------------------
@@ -9,11 +14,15 @@ from cache_service.redis_client import cache_manager
 def load_pig_results_to_redis():
     """
     Carga los resultados de los análisis de Pig (Hadoop) desde los archivos
-    de salida a Redis para un acceso rápido.
+    de salida a Redis para un acceso rápido: cada reporte completo y, con
+    ANALYTICS_STRUCTURED, su versión consultable por dimensión y fecha.
     """
     print("--- CARGANDO RESULTADOS ANALÍTICOS DE HADOOP A REDIS ---")
+    # El generador debe usar el mismo CACHE_CODEC para encontrar estas llaves
+    print(f"Codec de caché: {cache_manager.codec.name} "
+          f"(llaves '{cache_manager.codec.key('analytics:<reporte>')}')")
 
-    base_path = '/app/shared_data'
+    base_path = PIG_OUTPUT_DIR
 
     reports = {
         'by_type': f'{base_path}/output_by_type/part-r-00000',
@@ -21,6 +30,7 @@ def load_pig_results_to_redis():
         'temporal': f'{base_path}/output_temporal/part-r-00000'
     }
 
+    loaded = {}
     for report_name, file_path in reports.items():
         if not os.path.exists(file_path):
             print(
@@ -35,12 +45,17 @@ def load_pig_results_to_redis():
                     data.append(row)
 
             if data:
+                loaded[report_name] = data
                 cache_manager.set_analytics(report_name, data)
                 print(
                     f"{len(data)} registros cargados a Redis para el reporte 'analytics:{report_name}'")
         except Exception as e:
             print(f"Error procesando el reporte {report_name}: {e}")
 
+    if ANALYTICS_STRUCTURED and loaded:
+        keys = cache_manager.set_structured_analytics(loaded)
+        print(f"{keys} llaves de analíticas estructuradas cargadas a Redis (top-N, comuna, fechas)")
+
 
 if __name__ == "__main__":
     load_pig_results_to_redis()
@@ -0,0 +1,288 @@
+import os
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# --------------------------------------------------------------------------
+# Motor Columnar del ETL (ETL_ENGINE=columnar)
+# --------------------------------------------------------------------------
+# Misma salida que transform_events + dedupe_by_key, byte a byte, pero por
+# lotes de columnas con NumPy:
+#   - filtros, mapeo de tipos, redondeos y fechas se calculan por columna;
+#   - los textos (tipo, comuna, calle, subtipo) se codifican como diccionario
+#     y solo se transforman sus valores distintos;
+#   - la geo_temp_key se deduplica empaquetada en un int64 (tipo | día |
+#     lat | lon en milésimas) con np.unique dentro del lote y búsqueda
+#     binaria sobre las ya vistas entre lotes; el texto de la llave solo se
+#     arma para las filas que sobreviven.
+
+ETL_COLUMNAR_BATCH = int(os.getenv('ETL_COLUMNAR_BATCH', '50000'))
+
+_EPOCH = date(1970, 1, 1)
+_DAY_BITS = 16
+# Milésimas de grado desplazadas a positivo; el bit bajo distingue -0.0 de
+# 0.0, que round() imprime distinto en la llave
+_LAT_OFFSET, _LAT_BITS = 90000, 19
+_LON_OFFSET, _LON_BITS = 180000, 20
+# Distancia a .5 (en unidades de x*10^n) bajo la cual no se confía en rint
+_TIE_MARGIN = 1e-6
+
+
+def available():
+    return np is not None
+
+
+def round_like_python(values, digits):
+    """
+    round(x, digits) de Python sobre un arreglo, idéntico bit a bit: rint
+    sobre x*10^n coincide salvo cerca de un empate (el producto puede
+    cruzarlo) o fuera del rango exacto de los enteros en double; esos pocos
+    casos se resuelven con round() mismo.
+    """
+    scale = 10.0 ** digits
+    with np.errstate(invalid='ignore', over='ignore'):
+        scaled = values * scale
+        rounded = np.rint(scaled) / scale
+        frac = np.abs(scaled - np.floor(scaled) - 0.5)
+        # El error del producto crece con su magnitud
+        margin = np.maximum(_TIE_MARGIN, np.abs(scaled) * 2.0 ** -48)
+        suspect = np.flatnonzero(~(frac >= margin) | ~(np.abs(scaled) < 2.0 ** 52))
+    for i in suspect:
+        rounded[i] = round(float(values[i]), digits)
+    return rounded
+
+
+def _dictionary_map(values, fn):
+    """
+    Aplica 'fn' una vez por valor distinto (codificación por diccionario con
+    hash). None se trata como '': en el ETL ambos son 'vacío'.
+    """
+    lookup = {value: fn(value or '') for value in set(values)}
+    return list(map(lookup.__getitem__, values))
+
+
+def _clean_city(city):
+    return city.strip().upper() if city else "DESCONOCIDA"
+
+
+def _clean_street(street):
+    return street.strip() if street else "SIN NOMBRE"
+
+
+def _clean_subtype(subtype):
+    return subtype if subtype else "NO_ESPECIFICADO"
+
+
+def _format_floats(values):
+    """repr() de cada float, calculado una vez por patrón de bits distinto (distingue -0.0)."""
+    distinct, first, inverse = np.unique(values.view(np.int64), return_index=True,
+                                         return_inverse=True)
+    formatted = np.empty(len(distinct), dtype=object)
+    formatted[:] = [repr(value) for value in values[first].tolist()]
+    return formatted[inverse.reshape(-1)]
+
+
+def _to_days(timestamps):
+    """
+    (días desde 1970, sin_fecha) de un arreglo de timestamps. TIMESTAMP llega
+    como datetime y su toordinal() es la misma fecha que imprime str(ts)[:10];
+    cualquier otra cosa (texto, tipos mezclados) se resuelve desde
+    str(ts)[:10] igual que la ruta por filas.
+    """
+    missing = np.equal(timestamps, None)
+    present = timestamps[~missing].tolist()
+    days = np.zeros(len(timestamps), dtype=np.int64)
+    try:
+        days[~missing] = np.fromiter(map(date.toordinal, present), dtype=np.int64,
+                                     count=len(present)) - _EPOCH.toordinal()
+        return days, missing
+    except TypeError:
+        pass
+    missing = np.ones(len(timestamps), dtype=bool)
+    for i, ts in enumerate(timestamps.tolist()):
+        try:
+            days[i] = (date.fromisoformat(str(ts)[:10]) - _EPOCH).days
+            missing[i] = False
+        except ValueError:
+            pass
+    return days, missing
+
+
+def _format_days(days):
+    """Fecha ISO de cada día, formateada una vez por día distinto."""
+    distinct, inverse = np.unique(days, return_inverse=True)
+    formatted = np.empty(len(distinct), dtype=object)
+    formatted[:] = [date.fromordinal(_EPOCH.toordinal() + day).isoformat()
+                    for day in distinct.tolist()]
+    return formatted[inverse.reshape(-1)]
+
+# --------------------------------------------------------------------------
+# Homogeneizador por Lotes
+# --------------------------------------------------------------------------
+
+
+class ColumnarHomogenizer:
+    """
+    Procesa lotes de filas de iter_event_batches y conserva, entre lotes,
+    las geo_temp_key ya vistas (enteros empaquetados; las pocas que no se
+    pueden empaquetar, como fechas nulas o coordenadas no finitas, como texto).
+    """
+    def __init__(self, type_mapping, seen_keys=None):
+        self.type_mapping = type_mapping
+        self.type_names = sorted(set(type_mapping.values()) | {'OTRO'})
+        self.type_codes = {name: code for code, name in enumerate(self.type_names)}
+        type_bits = max(1, (len(self.type_names) - 1).bit_length())
+        if type_bits + _DAY_BITS + _LAT_BITS + _LON_BITS > 63:
+            raise ValueError("Demasiados tipos para empaquetar la geo_temp_key en 63 bits")
+        self._type_lut = np.array(self.type_names, dtype=object)
+        # Llaves vistas: códigos empaquetados en un arreglo ordenado (búsqueda
+        # binaria vectorizada) y las no empaquetables como texto
+        self.seen_codes, self.seen_text = self.encode_keys(seen_keys or ())
+
+    def _pack(self, type_code, day, lat3, lon3):
+        """
+        Empaqueta (arreglos) y devuelve (códigos, empaquetable). No son
+        empaquetables las fechas fuera de 1970-01-02..2149 ni las coordenadas
+        no finitas o fuera de rango.
+        """
+        with np.errstate(invalid='ignore'):
+            lat_k = np.rint(lat3 * 1000)
+            lon_k = np.rint(lon3 * 1000)
+            packable = ((day >= 1) & (day < 2 ** _DAY_BITS)
+                        & (np.abs(lat_k) <= _LAT_OFFSET) & (np.abs(lon_k) <= _LON_OFFSET))
+        lat_k = np.where(packable, lat_k, 0).astype(np.int64)
+        lon_k = np.where(packable, lon_k, 0).astype(np.int64)
+        lat_code = (lat_k + _LAT_OFFSET) * 2 + ((lat_k == 0) & np.signbit(lat3))
+        lon_code = (lon_k + _LON_OFFSET) * 2 + ((lon_k == 0) & np.signbit(lon3))
+        codes = (((type_code.astype(np.int64) << _DAY_BITS | day) << _LAT_BITS | lat_code)
+                 << _LON_BITS | lon_code)
+        return codes, packable
+
+    def encode_keys(self, keys):
+        """
+        Separa geo_temp_key en texto (p. ej. del KEYS_FILE) en (códigos
+        empaquetados ordenados, set de las que no se empaquetan). Solo se
+        empaqueta el texto que el ETL generaría exactamente igual.
+        """
+        parsed, text = [], set()
+        for key in keys:
+            try:
+                std_type, fecha, lat, lon = key.rsplit('_', 3)
+                day = (date.fromisoformat(fecha) - _EPOCH).days
+                lat3, lon3 = float(lat), float(lon)
+            except ValueError:
+                text.add(key)
+                continue
+            if (std_type in self.type_codes
+                    and date.fromordinal(_EPOCH.toordinal() + day).isoformat() == fecha
+                    and repr(lat3) == lat and repr(lon3) == lon
+                    and round(lat3, 3) == lat3 and round(lon3, 3) == lon3):
+                parsed.append((self.type_codes[std_type], day, lat3, lon3, key))
+            else:
+                text.add(key)
+        if not parsed:
+            return np.empty(0, dtype=np.int64), text
+
+        type_code, day, lat3, lon3, raw = zip(*parsed)
+        codes, packable = self._pack(np.array(type_code, dtype=np.int64),
+                                     np.array(day, dtype=np.int64),
+                                     np.array(lat3, dtype=np.float64),
+                                     np.array(lon3, dtype=np.float64))
+        text.update(key for key, ok in zip(raw, packable.tolist()) if not ok)
+        return np.unique(codes[packable]), text
+
+    def process(self, batch):
+        """Devuelve (geo_temp_keys, filas_csv) nuevas del lote, en el orden de llegada."""
+        if not batch:
+            return [], []
+        uuids, timestamps, lons, lats, types, subtypes, _, streets, cities = zip(*batch)
+        uuids, timestamps, lons, lats, types, subtypes, streets, cities = (
+            np.array(column, dtype=object)
+            for column in (uuids, timestamps, lons, lats, types, subtypes, streets, cities))
+
+        # Filtro: coordenadas presentes y tipo no vacío
+        valid = ~np.equal(lons, None) & ~np.equal(lats, None) & ~np.equal(types, None) \
+            & np.not_equal(types, '')
+        rows = np.flatnonzero(valid)
+        if len(rows) == 0:
+            return [], []
+        lon = lons[rows].astype(np.float64)
+        lat = lats[rows].astype(np.float64)
+
+        # Tipo estándar: cada tipo crudo distinto se mapea una sola vez
+        raw_types = types[rows].tolist()
+        type_lookup = {t: self.type_codes[self.type_mapping.get(t.upper(), 'OTRO')]
+                       for t in set(raw_types)}
+        type_code = np.fromiter(map(type_lookup.__getitem__, raw_types), dtype=np.int64,
+                                count=len(raw_types))
+
+        day, no_date = _to_days(timestamps[rows])
+        day[no_date] = 0
+        lat3 = round_like_python(lat, 3)
+        lon3 = round_like_python(lon, 3)
+        codes, packable = self._pack(type_code, day, lat3, lon3)
+
+        # Dedup de llaves empaquetadas: primera aparición en el lote y luego
+        # contra lo visto en lotes anteriores
+        survivors = []
+        packed_rows = np.flatnonzero(packable)
+        if len(packed_rows):
+            distinct_codes, first = np.unique(codes[packed_rows], return_index=True)
+            position = np.searchsorted(self.seen_codes, distinct_codes)
+            is_new = np.ones(len(distinct_codes), dtype=bool)
+            found = position < len(self.seen_codes)
+            is_new[found] = self.seen_codes[position[found]] != distinct_codes[found]
+            self.seen_codes = np.insert(self.seen_codes, position[is_new], distinct_codes[is_new])
+            survivors.append(packed_rows[first[is_new]])
+
+        # Las no empaquetables se deduplican por su texto, en orden
+        exotic = []
+        for i in np.flatnonzero(~packable).tolist():
+            key = (f"{self.type_names[type_code[i]]}_{str(timestamps[rows[i]])[:10]}_"
+                   f"{float(lat3[i])}_{float(lon3[i])}")
+            if key not in self.seen_text:
+                self.seen_text.add(key)
+                exotic.append(i)
+        survivors.append(np.array(exotic, dtype=np.int64))
+
+        keep = np.sort(np.concatenate(survivors))
+        if len(keep) == 0:
+            return [], []
+        source = rows[keep]
+
+        std_types = self._type_lut[type_code[keep]]
+        dates = np.empty(len(keep), dtype=object)
+        kept_packable = packable[keep]
+        dates[kept_packable] = _format_days(day[keep][kept_packable])
+        dates[~kept_packable] = [str(timestamps[i])[:10] for i in source[~kept_packable].tolist()]
+
+        keys = list(map('_'.join, zip(std_types.tolist(), dates.tolist(),
+                                      _format_floats(lat3[keep]).tolist(),
+                                      _format_floats(lon3[keep]).tolist())))
+
+        csv_rows = list(zip(
+            uuids[source].tolist(),
+            dates.tolist(),
+            std_types.tolist(),
+            _dictionary_map(subtypes[source].tolist(), _clean_subtype),
+            _dictionary_map(cities[source].tolist(), _clean_city),
+            _dictionary_map(streets[source].tolist(), _clean_street),
+            round_like_python(lat[keep], 5).tolist(),
+            round_like_python(lon[keep], 5).tolist()))
+        return keys, csv_rows
+
+
+def homogenize_batches(batches, counters, type_mapping, seen_keys=None):
+    """
+    Equivalente por lotes de dedupe_by_key(transform_events(...)): entrega
+    (geo_temp_keys, filas_csv) por cada lote de filas crudas.
+    """
+    homogenizer = ColumnarHomogenizer(type_mapping, seen_keys)
+    for batch in batches:
+        counters["raw"] += len(batch)
+        keys, csv_rows = homogenizer.process(batch)
+        if csv_rows:
+            yield keys, csv_rows
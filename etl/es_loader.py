@@ -1,8 +1,11 @@
 import os
 import csv
+import glob
+import json
 from datetime import datetime
 from elasticsearch import Elasticsearch, helpers
 from cache_service.redis_client import cache_manager
+from cache_service.latency import LatencyRecorder
 
 # --------------------------------------------------------------------------
 # Configuración de Elasticsearch
@@ -10,6 +13,11 @@ from cache_service.redis_client import cache_manager
 ES_HOST = os.getenv('ELASTICSEARCH_HOST', 'localhost')
 ES_PORT = os.getenv('ELASTICSEARCH_PORT', '9200')
 ES_URL = f"http://{ES_HOST}:{ES_PORT}"
+# En modo incremental se indexa solo el delta del ETL (cleaned_waze_events_delta.csv)
+ES_EVENTS_FILE = os.getenv(
+    'ES_EVENTS_FILE', '/app/shared_data/cleaned_waze_events.csv')
+# Histogramas exportados por el generador, que se combinan con los de este proceso
+LATENCY_SNAPSHOTS = os.getenv('LATENCY_SNAPSHOTS', 'results/*_latency.json')
 
 # --------------------------------------------------------------------------
 # Cargador de Datos a Elasticsearch
@@ -55,7 +63,7 @@ def load_cleaned_events_to_es(es):
     """
     Lee el archivo CSV de eventos homogeneizados y los indexa en Elasticsearch.
     """
-    file_path = '/app/shared_data/cleaned_waze_events.csv'
+    file_path = ES_EVENTS_FILE
     if not os.path.exists(file_path):
         print(
             f"Advertencia: No se encontró el archivo de eventos limpios en {file_path}")
@@ -123,6 +131,41 @@ def load_cache_metrics_to_es(es):
     except Exception as e:
         print(f"Error cargando métricas a Elasticsearch: {e}")
 
+    load_latency_percentiles_to_es(es)
+
+
+def load_latency_percentiles_to_es(es):
+    """
+    Combina los histogramas de latencia de este proceso con los exportados
+    por los generadores (LATENCY_SNAPSHOTS) e indexa un documento por
+    operación con sus percentiles en 'waze_metrics'.
+    """
+    recorder = LatencyRecorder()
+    recorder.merge_dict(cache_manager.latency.to_dict())
+    sources = sorted(glob.glob(LATENCY_SNAPSHOTS))
+    for path in sources:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                recorder.merge_dict(json.load(f))
+        except Exception as e:
+            print(f"No se pudo leer el histograma {path}: {e}")
+
+    snapshot = recorder.snapshot()
+    if not snapshot:
+        return
+
+    timestamp = datetime.utcnow().isoformat() + "Z"
+    actions = [{
+        "_index": "waze_metrics",
+        "_source": dict(summary, metric="latency", operation=op,
+                        sources=len(sources), **{"@timestamp": timestamp})
+    } for op, summary in snapshot.items()]
+    try:
+        success, _ = helpers.bulk(es, actions)
+        print(f"Percentiles de latencia de {success} operaciones indexados en 'waze_metrics'.")
+    except Exception as e:
+        print(f"Error cargando percentiles a Elasticsearch: {e}")
+
 
 if __name__ == "__main__":
     es_client = setup_elasticsearch()
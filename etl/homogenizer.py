@@ -1,31 +1,48 @@
 import csv
 import os
-from storage.db_client import pg_manager
+import json
+import shutil
+from datetime import datetime
+from itertools import islice
+from storage.db_client import pg_manager, ETL_FETCH_SIZE
+from etl import columnar
 
 # --------------------------------------------------------------------------
-# Proceso ETL: Filtrado y Homogeneización de Eventos
+# Configuración del ETL
 # --------------------------------------------------------------------------
 
-def clean_and_homogenize():
-    """
-    Realiza un proceso de ETL (Extract, Transform, Load) sobre los datos
-    crudos de eventos de Waze.
-    """
-    print("--- INICIANDO ETL: FILTRADO Y HOMOGENEIZACIÓN ---")
-    raw_events = pg_manager.get_all_events()
-    print(f"Total de eventos crudos extraídos de DB: {len(raw_events)}")
+ETL_MODE = os.getenv('ETL_MODE', 'full')
+ETL_WATERMARK_OVERLAP = int(os.getenv('ETL_WATERMARK_OVERLAP', '1000'))
+# 'rows' (fila a fila, sin dependencias) o 'columnar' (lotes con NumPy, ver
+# etl/columnar.py); ambos producen exactamente el mismo CSV
+ETL_ENGINE = os.getenv('ETL_ENGINE', 'rows')
+
+OUTPUT_PATH = '/app/shared_data/cleaned_waze_events.csv'
+DELTA_PATH = '/app/shared_data/cleaned_waze_events_delta.csv'
+STATE_DIR = '/app/shared_data/etl_state'
+WATERMARK_FILE = f'{STATE_DIR}/watermark.json'
+KEYS_FILE = f'{STATE_DIR}/geo_temp_keys.txt'
+
+TYPE_MAPPING = {
+    'ACCIDENT': 'ACCIDENTE',
+    'JAM': 'CONGESTION',
+    'ROAD_CLOSED': 'CORTE_RUTA',
+    'WEATHERHAZARD': 'PELIGRO_VIAL',
+    'HAZARD': 'PELIGRO_VIAL'
+}
 
-    type_mapping = {
-        'ACCIDENT': 'ACCIDENTE',
-        'JAM': 'CONGESTION',
-        'ROAD_CLOSED': 'CORTE_RUTA',
-        'WEATHERHAZARD': 'PELIGRO_VIAL',
-        'HAZARD': 'PELIGRO_VIAL'
-    }
+# --------------------------------------------------------------------------
+# Etapas del Pipeline (generadores)
+# --------------------------------------------------------------------------
 
-    cleaned_data = {}
 
+def transform_events(raw_events, counters):
+    """
+    Filtra y homogeneiza filas crudas, entregando (geo_temp_key, fila_csv)
+    una a una sin materializar el conjunto completo.
+    """
     for row in raw_events:
+        counters["raw"] += 1
         waze_uuid, ts, lon, lat, e_type, e_subtype, desc, street, city = row
 
         if lon is None or lat is None or not e_type:
@@ -35,46 +52,174 @@ def clean_and_homogenize():
         street = street.strip() if street else "SIN NOMBRE"
         e_subtype = e_subtype if e_subtype else "NO_ESPECIFICADO"
 
-        std_type = type_mapping.get(e_type.upper(), 'OTRO')
+        std_type = TYPE_MAPPING.get(e_type.upper(), 'OTRO')
 
         date_str = str(ts)[:10]
         geo_temp_key = f"{std_type}_{date_str}_{round(lat, 3)}_{round(lon, 3)}"
 
-        if geo_temp_key not in cleaned_data:
-            cleaned_data[geo_temp_key] = {
-                "id": waze_uuid,
-                "fecha": date_str,
-                "tipo_incidente": std_type,
-                "subtipo": e_subtype,
-                "comuna": city.upper(),
-                "calle": street,
-                "latitud": round(lat, 5),
-                "longitud": round(lon, 5)
-            }
-
-    final_events = list(cleaned_data.values())
+        yield geo_temp_key, [
+            waze_uuid,
+            date_str,
+            std_type,
+            e_subtype,
+            city.upper(),
+            street,
+            round(lat, 5),
+            round(lon, 5)
+        ]
+
+
+def dedupe_by_key(records, seen_keys=None):
+    """
+    Conserva la primera fila de cada geo_temp_key. Solo se retienen las
+    llaves, no las filas, por lo que la memoria crece con los eventos
+    únicos y no con el volumen crudo.
+    """
+    seen_keys = set() if seen_keys is None else seen_keys
+    for geo_temp_key, csv_row in records:
+        if geo_temp_key in seen_keys:
+            continue
+        seen_keys.add(geo_temp_key)
+        yield geo_temp_key, csv_row
+
+
+def homogenized_batches(counters, after_id=None, seen_keys=None, engine=None):
+    """
+    Entrega lotes (geo_temp_keys, filas_csv) ya filtrados y deduplicados,
+    con el motor indicado (ETL_ENGINE por defecto). Sin NumPy instalado se
+    usa el motor por filas.
+    """
+    engine = engine or ETL_ENGINE
+    if engine == 'columnar' and not columnar.available():
+        print("ETL_ENGINE=columnar requiere numpy; usando el motor por filas.")
+        engine = 'rows'
+
+    if engine == 'columnar':
+        yield from columnar.homogenize_batches(
+            pg_manager.iter_event_batches(columnar.ETL_COLUMNAR_BATCH, after_id),
+            counters, TYPE_MAPPING, seen_keys)
+        return
+
+    pipeline = dedupe_by_key(
+        transform_events(pg_manager.iter_events(after_id=after_id), counters), seen_keys)
+    while True:
+        chunk = list(islice(pipeline, ETL_FETCH_SIZE))
+        if not chunk:
+            return
+        keys, csv_rows = zip(*chunk)
+        yield keys, csv_rows
+
+# --------------------------------------------------------------------------
+# Estado Persistido (marca de agua + llaves geo-temporales)
+# --------------------------------------------------------------------------
+
+
+def load_state():
+    """Carga la marca de agua y las geo_temp_key ya exportadas, si existen."""
+    if not os.path.exists(WATERMARK_FILE) or not os.path.exists(KEYS_FILE):
+        return None, set()
+
+    with open(WATERMARK_FILE, 'r', encoding='utf-8') as f:
+        watermark = json.load(f)
+    with open(KEYS_FILE, 'r', encoding='utf-8') as f:
+        seen_keys = {line.rstrip('\n') for line in f}
+    return watermark, seen_keys
+
+
+def save_watermark(last_id, last_timestamp):
+    """Persiste la marca de agua tras una ejecución completa exitosa."""
+    os.makedirs(STATE_DIR, exist_ok=True)
+    tmp_path = f"{WATERMARK_FILE}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "last_id": last_id,
+            "last_timestamp_scraped": str(last_timestamp) if last_timestamp else None,
+            "updated_at": datetime.utcnow().isoformat() + "Z"
+        }, f)
+    os.replace(tmp_path, WATERMARK_FILE)
+
+# --------------------------------------------------------------------------
+# Proceso ETL: Filtrado y Homogeneización de Eventos
+# --------------------------------------------------------------------------
+
+
+def clean_and_homogenize(delta_path=None):
+    """
+    Realiza un proceso de ETL (Extract, Transform, Load) sobre los datos
+    crudos de eventos de Waze, en streaming desde PostgreSQL hasta el CSV.
+    También deja inicializado el estado para el modo incremental; si se
+    indica 'delta_path', el resultado completo se publica además como delta.
+    """
+    print("--- INICIANDO ETL: FILTRADO Y HOMOGENEIZACIÓN ---")
+
+    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
+    os.makedirs(STATE_DIR, exist_ok=True)
+
+    last_id, last_timestamp = pg_manager.get_watermark()
+    counters = {"raw": 0}
+    written = 0
+    with open(OUTPUT_PATH, mode='w', newline='', encoding='utf-8') as f, \
+            open(KEYS_FILE, mode='w', encoding='utf-8') as keys_file:
+        writer = csv.writer(f, delimiter=',')
+        for keys, csv_rows in homogenized_batches(counters):
+            writer.writerows(csv_rows)
+            keys_file.writelines(key + '\n' for key in keys)
+            written += len(csv_rows)
+
+    save_watermark(last_id, last_timestamp)
+    if delta_path:
+        shutil.copyfile(OUTPUT_PATH, delta_path)
+
+    print(f"Total de eventos crudos extraídos de DB: {counters['raw']}")
     print(
-        f"Total de eventos tras filtrado y homogeneización espacial: {len(final_events)}")
+        f"Total de eventos tras filtrado y homogeneización espacial: {written}")
+    print(f"Datos limpios y homogeneizados exportados a: {OUTPUT_PATH}")
 
-    output_path = '/app/shared_data/cleaned_waze_events.csv'
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-    with open(output_path, mode='w', newline='', encoding='utf-8') as f:
+def incremental_homogenize():
+    """
+    Extrae solo las filas posteriores a la marca de agua persistida, las
+    deduplica contra las geo_temp_key ya exportadas y las agrega al CSV
+    limpio. El delta se escribe además en DELTA_PATH para que las etapas
+    siguientes puedan procesarlo por separado.
+    """
+    watermark, seen_keys = load_state()
+    if watermark is None:
+        print("Sin marca de agua previa: ejecutando ETL completo para inicializar el estado.")
+        clean_and_homogenize(delta_path=DELTA_PATH)
+        return
+
+    print(
+        f"--- INICIANDO ETL INCREMENTAL (id > {watermark['last_id']}, {len(seen_keys)} llaves previas) ---")
+
+    last_id, last_timestamp = pg_manager.get_watermark()
+    # Releer un margen de ids cubre inserciones concurrentes confirmadas fuera
+    # de orden; las filas ya exportadas se descartan por su geo_temp_key.
+    start_id = max(0, watermark['last_id'] - ETL_WATERMARK_OVERLAP)
+
+    counters = {"raw": 0}
+    written = 0
+    with open(OUTPUT_PATH, mode='a', newline='', encoding='utf-8') as f, \
+            open(DELTA_PATH, mode='w', newline='', encoding='utf-8') as delta_f, \
+            open(KEYS_FILE, mode='a', encoding='utf-8') as keys_file:
         writer = csv.writer(f, delimiter=',')
-        for event in final_events:
-            writer.writerow([
-                event["id"],
-                event["fecha"],
-                event["tipo_incidente"],
-                event["subtipo"],
-                event["comuna"],
-                event["calle"],
-                event["latitud"],
-                event["longitud"]
-            ])
+        delta_writer = csv.writer(delta_f, delimiter=',')
+        for keys, csv_rows in homogenized_batches(counters, start_id, seen_keys):
+            writer.writerows(csv_rows)
+            delta_writer.writerows(csv_rows)
+            keys_file.writelines(key + '\n' for key in keys)
+            written += len(csv_rows)
+
+    save_watermark(max(last_id, watermark['last_id']),
+                   last_timestamp or watermark.get('last_timestamp_scraped'))
 
-    print(f"Datos limpios y homogeneizados exportados a: {output_path}")
+    print(f"Eventos crudos nuevos extraídos de DB: {counters['raw']}")
+    print(f"Eventos nuevos tras homogeneización espacial: {written}")
+    print(f"Delta agregado a {OUTPUT_PATH} y exportado a: {DELTA_PATH}")
 
 
 if __name__ == "__main__":
-    clean_and_homogenize()
+    if ETL_MODE == 'incremental':
+        incremental_homogenize()
+    else:
+        clean_and_homogenize()
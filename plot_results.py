@@ -2,6 +2,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 import os
+from traffic_generator.request_log import iter_windows, REQUEST_LOG_WINDOW_SECONDS
 
 # --------------------------------------------------------------------------
 # Generador de Gráficos de Resultados
@@ -30,7 +31,10 @@ def plot_latency_advanced():
             if 'avg_latency_ms' in df.columns:
                 name = file.replace(".csv", "").upper()
 
-                if 'POSTGRES' in name:
+                if 'ROLLUP' in name:
+                    color = '#e67e22'
+                    label = 'PostgreSQL (Tablas Resumen)'
+                elif 'POSTGRES' in name:
                     color = '#e74c3c'
                     label = 'PostgreSQL (Cálculo al Vuelo)'
                 elif 'REDIS' in name:
@@ -69,5 +73,82 @@ def plot_latency_advanced():
     print(f"Gráfico experto guardado en: {output_img}")
 
 
+def plot_policy_curves(sim_file="results/policy_simulation.csv"):
+    """
+    Grafica las curvas de hit rate vs tamaño de caché por política, desde la
+    salida de cache_service.policy_simulator.
+    """
+    if not os.path.exists(sim_file):
+        return
+
+    df = pd.read_csv(sim_file)
+    plt.figure(figsize=(12, 7))
+    for policy, group in df.groupby('policy'):
+        group = group.sort_values('cache_size')
+        plt.plot(group['cache_size'], group['hit_rate'], marker='o',
+                 label=policy.upper(), linewidth=2.2, alpha=0.85)
+
+    plt.title("Simulación de Políticas de Desalojo: Hit Rate vs Tamaño de Caché",
+              fontsize=16, fontweight='bold', pad=20)
+    plt.xlabel("Tamaño de la caché (llaves)", fontsize=12, labelpad=10)
+    plt.ylabel("Hit Rate (%)", fontsize=12, labelpad=10)
+    plt.xscale('log')
+    plt.grid(True, which="both", ls="--", alpha=0.4)
+    plt.legend(fontsize=12, loc='lower right', framealpha=0.9)
+
+    output_img = "results/curvas_politicas_cache.png"
+    plt.savefig(output_img, dpi=300, bbox_inches='tight')
+    print(f"Curvas de políticas guardadas en: {output_img}")
+
+
+def plot_percentile_bands(window_seconds=REQUEST_LOG_WINDOW_SECONDS):
+    """
+    Grafica p50, banda p50-p99 y p99.9 por ventana desde los logs por
+    solicitud (results/*_requests.bin). El log se recorre en streaming y
+    pandas solo recibe un resumen por ventana.
+    """
+    results_dir = "results"
+    logs = sorted(f for f in os.listdir(results_dir) if f.endswith("_requests.bin"))
+    if not logs:
+        return
+
+    fig, (ax_latency, ax_rps) = plt.subplots(2, 1, figsize=(14, 10), sharex=True,
+                                             gridspec_kw={'height_ratios': [3, 1]})
+    for file in logs:
+        try:
+            df = pd.DataFrame(iter_windows(os.path.join(results_dir, file), window_seconds))
+        except Exception as e:
+            print(f"Error procesando {file}: {e}")
+            continue
+        if df.empty:
+            continue
+
+        label = file.replace("_requests.bin", "").upper()
+        minutes = df['window_start_s'] / 60.0
+        line, = ax_latency.plot(minutes, df['p50_ms'], label=f"{label} p50", linewidth=2)
+        ax_latency.fill_between(minutes, df['p50_ms'], df['p99_ms'],
+                                color=line.get_color(), alpha=0.2, label=f"{label} p50-p99")
+        ax_latency.plot(minutes, df['p999_ms'], color=line.get_color(), linestyle=':',
+                        linewidth=1.2, label=f"{label} p99.9")
+        ax_rps.plot(minutes, df['throughput_rps'], color=line.get_color(), linewidth=1.5)
+
+    ax_latency.set_title(f"Percentiles de Latencia por Ventana de {window_seconds:.0f}s",
+                         fontsize=16, fontweight='bold', pad=20)
+    ax_latency.set_ylabel("Latencia (milisegundos)", fontsize=12, labelpad=10)
+    ax_latency.set_yscale('log')
+    ax_latency.grid(True, which="both", ls="--", alpha=0.4)
+    ax_latency.legend(fontsize=10, loc='upper right', framealpha=0.9)
+
+    ax_rps.set_xlabel("Tiempo de Ejecución del Experimento (minutos)", fontsize=12, labelpad=10)
+    ax_rps.set_ylabel("Solicitudes/s", fontsize=12, labelpad=10)
+    ax_rps.grid(True, ls="--", alpha=0.4)
+
+    output_img = "results/bandas_percentiles.png"
+    fig.savefig(output_img, dpi=300, bbox_inches='tight')
+    print(f"Bandas de percentiles guardadas en: {output_img}")
+
+
 if __name__ == "__main__":
     plot_latency_advanced()
+    plot_policy_curves()
+    plot_percentile_bands()
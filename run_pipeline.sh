@@ -5,17 +5,28 @@ echo "=================================================================="
 echo "Iniciando Pipeline de Procesamiento Distribuido (Waze -> Kibana)"
 echo "=================================================================="
 
-echo "[1/4] Extrayendo, limpiando y homogeneizando datos (ETL)..."
-docker-compose run --rm traffic-app python -m etl.homogenizer
+# ETL_MODE=incremental procesa solo los eventos nuevos desde la última ejecución
+ETL_MODE=${ETL_MODE:-full}
+# ETL_ENGINE=columnar homogeneiza por lotes con NumPy (mismo CSV que 'rows')
+ETL_ENGINE=${ETL_ENGINE:-rows}
+ES_EVENTS_FILE=/app/shared_data/cleaned_waze_events.csv
+if [ "$ETL_MODE" = "incremental" ]; then
+  ES_EVENTS_FILE=/app/shared_data/cleaned_waze_events_delta.csv
+fi
+
+echo "[1/4] Extrayendo, limpiando y homogeneizando datos (ETL, modo $ETL_MODE)..."
+docker-compose run --rm -e ETL_MODE="$ETL_MODE" -e ETL_ENGINE="$ETL_ENGINE" traffic-app python -m etl.homogenizer
 
 echo "[2/4] Procesando Big Data distribuido con Apache Pig (MapReduce)..."
 docker exec -it waze_pig_processor pig -x local /app/processing/traffic_analysis.pig
 
 echo "[3/4] Cargando resultados en capa de baja latencia (Redis Cache)..."
 docker-compose run --rm traffic-app python -m etl.cache_loader
+# Precarga los eventos más consultados en corridas anteriores (si hay popularidad persistida)
+docker-compose run --rm traffic-app python -m cache_service.warmup
 
 echo "[4/4] Indexando datos y métricas para visualización (Elasticsearch)..."
-docker-compose run --rm traffic-app python -m etl.es_loader
+docker-compose run --rm -e ES_EVENTS_FILE="$ES_EVENTS_FILE" traffic-app python -m etl.es_loader
 
 echo "=================================================================="
 echo "¡Pipeline finalizado con éxito!"
@@ -0,0 +1,111 @@
+import os
+import csv
+import time
+from scraper.dedup import DEDUP_TTL_SECONDS, DEDUP_MAX_KEYS
+from storage.db_client import pg_manager
+
+# Utilidades compartidas por los recolectores (Selenium y georss directo),
+# sin depender de selenium ni webdriver_manager.
+
+# --------------------------------------------------------------------------
+# Zonas de la Región Metropolitana
+# --------------------------------------------------------------------------
+ZONAS_RM = [
+    # Provincia de Santiago
+    {"nombre": "Santiago", "lat": "-33.4489",
+        "lon": "-70.6693"}, {"nombre": "Cerrillos", "lat": "-33.5000", "lon": "-70.7167"},
+    {"nombre": "Cerro Navia", "lat": "-33.4222",
+        "lon": "-70.7389"}, {"nombre": "Conchali", "lat": "-33.3833", "lon": "-70.6833"},
+    {"nombre": "El Bosque", "lat": "-33.5667", "lon": "-70.6667"}, {
+        "nombre": "Estacion Central", "lat": "-33.4667", "lon": "-70.7000"},
+    {"nombre": "Huechuraba", "lat": "-33.3667", "lon": "-70.6333"}, {
+        "nombre": "Independencia", "lat": "-33.4167", "lon": "-70.6667"},
+    {"nombre": "La Cisterna", "lat": "-33.5333",
+        "lon": "-70.6667"}, {"nombre": "La Florida", "lat": "-33.5167", "lon": "-70.5333"},
+    {"nombre": "La Granja", "lat": "-33.5333",
+        "lon": "-70.6167"}, {"nombre": "La Pintana", "lat": "-33.5833", "lon": "-70.6333"},
+    {"nombre": "La Reina", "lat": "-33.4500",
+        "lon": "-70.5333"}, {"nombre": "Las Condes", "lat": "-33.4167", "lon": "-70.5833"},
+    {"nombre": "Lo Barnechea", "lat": "-33.3500",
+        "lon": "-70.5167"}, {"nombre": "Lo Espejo", "lat": "-33.5167", "lon": "-70.6833"},
+    {"nombre": "Lo Prado", "lat": "-33.4500",
+        "lon": "-70.7167"}, {"nombre": "Macul", "lat": "-33.5000", "lon": "-70.6000"},
+    {"nombre": "Maipu", "lat": "-33.5167", "lon": "-70.7667"}, {"nombre": "Nunoa",
+                                                                "lat": "-33.4500", "lon": "-70.6000"},
+    {"nombre": "Pedro Aguirre Cerda", "lat": "-33.4833",
+        "lon": "-70.6667"}, {"nombre": "Penalolen", "lat": "-33.4833", "lon": "-70.5333"},
+    {"nombre": "Providencia", "lat": "-33.4333",
+        "lon": "-70.6167"}, {"nombre": "Pudahuel", "lat": "-33.4333", "lon": "-70.7667"},
+    {"nombre": "Quilicura", "lat": "-33.3667", "lon": "-70.7333"}, {
+        "nombre": "Quinta Normal", "lat": "-33.4333", "lon": "-70.6833"},
+    {"nombre": "Recoleta", "lat": "-33.4000",
+        "lon": "-70.6333"}, {"nombre": "Renca", "lat": "-33.4000", "lon": "-70.7333"},
+    {"nombre": "San Joaquin", "lat": "-33.4833",
+        "lon": "-70.6333"}, {"nombre": "San Miguel", "lat": "-33.4833", "lon": "-70.6500"},
+    {"nombre": "San Ramon", "lat": "-33.5333",
+        "lon": "-70.6333"}, {"nombre": "Vitacura", "lat": "-33.4000", "lon": "-70.6000"},
+    # Provincias Periféricas (Cordillera, Maipo, Melipilla, Talagante, Chacabuco)
+    {"nombre": "Puente Alto", "lat": "-33.6167",
+        "lon": "-70.5833"}, {"nombre": "Pirque", "lat": "-33.6333", "lon": "-70.5500"},
+    {"nombre": "San Jose de Maipo", "lat": "-33.6333",
+        "lon": "-70.3500"}, {"nombre": "San Bernardo", "lat": "-33.5833", "lon": "-70.7000"},
+    {"nombre": "Buin", "lat": "-33.7333", "lon": "-70.7333"}, {
+        "nombre": "Calera de Tango", "lat": "-33.6333", "lon": "-70.7833"},
+    {"nombre": "Paine", "lat": "-33.8167", "lon": "-70.7500"}, {"nombre": "Melipilla",
+                                                                "lat": "-33.6833", "lon": "-71.2167"},
+    {"nombre": "Alhue", "lat": "-34.0333", "lon": "-71.1000"}, {"nombre": "Curacavi",
+                                                                "lat": "-33.4000", "lon": "-71.1500"},
+    {"nombre": "Maria Pinto", "lat": "-33.5167",
+        "lon": "-71.1167"}, {"nombre": "San Pedro", "lat": "-33.9000", "lon": "-71.4667"},
+    {"nombre": "Talagante", "lat": "-33.6667",
+        "lon": "-70.9333"}, {"nombre": "El Monte", "lat": "-33.6833", "lon": "-71.0167"},
+    {"nombre": "Isla de Maipo", "lat": "-33.7500", "lon": "-70.9000"}, {
+        "nombre": "Padre Hurtado", "lat": "-33.5667", "lon": "-70.8167"},
+    {"nombre": "Penaflor", "lat": "-33.6000",
+        "lon": "-70.8833"}, {"nombre": "Colina", "lat": "-33.2000", "lon": "-70.6667"},
+    {"nombre": "Lampa", "lat": "-33.2833", "lon": "-70.8667"}, {"nombre": "Tiltil",
+                                                                "lat": "-33.0833", "lon": "-70.9333"}
+]
+zoom = "14"
+
+# --------------------------------------------------------------------------
+# Configuración Compartida
+# --------------------------------------------------------------------------
+SWEEP_LOG_FILE = "results/scraper_sweeps.csv"
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# --------------------------------------------------------------------------
+# Respuestas georss, Deduplicación y Registro de Barridos
+# --------------------------------------------------------------------------
+
+
+def georss_items(raw_data):
+    """Alertas y atascos crudos de una respuesta georss ya decodificada."""
+    items = []
+    if 'alerts' in raw_data:
+        items.extend(raw_data['alerts'])
+    if 'jams' in raw_data:
+        items.extend(raw_data['jams'])
+    return items
+
+
+def preload_uuids(seen_set):
+    """Precarga el filtro de duplicados con los uuids vistos dentro del TTL."""
+    hours = max(1, DEDUP_TTL_SECONDS // 3600)
+    loaded = seen_set.preload(
+        pg_manager.get_recent_uuids(hours=hours, limit=DEDUP_MAX_KEYS))
+    print(f"Filtro de duplicados precargado con {loaded} uuids recientes")
+
+
+def log_sweep(mode, concurrency, elapsed, new_events, failed_zones):
+    """Registra la duración de cada barrido para comparar modos de ejecución."""
+    os.makedirs("results", exist_ok=True)
+    write_header = not os.path.exists(SWEEP_LOG_FILE)
+    with open(SWEEP_LOG_FILE, mode='a', newline='') as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(["timestamp", "mode", "concurrency", "zones",
+                            "sweep_seconds", "new_events", "failed_zones"])
+        writer.writerow([time.strftime("%H:%M:%S"), mode, concurrency, len(ZONAS_RM),
+                        round(elapsed, 2), new_events, failed_zones])
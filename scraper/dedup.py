@@ -0,0 +1,155 @@
+import os
+import math
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# --------------------------------------------------------------------------
+# Configuración del Filtro de Duplicados
+# --------------------------------------------------------------------------
+DEDUP_MAX_KEYS = int(os.getenv('DEDUP_MAX_KEYS', '200000'))
+DEDUP_TTL_SECONDS = int(os.getenv('DEDUP_TTL_SECONDS', '3600'))
+DEDUP_BLOOM = os.getenv('DEDUP_BLOOM', '0') == '1'
+DEDUP_BLOOM_FP_RATE = float(os.getenv('DEDUP_BLOOM_FP_RATE', '0.01'))
+
+# --------------------------------------------------------------------------
+# Filtro de Bloom
+# --------------------------------------------------------------------------
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom sobre un bytearray. Responde "seguro que no está" sin
+    falsos negativos, por lo que sirve como atajo antes del LRU exacto.
+    """
+    def __init__(self, capacity, fp_rate):
+        self.capacity = capacity
+        self.num_bits = max(8, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7))
+                   for pos in self._positions(key))
+
+# --------------------------------------------------------------------------
+# Conjunto de UUIDs Vistos (LRU con TTL)
+# --------------------------------------------------------------------------
+
+
+class SeenSet:
+    """
+    Conjunto acotado de waze_uuid ya procesados por el scraper. Las entradas
+    expiran tras 'ttl_seconds' y, al superar 'max_keys', se descartan las
+    menos recientes. Opcionalmente antepone un filtro de Bloom que resuelve
+    los uuids nuevos sin tocar el LRU.
+    """
+    def __init__(self, max_keys=DEDUP_MAX_KEYS, ttl_seconds=DEDUP_TTL_SECONDS,
+                 use_bloom=DEDUP_BLOOM, bloom_fp_rate=DEDUP_BLOOM_FP_RATE):
+        self.max_keys = max_keys
+        self.ttl_seconds = ttl_seconds
+        self.bloom_fp_rate = bloom_fp_rate
+        self.use_bloom = use_bloom
+        self._entries = OrderedDict()
+        self._bloom = BloomFilter(max_keys, bloom_fp_rate) if use_bloom else None
+        self._lock = threading.Lock()
+        self.stats = {"checked": 0, "dropped": 0}
+
+    def _rebuild_bloom(self):
+        """El Bloom no admite borrados: se reconstruye desde el LRU al llenarse."""
+        self._bloom = BloomFilter(self.max_keys, self.bloom_fp_rate)
+        for key in self._entries:
+            self._bloom.add(key)
+
+    def _seen(self, key, now):
+        if self._bloom is not None and key not in self._bloom:
+            return False
+        expires_at = self._entries.get(key)
+        if expires_at is None:
+            return False
+        if expires_at < now:
+            del self._entries[key]
+            return False
+        return True
+
+    def _add(self, key, expires_at):
+        self._entries[key] = expires_at
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+        if self._bloom is not None:
+            if self._bloom.count >= self.max_keys:
+                self._rebuild_bloom()
+            self._bloom.add(key)
+
+    def preload(self, entries):
+        """
+        Marca como vistos los uuids recientes obtenidos desde PostgreSQL, como
+        pares (waze_uuid, epoch de captura): cada uno expira a partir de su
+        hora de captura y no de la precarga.
+        """
+        now = time.time()
+        with self._lock:
+            # Del más antiguo al más reciente, para que el LRU descarte primero los viejos
+            for key, scraped_at in sorted(entries, key=lambda entry: entry[1]):
+                expires_at = scraped_at + self.ttl_seconds
+                if expires_at > now:
+                    self._add(str(key), expires_at)
+        return len(self._entries)
+
+    def filter_new(self, events):
+        """
+        Devuelve solo los eventos cuyo waze_uuid no se ha visto dentro del TTL
+        (ni se repite dentro del mismo lote). No los registra: el llamador
+        invoca mark_seen una vez que el lote quedó guardado, así un INSERT
+        fallido no descarta los eventos durante todo el TTL.
+        """
+        now = time.time()
+        fresh = []
+        batch_keys = set()
+        with self._lock:
+            for event in events:
+                # Los jams de georss traen un id entero; PostgreSQL lo guarda como texto
+                key = str(event['waze_uuid'])
+                self.stats["checked"] += 1
+                if key in batch_keys or self._seen(key, now):
+                    self.stats["dropped"] += 1
+                    continue
+                batch_keys.add(key)
+                fresh.append(event)
+        return fresh
+
+    def mark_seen(self, uuids):
+        """Registra como vistos los uuids ya persistidos."""
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            for key in uuids:
+                self._add(str(key), expires_at)
+
+    def reset_stats(self):
+        """Reinicia los contadores (p. ej. al comenzar un nuevo barrido)."""
+        with self._lock:
+            self.stats = {"checked": 0, "dropped": 0}
+
+    def get_metrics(self):
+        """Resumen legible de la tasa de descarte."""
+        checked = self.stats["checked"]
+        dropped = self.stats["dropped"]
+        drop_rate = (dropped / checked * 100) if checked > 0 else 0
+        return f"Duplicados descartados: {dropped}/{checked} ({drop_rate:.1f}%) | En memoria: {len(self._entries)}"
+
+
+seen_events = SeenSet()
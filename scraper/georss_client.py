@@ -0,0 +1,208 @@
+import os
+import math
+import time
+import random
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from scraper.data_processor import process_waze_event
+from scraper.dedup import seen_events
+from scraper.common import ZONAS_RM, zoom, USER_AGENT, georss_items, preload_uuids, log_sweep
+from storage.db_client import pg_manager
+
+# --------------------------------------------------------------------------
+# Configuración del Cliente georss (sin navegador)
+# --------------------------------------------------------------------------
+GEORSS_URL = os.getenv('GEORSS_URL', 'https://www.waze.com/live-map/api/georss')
+GEORSS_CONCURRENCY = int(os.getenv('GEORSS_CONCURRENCY', '8'))
+GEORSS_RETRIES = int(os.getenv('GEORSS_RETRIES', '3'))
+GEORSS_HTTP_TIMEOUT = float(os.getenv('GEORSS_HTTP_TIMEOUT', '10'))
+GEORSS_TILE_SPLIT = int(os.getenv('GEORSS_TILE_SPLIT', '1'))
+
+# Mismo viewport que usa el navegador headless del scraper Selenium
+VIEWPORT_WIDTH = 1920
+VIEWPORT_HEIGHT = 1080
+TILE_SIZE = 256
+
+# --------------------------------------------------------------------------
+# Cálculo de Bounding Boxes (Web Mercator)
+# --------------------------------------------------------------------------
+
+
+def _lat_to_y(lat):
+    """Latitud a coordenada Y de Web Mercator normalizada (0..1)."""
+    sin_lat = math.sin(math.radians(lat))
+    return 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+
+
+def _y_to_lat(y):
+    """Inversa de _lat_to_y."""
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+
+
+def viewport_bbox(lat, lon, zoom_level):
+    """
+    Calcula el bounding box que cubre un viewport de VIEWPORT_WIDTH x
+    VIEWPORT_HEIGHT píxeles centrado en (lat, lon) al nivel de zoom dado.
+    """
+    world_px = TILE_SIZE * (2 ** zoom_level)
+    half_w = (VIEWPORT_WIDTH / 2) / world_px
+    half_h = (VIEWPORT_HEIGHT / 2) / world_px
+
+    center_y = _lat_to_y(lat)
+    return {
+        "top": _y_to_lat(center_y - half_h),
+        "bottom": _y_to_lat(center_y + half_h),
+        "left": lon - half_w * 360.0,
+        "right": lon + half_w * 360.0
+    }
+
+
+def split_bbox(bbox, parts):
+    """Divide un bounding box en una grilla de parts x parts tiles."""
+    if parts <= 1:
+        return [bbox]
+    lat_step = (bbox["top"] - bbox["bottom"]) / parts
+    lon_step = (bbox["right"] - bbox["left"]) / parts
+    tiles = []
+    for i in range(parts):
+        for j in range(parts):
+            tiles.append({
+                "top": bbox["top"] - i * lat_step,
+                "bottom": bbox["top"] - (i + 1) * lat_step,
+                "left": bbox["left"] + j * lon_step,
+                "right": bbox["left"] + (j + 1) * lon_step
+            })
+    return tiles
+
+
+def compute_tiles(zonas=ZONAS_RM, zoom_level=int(zoom), parts=GEORSS_TILE_SPLIT):
+    """Genera los tiles georss de todas las zonas a partir de sus centroides."""
+    tiles = []
+    for zona in zonas:
+        bbox = viewport_bbox(float(zona["lat"]), float(zona["lon"]), zoom_level)
+        for tile in split_bbox(bbox, parts):
+            tile["zona"] = zona["nombre"]
+            tiles.append(tile)
+    return tiles
+
+# --------------------------------------------------------------------------
+# Cliente HTTP georss
+# --------------------------------------------------------------------------
+
+
+def create_session(pool_size=GEORSS_CONCURRENCY, retries=GEORSS_RETRIES):
+    """Crea una sesión HTTP con pool de conexiones y reintentos con backoff."""
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",)
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size,
+                          pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT,
+                            "Referer": "https://www.waze.com/live-map"})
+    return session
+
+
+def fetch_tile(session, tile, url=GEORSS_URL):
+    """Descarga un tile georss y devuelve sus alertas y atascos crudos."""
+    params = {
+        "top": f"{tile['top']:.6f}",
+        "bottom": f"{tile['bottom']:.6f}",
+        "left": f"{tile['left']:.6f}",
+        "right": f"{tile['right']:.6f}",
+        "env": "row",
+        "types": "alerts,traffic"
+    }
+    response = session.get(url, params=params, timeout=GEORSS_HTTP_TIMEOUT)
+    response.raise_for_status()
+    return georss_items(response.json())
+
+
+def collect_tiles(tiles, session=None, url=GEORSS_URL, concurrency=GEORSS_CONCURRENCY):
+    """
+    Descarga los tiles en paralelo (acotado por 'concurrency'), procesa cada
+    item con process_waze_event y guarda los eventos por lote en PostgreSQL.
+    """
+    own_session = session is None
+    if own_session:
+        session = create_session(pool_size=concurrency)
+
+    totals = {"tiles": len(tiles), "failed_tiles": 0,
+              "items": 0, "new_events": 0}
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(fetch_tile, session, tile, url): tile
+                       for tile in tiles}
+            for future in as_completed(futures):
+                tile = futures[future]
+                try:
+                    items = future.result()
+                except Exception as e:
+                    print(f"Error descargando tile de {tile['zona']}: {e}")
+                    totals["failed_tiles"] += 1
+                    continue
+
+                batch = []
+                for item in items:
+                    clean_event = process_waze_event(item)
+                    if clean_event:
+                        batch.append(clean_event)
+
+                totals["items"] += len(items)
+                fresh = seen_events.filter_new(batch)
+                try:
+                    totals["new_events"] += pg_manager.insert_events(fresh)
+                except Exception as e:
+                    # Sin marcarlos como vistos: se reintentan en el próximo barrido
+                    print(f"Error guardando {len(fresh)} eventos de {tile['zona']}: {e}")
+                    continue
+                seen_events.mark_seen(event['waze_uuid'] for event in fresh)
+    finally:
+        if own_session:
+            session.close()
+
+    return totals
+
+# --------------------------------------------------------------------------
+# Bucle Principal de Ejecución
+# --------------------------------------------------------------------------
+
+
+if __name__ == "__main__":
+    print(f"Iniciando recolección georss SIN NAVEGADOR desde {GEORSS_URL}")
+    tiles = compute_tiles()
+    preload_uuids(seen_events)
+    session = create_session()
+    try:
+        while True:
+            sweep_start = time.time()
+            totals = collect_tiles(tiles, session=session)
+            elapsed = time.time() - sweep_start
+            log_sweep("georss", GEORSS_CONCURRENCY, elapsed,
+                      totals["new_events"], totals["failed_tiles"])
+
+            print("--- RESUMEN BARRIDO RM (georss) ---")
+            print(
+                f"Tiles: {totals['tiles']} ({totals['failed_tiles']} fallidos) en {elapsed:.1f}s")
+            print(f"Items recibidos:          {totals['items']}")
+            print(f"Nuevos eventos guardados: {totals['new_events']}")
+            print(f"Total en PostgreSQL:      {pg_manager.count_events()}")
+            print(seen_events.get_metrics())
+            seen_events.reset_stats()
+
+            wait_time = random.randint(15, 30)
+            print(
+                f"Durmiendo {wait_time} segundos antes del siguiente barrido...")
+            time.sleep(wait_time)
+
+    except KeyboardInterrupt:
+        print("\nRecolección detenida manualmente.")
+    finally:
+        session.close()
@@ -0,0 +1,99 @@
+import os
+import sys
+import json
+import glob
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# --------------------------------------------------------------------------
+# Servidor local georss (respuestas grabadas)
+# --------------------------------------------------------------------------
+# Permite probar scraper.georss_client sin salir a Internet:
+#   python -m scraper.georss_stub_server <carpeta_con_json> [puerto]
+#   GEORSS_URL=http://localhost:8081/live-map/api/georss python -m scraper.georss_client
+
+STUB_PORT = int(os.getenv('GEORSS_STUB_PORT', '8081'))
+
+
+def load_payloads(fixtures_dir):
+    """Une las alertas y atascos de todas las respuestas georss grabadas."""
+    merged = {"alerts": [], "jams": []}
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, '*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        merged["alerts"].extend(payload.get("alerts", []))
+        merged["jams"].extend(payload.get("jams", []))
+    return merged
+
+
+def _item_point(item):
+    if 'location' in item:
+        return item['location']['x'], item['location']['y']
+    if item.get('line'):
+        return item['line'][0]['x'], item['line'][0]['y']
+    return None
+
+
+def filter_by_bbox(payload, top, bottom, left, right):
+    """Devuelve solo los items cuyo punto cae dentro del bounding box pedido."""
+    def inside(item):
+        point = _item_point(item)
+        if point is None:
+            return False
+        x, y = point
+        return left <= x <= right and bottom <= y <= top
+
+    return {
+        "alerts": [a for a in payload["alerts"] if inside(a)],
+        "jams": [j for j in payload["jams"] if inside(j)]
+    }
+
+
+def make_handler(payload):
+    class GeorssHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            if not parsed.path.endswith("/live-map/api/georss"):
+                self.send_error(404)
+                return
+
+            params = parse_qs(parsed.query)
+            try:
+                body = filter_by_bbox(payload,
+                                      float(params["top"][0]), float(params["bottom"][0]),
+                                      float(params["left"][0]), float(params["right"][0]))
+            except (KeyError, ValueError):
+                body = payload
+
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return GeorssHandler
+
+
+def serve(fixtures_dir, port=STUB_PORT):
+    """Levanta el servidor georss local sobre las respuestas de fixtures_dir."""
+    payload = load_payloads(fixtures_dir)
+    server = ThreadingHTTPServer(("0.0.0.0", port), make_handler(payload))
+    print(f"Servidor georss local en http://localhost:{port}/live-map/api/georss "
+          f"({len(payload['alerts'])} alertas, {len(payload['jams'])} atascos)")
+    return server
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python -m scraper.georss_stub_server <carpeta_con_json> [puerto]")
+        sys.exit(1)
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else STUB_PORT
+    server = serve(sys.argv[1], port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
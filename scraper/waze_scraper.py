@@ -1,152 +1,289 @@
+import os
 import json
 import time
+import queue
 import random
+import threading
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 from scraper.data_processor import process_waze_event
+from scraper.dedup import seen_events
+from scraper.common import ZONAS_RM, zoom, USER_AGENT, georss_items, preload_uuids, log_sweep
 from storage.db_client import pg_manager
 
 # --------------------------------------------------------------------------
-# Zonas de la Región Metropolitana
+# Configuración del Scraper
 # --------------------------------------------------------------------------
-ZONAS_RM = [
-    # Provincia de Santiago
-    {"nombre": "Santiago", "lat": "-33.4489",
-        "lon": "-70.6693"}, {"nombre": "Cerrillos", "lat": "-33.5000", "lon": "-70.7167"},
-    {"nombre": "Cerro Navia", "lat": "-33.4222",
-        "lon": "-70.7389"}, {"nombre": "Conchali", "lat": "-33.3833", "lon": "-70.6833"},
-    {"nombre": "El Bosque", "lat": "-33.5667", "lon": "-70.6667"}, {
-        "nombre": "Estacion Central", "lat": "-33.4667", "lon": "-70.7000"},
-    {"nombre": "Huechuraba", "lat": "-33.3667", "lon": "-70.6333"}, {
-        "nombre": "Independencia", "lat": "-33.4167", "lon": "-70.6667"},
-    {"nombre": "La Cisterna", "lat": "-33.5333",
-        "lon": "-70.6667"}, {"nombre": "La Florida", "lat": "-33.5167", "lon": "-70.5333"},
-    {"nombre": "La Granja", "lat": "-33.5333",
-        "lon": "-70.6167"}, {"nombre": "La Pintana", "lat": "-33.5833", "lon": "-70.6333"},
-    {"nombre": "La Reina", "lat": "-33.4500",
-        "lon": "-70.5333"}, {"nombre": "Las Condes", "lat": "-33.4167", "lon": "-70.5833"},
-    {"nombre": "Lo Barnechea", "lat": "-33.3500",
-        "lon": "-70.5167"}, {"nombre": "Lo Espejo", "lat": "-33.5167", "lon": "-70.6833"},
-    {"nombre": "Lo Prado", "lat": "-33.4500",
-        "lon": "-70.7167"}, {"nombre": "Macul", "lat": "-33.5000", "lon": "-70.6000"},
-    {"nombre": "Maipu", "lat": "-33.5167", "lon": "-70.7667"}, {"nombre": "Nunoa",
-                                                                "lat": "-33.4500", "lon": "-70.6000"},
-    {"nombre": "Pedro Aguirre Cerda", "lat": "-33.4833",
-        "lon": "-70.6667"}, {"nombre": "Penalolen", "lat": "-33.4833", "lon": "-70.5333"},
-    {"nombre": "Providencia", "lat": "-33.4333",
-        "lon": "-70.6167"}, {"nombre": "Pudahuel", "lat": "-33.4333", "lon": "-70.7667"},
-    {"nombre": "Quilicura", "lat": "-33.3667", "lon": "-70.7333"}, {
-        "nombre": "Quinta Normal", "lat": "-33.4333", "lon": "-70.6833"},
-    {"nombre": "Recoleta", "lat": "-33.4000",
-        "lon": "-70.6333"}, {"nombre": "Renca", "lat": "-33.4000", "lon": "-70.7333"},
-    {"nombre": "San Joaquin", "lat": "-33.4833",
-        "lon": "-70.6333"}, {"nombre": "San Miguel", "lat": "-33.4833", "lon": "-70.6500"},
-    {"nombre": "San Ramon", "lat": "-33.5333",
-        "lon": "-70.6333"}, {"nombre": "Vitacura", "lat": "-33.4000", "lon": "-70.6000"},
-    # Provincias Periféricas (Cordillera, Maipo, Melipilla, Talagante, Chacabuco)
-    {"nombre": "Puente Alto", "lat": "-33.6167",
-        "lon": "-70.5833"}, {"nombre": "Pirque", "lat": "-33.6333", "lon": "-70.5500"},
-    {"nombre": "San Jose de Maipo", "lat": "-33.6333",
-        "lon": "-70.3500"}, {"nombre": "San Bernardo", "lat": "-33.5833", "lon": "-70.7000"},
-    {"nombre": "Buin", "lat": "-33.7333", "lon": "-70.7333"}, {
-        "nombre": "Calera de Tango", "lat": "-33.6333", "lon": "-70.7833"},
-    {"nombre": "Paine", "lat": "-33.8167", "lon": "-70.7500"}, {"nombre": "Melipilla",
-                                                                "lat": "-33.6833", "lon": "-71.2167"},
-    {"nombre": "Alhue", "lat": "-34.0333", "lon": "-71.1000"}, {"nombre": "Curacavi",
-                                                                "lat": "-33.4000", "lon": "-71.1500"},
-    {"nombre": "Maria Pinto", "lat": "-33.5167",
-        "lon": "-71.1167"}, {"nombre": "San Pedro", "lat": "-33.9000", "lon": "-71.4667"},
-    {"nombre": "Talagante", "lat": "-33.6667",
-        "lon": "-70.9333"}, {"nombre": "El Monte", "lat": "-33.6833", "lon": "-71.0167"},
-    {"nombre": "Isla de Maipo", "lat": "-33.7500", "lon": "-70.9000"}, {
-        "nombre": "Padre Hurtado", "lat": "-33.5667", "lon": "-70.8167"},
-    {"nombre": "Penaflor", "lat": "-33.6000",
-        "lon": "-70.8833"}, {"nombre": "Colina", "lat": "-33.2000", "lon": "-70.6667"},
-    {"nombre": "Lampa", "lat": "-33.2833", "lon": "-70.8667"}, {"nombre": "Tiltil",
-                                                                "lat": "-33.0833", "lon": "-70.9333"}
-]
-zoom = "14"
+SCRAPER_CONCURRENCY = int(os.getenv('SCRAPER_CONCURRENCY', '1'))
+GEORSS_TIMEOUT = float(os.getenv('GEORSS_TIMEOUT', '15'))
+GEORSS_SETTLE = float(os.getenv('GEORSS_SETTLE', '1'))
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
 
 # --------------------------------------------------------------------------
-# Waze Scraper
+# Navegadores Headless
 # --------------------------------------------------------------------------
 
 
-def get_waze_traffic_data(lat, lon, nombre_zona):
-    """
-    Realiza scraping de datos de tráfico de Waze para una zona específica y
-    los almacena en la base de datos PostgreSQL.
-    """
-    print(f"--- INICIANDO SCRAPER ZONA: {nombre_zona} (PostgreSQL) ---")
+def _get_driver_path():
+    """Resuelve el binario de ChromeDriver una sola vez por proceso."""
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = ChromeDriverManager().install()
+        return _driver_path
 
-    WAZE_URL = f"https://www.waze.com/es-419/live-map/directions?latlng={lat}%2C{lon}&zoom={zoom}"
 
+def create_driver():
+    """Crea un Chrome headless con el log de performance habilitado."""
     chrome_options = Options()
     chrome_options.add_argument("--headless")
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
     chrome_options.add_argument("--window-size=1920,1080")
-    user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    chrome_options.add_argument(f'user-agent={user_agent}')
+    chrome_options.add_argument(f'user-agent={USER_AGENT}')
     chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
 
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=chrome_options)
+    service = Service(_get_driver_path())
+    return webdriver.Chrome(service=service, options=chrome_options)
 
-    new_events_count = 0
 
-    try:
-        driver.get(WAZE_URL)
-        print("Cargando mapa... (esperando 8s)")
-        time.sleep(8)
-        driver.execute_script("window.scrollTo(0, 100);")
-        time.sleep(2)
+class DriverPool:
+    """
+    Pool acotado de navegadores de larga vida. Los drivers se crean bajo
+    demanda hasta 'size' y se reutilizan entre zonas; un driver que falla se
+    descarta y su cupo queda libre para uno nuevo.
+    """
+    def __init__(self, size):
+        self.size = size
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
 
-        logs = driver.get_log('performance')
+    def acquire(self):
+        """Entrega un driver libre, creando uno nuevo si aún hay cupo."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
 
-        for entry in logs:
-            try:
-                message_json = json.loads(entry['message'])
-                message = message_json['message']
-                if message['method'] == 'Network.responseReceived':
-                    response_url = message['params']['response']['url']
-
-                    if "live-map/api/georss" in response_url:
-                        request_id = message['params']['requestId']
-                        response_body = driver.execute_cdp_cmd(
-                            'Network.getResponseBody', {'requestId': request_id})
-                        raw_data = json.loads(response_body['body'])
-
-                        items_to_process = []
-                        if 'alerts' in raw_data:
-                            items_to_process.extend(raw_data['alerts'])
-                        if 'jams' in raw_data:
-                            items_to_process.extend(raw_data['jams'])
-
-                        for item in items_to_process:
-                            clean_event = process_waze_event(item)
-                            if clean_event:
-                                saved = pg_manager.insert_event(clean_event)
-                                if saved:
-                                    new_events_count += 1
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
 
+        if can_create:
+            try:
+                return create_driver()
             except Exception:
-                pass
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get()
+
+    def release(self, driver):
+        """Devuelve un driver sano al pool."""
+        self._idle.put(driver)
+
+    def discard(self, driver):
+        """Cierra un driver defectuoso y libera su cupo."""
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    def close_all(self):
+        """Cierra todos los drivers inactivos del pool."""
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(driver)
+
+# --------------------------------------------------------------------------
+# Captura de Respuestas georss
+# --------------------------------------------------------------------------
+
+
+def _is_georss_response(entry):
+    """Indica si una entrada del log de performance es la respuesta georss."""
+    try:
+        message = json.loads(entry['message'])['message']
+        return (message['method'] == 'Network.responseReceived' and
+                "live-map/api/georss" in message['params']['response']['url'])
+    except Exception:
+        return False
+
+
+def wait_for_georss(driver, timeout=GEORSS_TIMEOUT, poll_interval=0.25):
+    """
+    Consume el log de performance hasta que aparece una respuesta georss o
+    se agota el timeout. Devuelve todas las entradas leídas, ya que
+    get_log() vacía el buffer del navegador.
+    """
+    entries = []
+    deadline = time.time() + timeout
+    while True:
+        batch = driver.get_log('performance')
+        entries.extend(batch)
+        if any(_is_georss_response(entry) for entry in batch):
+            return entries, True
+        if time.time() >= deadline:
+            return entries, False
+        time.sleep(poll_interval)
+
 
+def extract_georss_events(driver, logs):
+    """Obtiene el cuerpo de cada respuesta georss y lo procesa en eventos limpios."""
+    events = []
+    for entry in logs:
+        if not _is_georss_response(entry):
+            continue
+        try:
+            message = json.loads(entry['message'])['message']
+            request_id = message['params']['requestId']
+            response_body = driver.execute_cdp_cmd(
+                'Network.getResponseBody', {'requestId': request_id})
+            raw_data = json.loads(response_body['body'])
+
+            for item in georss_items(raw_data):
+                clean_event = process_waze_event(item)
+                if clean_event:
+                    events.append(clean_event)
+
+        except Exception:
+            pass
+    return events
+
+# --------------------------------------------------------------------------
+# Waze Scraper
+# --------------------------------------------------------------------------
+
+
+def scrape_zone(driver, lat, lon, nombre_zona):
+    """
+    Captura los eventos de una zona con un driver ya abierto y los guarda en
+    PostgreSQL. Devuelve la cantidad de eventos nuevos.
+    """
+    WAZE_URL = f"https://www.waze.com/es-419/live-map/directions?latlng={lat}%2C{lon}&zoom={zoom}"
+
+    # Descartamos respuestas rezagadas de la zona anterior
+    driver.get_log('performance')
+    driver.get(WAZE_URL)
+
+    logs, found = wait_for_georss(driver)
+    if not found:
+        print(
+            f"Advertencia: sin respuesta georss en {nombre_zona} tras {GEORSS_TIMEOUT}s")
+
+    driver.execute_script("window.scrollTo(0, 100);")
+    time.sleep(GEORSS_SETTLE)
+    logs.extend(driver.get_log('performance'))
+
+    events = seen_events.filter_new(extract_georss_events(driver, logs))
+    try:
+        inserted = pg_manager.insert_events(events)
     except Exception as e:
-        print(f"Error en scraping: {e}")
-    finally:
-        driver.quit()
+        # Sin marcarlos como vistos: se reintentan en el próximo barrido
+        print(f"Error guardando {len(events)} eventos de {nombre_zona}: {e}")
+        return 0
+    seen_events.mark_seen(event['waze_uuid'] for event in events)
+    return inserted
 
+
+def _print_zone_summary(nombre_zona, new_events_count):
     total_in_db = pg_manager.count_events()
     print(f"--- RESUMEN CICLO ({nombre_zona}) ---")
     print(f"Nuevos eventos guardados: {new_events_count}")
     print(f"Total en PostgreSQL:      {total_in_db}")
 
+
+def get_waze_traffic_data(lat, lon, nombre_zona, pool=None):
+    """
+    Realiza scraping de datos de tráfico de Waze para una zona específica y
+    los almacena en la base de datos PostgreSQL. Con 'pool' reutiliza su
+    navegador entre zonas; sin él abre y cierra uno solo para esta zona.
+    Los errores del navegador o del scraping se propagan (tras descartar el
+    driver) para que el barrido cuente la zona como fallida.
+    """
+    print(f"--- INICIANDO SCRAPER ZONA: {nombre_zona} (PostgreSQL) ---")
+
+    driver = pool.acquire() if pool else create_driver()
+    new_events_count = 0
+
+    try:
+        new_events_count = scrape_zone(driver, lat, lon, nombre_zona)
+        if pool:
+            pool.release(driver)
+    except Exception:
+        if pool:
+            pool.discard(driver)
+        raise
+    finally:
+        if not pool:
+            driver.quit()
+        _print_zone_summary(nombre_zona, new_events_count)
     return new_events_count
 
+
+def run_concurrent_sweep(zonas, pool, concurrency):
+    """
+    Recorre las zonas con 'concurrency' workers que toman zonas desde una
+    cola compartida y reutilizan los drivers del pool.
+    """
+    pending = queue.Queue()
+    for zona in zonas:
+        pending.put(zona)
+
+    totals = {"new_events": 0, "failed_zones": 0}
+    totals_lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                zona = pending.get_nowait()
+            except queue.Empty:
+                return
+
+            new_events_count = 0
+            try:
+                driver = pool.acquire()
+            except Exception as e:
+                print(f"Error creando navegador para {zona['nombre']}: {e}")
+                with totals_lock:
+                    totals["failed_zones"] += 1
+                continue
+
+            try:
+                new_events_count = scrape_zone(
+                    driver, zona["lat"], zona["lon"], zona["nombre"])
+                pool.release(driver)
+            except Exception as e:
+                print(f"Error en scraping ({zona['nombre']}): {e}")
+                pool.discard(driver)
+                with totals_lock:
+                    totals["failed_zones"] += 1
+
+            with totals_lock:
+                totals["new_events"] += new_events_count
+            _print_zone_summary(zona["nombre"], new_events_count)
+
+    threads = [threading.Thread(target=worker, daemon=True)
+               for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return totals
+
+
 # --------------------------------------------------------------------------
 # Bucle Principal de Ejecución
 # --------------------------------------------------------------------------
@@ -154,12 +291,36 @@ def get_waze_traffic_data(lat, lon, nombre_zona):
 
 if __name__ == "__main__":
     print("Iniciando recolección continua MULTIZONA hacia PostgreSQL.")
+    # También el modo secuencial reutiliza su navegador (pool de 1) entre zonas
+    pool = DriverPool(max(1, SCRAPER_CONCURRENCY))
+    preload_uuids(seen_events)
     try:
         while True:
-            for zona in ZONAS_RM:
-                get_waze_traffic_data(zona["lat"], zona["lon"], zona["nombre"])
-                time.sleep(5)
+            sweep_start = time.time()
+            if SCRAPER_CONCURRENCY > 1:
+                totals = run_concurrent_sweep(
+                    ZONAS_RM, pool, SCRAPER_CONCURRENCY)
+                log_sweep("concurrent", SCRAPER_CONCURRENCY, time.time() - sweep_start,
+                          totals["new_events"], totals["failed_zones"])
+            else:
+                new_events = 0
+                failed_zones = 0
+                for zona in ZONAS_RM:
+                    try:
+                        new_events += get_waze_traffic_data(
+                            zona["lat"], zona["lon"], zona["nombre"], pool=pool)
+                    except Exception as e:
+                        print(f"Error en scraping ({zona['nombre']}): {e}")
+                        failed_zones += 1
+                    time.sleep(5)
+                log_sweep("sequential", 1, time.time() -
+                          sweep_start, new_events, failed_zones)
 
+            print(
+                f"Barrido RM en {time.time() - sweep_start:.1f}s")
+            print(seen_events.get_metrics())
+            print(f"Pool PostgreSQL: {pg_manager.get_pool_metrics()}")
+            seen_events.reset_stats()
             wait_time = random.randint(15, 30)
             print(
                 f"Ciclo RM completado. Durmiendo {wait_time} segundos antes del siguiente barrido...")
@@ -167,3 +328,5 @@ if __name__ == "__main__":
 
     except KeyboardInterrupt:
         print("\nRecolección detenida manually.")
+    finally:
+        pool.close_all()
@@ -1,7 +1,12 @@
+import io
 import os
 import time
+import threading
 import psycopg2
+from contextlib import contextmanager
+from datetime import date
 from psycopg2.extras import Json
+from storage import partitioning, sampling
 
 # --------------------------------------------------------------------------
 # Configuración de la Base de Datos
@@ -13,45 +18,223 @@ DB_USER = "waze_user"
 DB_PASS = "waze_password"
 DB_PORT = "5432"
 
+# Tablas resumen (rollups) mantenidas por triggers en cada INSERT/DELETE
+DB_ROLLUPS = os.getenv('DB_ROLLUPS', '0') == '1'
+
+ETL_FETCH_SIZE = int(os.getenv('ETL_FETCH_SIZE', '10000'))
+
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+DB_POOL_HEALTHCHECK_SECONDS = float(
+    os.getenv('DB_POOL_HEALTHCHECK_SECONDS', '30'))
+
 # --------------------------------------------------------------------------
-# Cliente de PostgreSQL para Waze
+# Pool de Conexiones Thread-Safe
 # --------------------------------------------------------------------------
 
-class WazePostgresClient:
+
+class PoolTimeoutError(Exception):
+    """No se obtuvo una conexión libre dentro del timeout del pool."""
+
+
+class ConnectionPool:
     """
-    Cliente para gestionar la conexión y operaciones con la base de datos
-    PostgreSQL, incluyendo la creación de tablas y la inserción de eventos.
+    Pool acotado de conexiones autocommit a PostgreSQL, seguro entre hilos.
+    Cada conexión se usa por un solo hilo a la vez; las que llevan tiempo
+    inactivas se validan con SELECT 1 al entregarse y las rotas se
+    reemplazan de forma transparente.
     """
-    def __init__(self):
-        self.conn = None
-        self._connect()
-        self._create_table()
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX,
+                 timeout=DB_POOL_TIMEOUT, healthcheck_seconds=DB_POOL_HEALTHCHECK_SECONDS):
+        self.minconn = minconn
+        self.maxconn = max(minconn, maxconn)
+        self.timeout = timeout
+        self.healthcheck_seconds = healthcheck_seconds
 
-    def _connect(self):
-        """Conecta a la base de datos con reintentos."""
+        self._idle = []
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self.stats = {"checkouts": 0, "waits": 0, "wait_time_ms": 0.0,
+                      "timeouts": 0, "created": 0, "reconnects": 0}
+
+        for _ in range(self.minconn):
+            self._idle.append((self._new_connection(), time.time()))
+
+    def _new_connection(self):
+        """Abre una conexión nueva con reintentos."""
         attempts = 0
         while attempts < 5:
             try:
-                self.conn = psycopg2.connect(
+                conn = psycopg2.connect(
                     host=DB_HOST,
                     database=DB_NAME,
                     user=DB_USER,
                     password=DB_PASS,
                     port=DB_PORT
                 )
-                self.conn.autocommit = True
-                print("Conectado exitosamente a PostgreSQL")
-                return
+                conn.autocommit = True
+                self.stats["created"] += 1
+                return conn
             except Exception as e:
                 print(f"Esperando a PostgreSQL... ({e})")
                 time.sleep(2)
                 attempts += 1
         raise Exception("No se pudo conectar a la Base de Datos")
 
+    def _is_healthy(self, conn, idle_since):
+        if conn.closed:
+            return False
+        if time.time() - idle_since < self.healthcheck_seconds:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            return True
+        except Exception:
+            return False
+
+    def getconn(self):
+        """Toma una conexión del pool, esperando como máximo 'timeout' segundos."""
+        start = time.time()
+        deadline = start + self.timeout
+        waited = False
+
+        with self._cond:
+            while not self._idle and self._in_use >= self.maxconn:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        f"Sin conexiones libres tras {self.timeout}s ({self.maxconn} en uso)")
+                waited = True
+                self._cond.wait(remaining)
+
+            entry = self._idle.pop() if self._idle else None
+            self._in_use += 1
+            self.stats["checkouts"] += 1
+            if waited:
+                self.stats["waits"] += 1
+                self.stats["wait_time_ms"] += (time.time() - start) * 1000
+
+        try:
+            if entry is not None:
+                conn, idle_since = entry
+                if self._is_healthy(conn, idle_since):
+                    return conn
+                self._close_quietly(conn)
+                self.stats["reconnects"] += 1
+            return self._new_connection()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def putconn(self, conn, discard=False):
+        """Devuelve una conexión al pool (o la cierra si quedó inutilizable)."""
+        with self._cond:
+            self._in_use -= 1
+            if discard or conn.closed:
+                self._close_quietly(conn)
+            else:
+                self._idle.append((conn, time.time()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager que entrega y devuelve una conexión del pool."""
+        conn = self.getconn()
+        discard = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+    def closeall(self):
+        """Cierra todas las conexiones inactivas."""
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._close_quietly(conn)
+
+    def get_metrics(self):
+        """Métricas del pool para dimensionarlo bajo carga."""
+        with self._cond:
+            return dict(self.stats, in_use=self._in_use, idle=len(self._idle),
+                        maxconn=self.maxconn)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+# --------------------------------------------------------------------------
+# Cliente de PostgreSQL para Waze
+# --------------------------------------------------------------------------
+
+class WazePostgresClient:
+    """
+    Cliente para gestionar la conexión y operaciones con la base de datos
+    PostgreSQL, incluyendo la creación de tablas y la inserción de eventos.
+    """
+    def __init__(self):
+        self.pool = None
+        self.partitioned = False
+        self._next_maintenance = None
+        self._maintenance_retry_at = 0.0
+        self._maintenance_lock = threading.RLock()
+        self._connect()
+        self._create_table()
+        if DB_ROLLUPS:
+            self._create_rollups()
+        self._maybe_maintain_partitions()
+
+    def _connect(self):
+        """Inicializa el pool de conexiones (cada conexión reintenta por su cuenta)."""
+        self.pool = ConnectionPool()
+        print(
+            f"Conectado exitosamente a PostgreSQL (pool {self.pool.minconn}-{self.pool.maxconn})")
+
+    def connection(self):
+        """Entrega una conexión exclusiva del pool como context manager."""
+        return self.pool.connection()
+
+    @contextmanager
+    def cursor(self):
+        """Cursor sobre una conexión tomada del pool durante el bloque."""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                yield cur
+
+    def get_pool_metrics(self):
+        """Expone las métricas del pool (esperas, checkouts, conexiones en uso)."""
+        return self.pool.get_metrics()
+
     def _create_table(self):
         """Define el esquema de la tabla y habilita PostGIS."""
-        with self.conn.cursor() as cur:
+        with self.cursor() as cur:
             cur.execute("CREATE EXTENSION IF NOT EXISTS postgis;")
+            if partitioning.DB_PARTITIONED:
+                cur.execute("SELECT to_regclass('traffic_events') IS NOT NULL;")
+                exists = cur.fetchone()[0]
+                if not exists or partitioning.is_partitioned(cur):
+                    partitioning.create_partitioned_schema(cur)
+                    self.partitioned = True
+                else:
+                    print("Advertencia: traffic_events ya existe sin particionar; "
+                          "se mantiene el esquema actual (DB_PARTITIONED ignorado).")
+            else:
+                self.partitioned = partitioning.is_partitioned(cur)
+
+            if self.partitioned:
+                return
+
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS traffic_events (
                     id SERIAL PRIMARY KEY,
@@ -71,62 +254,343 @@ class WazePostgresClient:
                 CREATE INDEX IF NOT EXISTS idx_traffic_location
                 ON traffic_events USING GIST (location);
             """)
+            # El muestreo estratificado completa cada estrato por estos índices
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_traffic_type
+                ON traffic_events (type);
+                CREATE INDEX IF NOT EXISTS idx_traffic_city
+                ON traffic_events (city);
+            """)
 
-    def insert_event(self, event):
-        """Inserta un evento, transformando coordenadas al formato PostGIS."""
+    def maintain_partitions(self):
+        """
+        Crea las particiones futuras y aplica la retención (DB_RETENTION_DAYS)
+        en una sola transacción. No hace nada si la tabla no está particionada.
+        """
+        if not self.partitioned:
+            return []
+
+        with self._maintenance_lock, self.connection() as conn:
+            conn.autocommit = False
+            try:
+                with conn.cursor() as cur:
+                    partitioning.ensure_partitions(cur)
+                    dropped = partitioning.drop_expired_partitions(
+                        cur, rollup_sql=_ROLLUP_UPSERT_SQL if DB_ROLLUPS else None)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.autocommit = True
+            self._next_maintenance = date.today()
+
+        if dropped:
+            print(f"Particiones eliminadas por retención: {', '.join(dropped)}")
+        return dropped
+
+    def _maybe_maintain_partitions(self):
+        """
+        Ejecuta el mantenimiento de particiones como máximo una vez al día.
+        Un solo hilo lo ejecuta a la vez (los demás siguen insertando) y, si
+        falla, no se reintenta hasta pasados DB_PARTITION_RETRY_SECONDS en
+        lugar de repetir el DDL en cada INSERT.
+        """
+        if (not self.partitioned or self._next_maintenance == date.today()
+                or time.time() < self._maintenance_retry_at):
+            return
+        if not self._maintenance_lock.acquire(blocking=False):
+            return
         try:
-            with self.conn.cursor() as cur:
-                lon, lat = event['location']['coordinates']
-                point_str = f'POINT({lon} {lat})'
+            if self._next_maintenance != date.today():
+                self.maintain_partitions()
+        except Exception as e:
+            self._maintenance_retry_at = time.time() + partitioning.DB_PARTITION_RETRY_SECONDS
+            print(f"Error manteniendo particiones (reintento en "
+                  f"{partitioning.DB_PARTITION_RETRY_SECONDS}s): {e}")
+        finally:
+            self._maintenance_lock.release()
 
-                cur.execute("""
-                    INSERT INTO traffic_events
-                    (waze_uuid, event_uuid, timestamp_scraped, location, type, subtype, description, street, city)
-                    VALUES (%s, %s, %s, ST_GeomFromText(%s, 4326), %s, %s, %s, %s, %s)
-                    ON CONFLICT (waze_uuid) DO NOTHING;
-                """, (
-                    event['waze_uuid'],
-                    event['event_uuid'],
-                    event['timestamp_scraped'],
-                    point_str,
-                    event['type'],
-                    event['subtype'],
-                    event['description'],
-                    event['street'],
-                    event['city']
-                ))
-
-                return cur.rowcount > 0
+    def _create_rollups(self):
+        """
+        Crea las tablas resumen de los tres reportes analíticos y los triggers
+        por sentencia que las mantienen al día usando las transition tables
+        de cada INSERT/DELETE. Si las tablas son nuevas, se rellenan desde
+        traffic_events.
+        """
+        with self.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS rollup_by_type (
+                    type VARCHAR(50) UNIQUE NULLS NOT DISTINCT,
+                    total BIGINT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS rollup_by_comuna (
+                    city VARCHAR(100) UNIQUE NULLS NOT DISTINCT,
+                    total BIGINT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS rollup_temporal (
+                    fecha DATE,
+                    city VARCHAR(100),
+                    type VARCHAR(50),
+                    total BIGINT NOT NULL,
+                    UNIQUE NULLS NOT DISTINCT (fecha, city, type)
+                );
+                CREATE TABLE IF NOT EXISTS rollup_state (
+                    name VARCHAR(50) PRIMARY KEY,
+                    refreshed_at TIMESTAMP
+                );
+            """)
+            cur.execute(f"""
+                CREATE OR REPLACE FUNCTION traffic_rollup_apply() RETURNS trigger AS $$
+                BEGIN
+                    IF TG_OP = 'INSERT' THEN
+                        {_ROLLUP_UPSERT_SQL.format(source='new_rows', sign='')}
+                    ELSE
+                        {_ROLLUP_UPSERT_SQL.format(source='old_rows', sign='-')}
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+            """)
+            cur.execute("""
+                CREATE OR REPLACE TRIGGER trg_traffic_rollup_insert
+                AFTER INSERT ON traffic_events
+                REFERENCING NEW TABLE AS new_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION traffic_rollup_apply();
+            """)
+            cur.execute("""
+                CREATE OR REPLACE TRIGGER trg_traffic_rollup_delete
+                AFTER DELETE ON traffic_events
+                REFERENCING OLD TABLE AS old_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION traffic_rollup_apply();
+            """)
+            cur.execute(
+                "SELECT 1 FROM rollup_state WHERE name = 'traffic_events';")
+            initialized = cur.fetchone() is not None
+
+        if not initialized:
+            self.rebuild_rollups()
 
+    def rebuild_rollups(self):
+        """
+        Recalcula las tablas resumen desde cero. Bloquea las escrituras sobre
+        traffic_events mientras dura para que triggers y backfill no se pisen.
+        """
+        with self.connection() as conn:
+            conn.autocommit = False
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        "LOCK TABLE traffic_events IN SHARE ROW EXCLUSIVE MODE;")
+                    cur.execute(
+                        "TRUNCATE rollup_by_type, rollup_by_comuna, rollup_temporal;")
+                    cur.execute(_ROLLUP_UPSERT_SQL.format(
+                        source='traffic_events', sign=''))
+                    cur.execute("""
+                        INSERT INTO rollup_state (name, refreshed_at)
+                        VALUES ('traffic_events', NOW())
+                        ON CONFLICT (name) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at;
+                    """)
+                conn.commit()
+                print("Tablas resumen (rollups) reconstruidas desde traffic_events")
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.autocommit = True
+
+    def _create_staging_table(self, cur):
+        """
+        Crea (una vez por sesión) la tabla temporal que recibe los lotes vía
+        COPY antes de pasarlos a traffic_events.
+        """
+        cur.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS traffic_events_staging (
+                waze_uuid VARCHAR(100),
+                event_uuid VARCHAR(100),
+                timestamp_scraped TIMESTAMP,
+                lon DOUBLE PRECISION,
+                lat DOUBLE PRECISION,
+                type VARCHAR(50),
+                subtype VARCHAR(50),
+                description TEXT,
+                street VARCHAR(200),
+                city VARCHAR(100)
+            );
+        """)
+
+    def insert_event(self, event):
+        """Inserta un evento, transformando coordenadas al formato PostGIS."""
+        self._maybe_maintain_partitions()
+        try:
+            return self._insert_row(event)
         except Exception as e:
             print(f"Error insertando: {e}")
             return False
 
-    def get_simulation_seeds(self, limit=100):
-        """Obtiene un lote de coordenadas reales para el generador de tráfico."""
+    def _insert_row(self, event):
+        """INSERT de una fila; propaga el error al llamador."""
+        with self.cursor() as cur:
+            lon, lat = event['location']['coordinates']
+            point_str = f'POINT({lon} {lat})'
+
+            sql = _INSERT_PARTITIONED_SQL if self.partitioned else _INSERT_SQL
+            cur.execute(sql, (
+                event['waze_uuid'],
+                event['event_uuid'],
+                event['timestamp_scraped'],
+                point_str,
+                event['type'],
+                event['subtype'],
+                event['description'],
+                event['street'],
+                event['city']
+            ))
+            return cur.rowcount > 0
+
+    def insert_events(self, events):
+        """
+        Inserta un lote de eventos en una sola operación: COPY hacia una tabla
+        temporal y luego un INSERT ... SELECT con ON CONFLICT (waze_uuid)
+        DO NOTHING (sobre traffic_event_uuids si la tabla está particionada).
+        Devuelve la cantidad de filas realmente nuevas.
+
+        Si el lote falla se reintenta fila a fila, para que una fila inválida
+        no arrastre al resto; si aun así alguna falla se lanza una excepción,
+        de modo que el llamador distinga un error de "todas duplicadas".
+        """
+        if not events:
+            return 0
+
+        self._maybe_maintain_partitions()
+        buffer = io.StringIO()
+        for event in events:
+            lon, lat = event['location']['coordinates']
+            buffer.write('\t'.join(_copy_value(v) for v in (
+                event['waze_uuid'],
+                event['event_uuid'],
+                event['timestamp_scraped'],
+                lon,
+                lat,
+                event['type'],
+                event['subtype'],
+                event['description'],
+                event['street'],
+                event['city']
+            )) + '\n')
+        buffer.seek(0)
+
+        try:
+            with self.cursor() as cur:
+                self._create_staging_table(cur)
+                cur.execute("TRUNCATE traffic_events_staging;")
+                cur.copy_expert(
+                    "COPY traffic_events_staging FROM STDIN WITH (FORMAT text)", buffer)
+                cur.execute(_INSERT_STAGED_PARTITIONED_SQL if self.partitioned
+                            else _INSERT_STAGED_SQL)
+                return cur.rowcount
+
+        except Exception as e:
+            print(f"Error insertando lote de {len(events)} eventos: {e}; reintentando fila a fila")
+
+        inserted = 0
+        failed = []
+        for event in events:
+            try:
+                inserted += self._insert_row(event)
+            except Exception as e:
+                failed.append((event['waze_uuid'], e))
+        if failed:
+            raise Exception(f"{len(failed)} de {len(events)} eventos no se pudieron insertar "
+                            f"(primero {failed[0][0]}: {failed[0][1]})")
+        return inserted
+
+    def get_simulation_seeds(self, limit=100, method=None, stratify_by=None, seed=None):
+        """
+        Obtiene un lote de coordenadas reales para el generador de tráfico.
+        Cada semilla es (waze_uuid, lon, lat, city, type). El método de
+        muestreo se describe en storage.sampling; 'stratify_by' ('city' o
+        'type') reparte las semillas según la distribución real y 'seed'
+        hace la muestra reproducible.
+        """
+        try:
+            with self.cursor() as cur:
+                return sampling.sample_seeds(
+                    cur, limit, method=method or sampling.SEED_SAMPLING,
+                    stratify_by=stratify_by, use_rollups=DB_ROLLUPS, seed=seed)
+        except Exception as e:
+            print(f"Error obteniendo semillas: {e}")
+            return []
+
+    def get_events_by_uuids(self, waze_uuids):
+        """
+        Obtiene las filas reales de los eventos indicados en una sola consulta.
+        Devuelve {waze_uuid: evento}; los uuids inexistentes no aparecen. Ante
+        un error devuelve None, para no confundirlo con "no existe".
+        """
+        if not waze_uuids:
+            return {}
+        try:
+            with self.cursor() as cur:
+                cur.execute("""
+                    SELECT waze_uuid, timestamp_scraped, ST_X(location) as lon, ST_Y(location) as lat,
+                           type, subtype, description, street, city
+                    FROM traffic_events
+                    WHERE waze_uuid = ANY(%s);
+                """, (list(waze_uuids),))
+                events = {}
+                for waze_uuid, ts, lon, lat, e_type, subtype, desc, street, city in cur.fetchall():
+                    events[waze_uuid] = {
+                        "uuid": waze_uuid,
+                        "timestamp_scraped": ts.isoformat() if ts else None,
+                        "lon": lon,
+                        "lat": lat,
+                        "type": e_type,
+                        "subtype": subtype,
+                        "description": desc,
+                        "street": street,
+                        "city": city
+                    }
+                return events
+        except Exception as e:
+            print(f"Error obteniendo eventos por uuid: {e}")
+            return None
+
+    def get_event_by_uuid(self, waze_uuid):
+        """Obtiene un evento real por su waze_uuid (None si no existe o hay error)."""
+        events = self.get_events_by_uuids([waze_uuid])
+        return events.get(waze_uuid) if events else None
+
+    def get_recent_uuids(self, hours=1, limit=200000):
+        """
+        Obtiene los waze_uuid capturados en las últimas 'hours' horas, como
+        pares (waze_uuid, epoch de captura). timestamp_scraped se guarda en
+        UTC, así que EXTRACT(EPOCH ...) es directamente comparable con time.time().
+        """
         try:
-            with self.conn.cursor() as cur:
+            with self.cursor() as cur:
                 cur.execute("""
-                    SELECT waze_uuid, ST_X(location) as lon, ST_Y(location) as lat
+                    SELECT waze_uuid, EXTRACT(EPOCH FROM timestamp_scraped)::float8
                     FROM traffic_events
-                    ORDER BY RANDOM()
+                    WHERE timestamp_scraped >= (NOW() AT TIME ZONE 'UTC') - make_interval(hours => %s)
+                    ORDER BY timestamp_scraped DESC
                     LIMIT %s;
-                """, (limit,))
-                return cur.fetchall()
+                """, (hours, limit))
+                return [(row[0], row[1]) for row in cur.fetchall()]
         except Exception as e:
-            print(f"Error obteniendo semillas: {e}")
+            print(f"Error obteniendo uuids recientes: {e}")
             return []
 
     def count_events(self):
         """Cuenta el número total de eventos en la base de datos."""
-        with self.conn.cursor() as cur:
+        with self.cursor() as cur:
             cur.execute("SELECT COUNT(*) FROM traffic_events;")
             return cur.fetchone()[0]
 
     def get_all_events(self):
         """Obtiene todos los eventos para el proceso ETL de Big Data."""
         try:
-            with self.conn.cursor() as cur:
+            with self.cursor() as cur:
                 cur.execute("""
                     SELECT waze_uuid, timestamp_scraped, ST_X(location) as lon, ST_Y(location) as lat,
                            type, subtype, description, street, city
@@ -137,12 +601,66 @@ class WazePostgresClient:
             print(f"Error obteniendo todos los eventos para ETL: {e}")
             return []
 
-    def calculate_analytics_on_the_fly(self, report_name):
-        """Calcula analíticas directamente en SQL para comparar latencia."""
+    def get_watermark(self):
+        """Devuelve el id y timestamp_scraped máximos actuales (marca de agua del ETL)."""
+        with self.cursor() as cur:
+            cur.execute(
+                "SELECT COALESCE(MAX(id), 0), MAX(timestamp_scraped) FROM traffic_events;")
+            return cur.fetchone()
+
+    def iter_events(self, fetch_size=ETL_FETCH_SIZE, after_id=None):
+        """
+        Itera todos los eventos para el ETL mediante un cursor del lado del
+        servidor (named cursor), trayendo 'fetch_size' filas por viaje para
+        mantener la memoria acotada sin importar el tamaño de la tabla. Con
+        'after_id' solo se extraen las filas con id mayor (modo incremental).
+        """
+        for batch in self.iter_event_batches(fetch_size, after_id):
+            yield from batch
+
+    def iter_event_batches(self, fetch_size=ETL_FETCH_SIZE, after_id=None):
+        """
+        Igual que iter_events, pero entrega cada viaje del cursor como una
+        lista de hasta 'fetch_size' filas (para el motor columnar del ETL).
+        """
+        where = "WHERE id > %s" if after_id is not None else ""
+        params = (after_id,) if after_id is not None else None
+
+        with self.connection() as conn:
+            # Los named cursors requieren una transacción explícita
+            conn.autocommit = False
+            try:
+                with conn.cursor(name="etl_events_stream") as cur:
+                    cur.itersize = fetch_size
+                    cur.execute(f"""
+                        SELECT waze_uuid, timestamp_scraped, ST_X(location) as lon, ST_Y(location) as lat,
+                               type, subtype, description, street, city
+                        FROM traffic_events
+                        {where};
+                    """, params)
+                    while True:
+                        batch = cur.fetchmany(fetch_size)
+                        if not batch:
+                            break
+                        yield batch
+            finally:
+                if not conn.closed:
+                    conn.rollback()
+                    conn.autocommit = True
+
+    def calculate_analytics_on_the_fly(self, report_name, use_rollup=False):
+        """
+        Calcula analíticas directamente en SQL para comparar latencia. Con
+        'use_rollup' responde desde las tablas resumen en vez de agregar
+        traffic_events completa. Devuelve los ms transcurridos, o None si la
+        consulta falló.
+        """
         start_time = time.time()
         try:
-            with self.conn.cursor() as cur:
-                if report_name == 'by_type':
+            with self.cursor() as cur:
+                if use_rollup:
+                    cur.execute(_ROLLUP_QUERIES[report_name])
+                elif report_name == 'by_type':
                     cur.execute(
                         "SELECT type, COUNT(*) FROM traffic_events GROUP BY type;")
                 elif report_name == 'by_comuna':
@@ -153,9 +671,144 @@ class WazePostgresClient:
                         "SELECT timestamp_scraped::date, city, type, COUNT(*) FROM traffic_events GROUP BY 1, 2, 3;")
                 cur.fetchall()
         except Exception as e:
-            pass
+            print(f"Error calculando analíticas ({report_name}): {e}")
+            return None
         elapsed = (time.time() - start_time) * 1000
         return elapsed
 
+    def calculate_slice_on_the_fly(self, query, params, use_rollup=False):
+        """
+        Equivalente SQL de las consultas estructuradas del caché analítico
+        ('top_type', 'top_comuna', 'comuna', 'date_range'), para comparar su
+        latencia. 'params' es la tupla de parámetros de la consulta. Devuelve
+        los ms transcurridos, o None si la consulta falló.
+        """
+        start_time = time.time()
+        sql = (_ROLLUP_SLICE_QUERIES if use_rollup else _SLICE_QUERIES)[query]
+        try:
+            with self.cursor() as cur:
+                cur.execute(sql, params)
+                cur.fetchall()
+        except Exception as e:
+            print(f"Error calculando la consulta {query}: {e}")
+            return None
+        elapsed = (time.time() - start_time) * 1000
+        return elapsed
+
+
+# Inserciones con deduplicación por waze_uuid. En el esquema particionado el
+# UNIQUE vive en traffic_event_uuids: solo se insertan los eventos cuyo uuid
+# se registró por primera vez en la misma sentencia.
+_INSERT_SQL = """
+    INSERT INTO traffic_events
+    (waze_uuid, event_uuid, timestamp_scraped, location, type, subtype, description, street, city)
+    VALUES (%s, %s, %s, ST_GeomFromText(%s, 4326), %s, %s, %s, %s, %s)
+    ON CONFLICT (waze_uuid) DO NOTHING;
+"""
+
+_INSERT_PARTITIONED_SQL = """
+    WITH incoming AS (
+        SELECT %s::varchar AS waze_uuid, %s::varchar AS event_uuid, %s::timestamp AS timestamp_scraped,
+               ST_GeomFromText(%s, 4326) AS location, %s::varchar AS type, %s::varchar AS subtype,
+               %s::text AS description, %s::varchar AS street, %s::varchar AS city
+    ), new_uuid AS (
+        INSERT INTO traffic_event_uuids (waze_uuid, first_seen)
+        SELECT waze_uuid, timestamp_scraped FROM incoming
+        ON CONFLICT (waze_uuid) DO NOTHING
+        RETURNING waze_uuid
+    )
+    INSERT INTO traffic_events
+    (waze_uuid, event_uuid, timestamp_scraped, location, type, subtype, description, street, city)
+    SELECT r.waze_uuid, r.event_uuid, r.timestamp_scraped, r.location, r.type, r.subtype,
+           r.description, r.street, r.city
+    FROM incoming r JOIN new_uuid n ON n.waze_uuid = r.waze_uuid;
+"""
+
+_INSERT_STAGED_SQL = """
+    INSERT INTO traffic_events
+    (waze_uuid, event_uuid, timestamp_scraped, location, type, subtype, description, street, city)
+    SELECT DISTINCT ON (waze_uuid)
+           waze_uuid, event_uuid, timestamp_scraped,
+           ST_SetSRID(ST_MakePoint(lon, lat), 4326),
+           type, subtype, description, street, city
+    FROM traffic_events_staging
+    ORDER BY waze_uuid
+    ON CONFLICT (waze_uuid) DO NOTHING;
+"""
+
+_INSERT_STAGED_PARTITIONED_SQL = """
+    WITH batch AS (
+        SELECT DISTINCT ON (waze_uuid) *
+        FROM traffic_events_staging
+        WHERE timestamp_scraped IS NOT NULL
+        ORDER BY waze_uuid
+    ), new_uuids AS (
+        INSERT INTO traffic_event_uuids (waze_uuid, first_seen)
+        SELECT waze_uuid, timestamp_scraped FROM batch
+        ON CONFLICT (waze_uuid) DO NOTHING
+        RETURNING waze_uuid
+    )
+    INSERT INTO traffic_events
+    (waze_uuid, event_uuid, timestamp_scraped, location, type, subtype, description, street, city)
+    SELECT b.waze_uuid, b.event_uuid, b.timestamp_scraped,
+           ST_SetSRID(ST_MakePoint(b.lon, b.lat), 4326),
+           b.type, b.subtype, b.description, b.street, b.city
+    FROM batch b JOIN new_uuids n ON n.waze_uuid = b.waze_uuid;
+"""
+
+# Sentencias que suman (sign='') o restan (sign='-') los conteos de 'source'
+# a las tablas resumen. Se ordena por la llave para que sentencias
+# concurrentes bloqueen las filas en el mismo orden y no generen deadlocks.
+_ROLLUP_UPSERT_SQL = """
+    INSERT INTO rollup_by_type (type, total)
+    SELECT type, {sign}COUNT(*) FROM {source} GROUP BY type ORDER BY type
+    ON CONFLICT (type) DO UPDATE SET total = rollup_by_type.total + EXCLUDED.total;
+    INSERT INTO rollup_by_comuna (city, total)
+    SELECT city, {sign}COUNT(*) FROM {source} GROUP BY city ORDER BY city
+    ON CONFLICT (city) DO UPDATE SET total = rollup_by_comuna.total + EXCLUDED.total;
+    INSERT INTO rollup_temporal (fecha, city, type, total)
+    SELECT timestamp_scraped::date, city, type, {sign}COUNT(*) FROM {source}
+    GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+    ON CONFLICT (fecha, city, type) DO UPDATE SET total = rollup_temporal.total + EXCLUDED.total;
+"""
+
+_ROLLUP_QUERIES = {
+    'by_type': "SELECT type, total FROM rollup_by_type WHERE total > 0;",
+    'by_comuna': "SELECT city, total FROM rollup_by_comuna WHERE total > 0;",
+    'temporal': "SELECT fecha, city, type, total FROM rollup_temporal WHERE total > 0;"
+}
+
+_SLICE_QUERIES = {
+    'top_type': "SELECT type, COUNT(*) FROM traffic_events GROUP BY type ORDER BY 2 DESC LIMIT %s;",
+    'top_comuna': "SELECT city, COUNT(*) FROM traffic_events GROUP BY city ORDER BY 2 DESC LIMIT %s;",
+    'comuna': "SELECT type, COUNT(*) FROM traffic_events WHERE city = %s GROUP BY type;",
+    'date_range': """
+        SELECT timestamp_scraped::date, city, type, COUNT(*) FROM traffic_events
+        WHERE timestamp_scraped >= %s AND timestamp_scraped < %s::date + 1
+        GROUP BY 1, 2, 3;
+    """
+}
+
+_ROLLUP_SLICE_QUERIES = {
+    'top_type': "SELECT type, total FROM rollup_by_type WHERE total > 0 ORDER BY total DESC LIMIT %s;",
+    'top_comuna': "SELECT city, total FROM rollup_by_comuna WHERE total > 0 ORDER BY total DESC LIMIT %s;",
+    'comuna': "SELECT type, SUM(total) FROM rollup_temporal WHERE city = %s GROUP BY type;",
+    'date_range': """
+        SELECT fecha, city, type, total FROM rollup_temporal
+        WHERE fecha BETWEEN %s AND %s AND total > 0;
+    """
+}
+
+
+def _copy_value(value):
+    """Serializa un valor al formato de texto de COPY (NULL como \\N)."""
+    if value is None:
+        return '\\N'
+    return (str(value)
+            .replace('\\', '\\\\')
+            .replace('\t', '\\t')
+            .replace('\n', '\\n')
+            .replace('\r', '\\r'))
+
 
 pg_manager = WazePostgresClient()
@@ -0,0 +1,214 @@
+import os
+from datetime import date, datetime, timedelta
+
+# --------------------------------------------------------------------------
+# Configuración del Particionamiento
+# --------------------------------------------------------------------------
+# DB_PARTITIONED=1 crea traffic_events particionada por rango sobre
+# timestamp_scraped. Solo aplica a bases nuevas: una tabla heap existente no
+# se migra automáticamente.
+
+DB_PARTITIONED = os.getenv('DB_PARTITIONED', '0') == '1'
+DB_PARTITION_INTERVAL = os.getenv('DB_PARTITION_INTERVAL', 'day')
+DB_PARTITION_PREMAKE = int(os.getenv('DB_PARTITION_PREMAKE', '7'))
+DB_RETENTION_DAYS = int(os.getenv('DB_RETENTION_DAYS', '0'))
+# Espera antes de reintentar un mantenimiento fallido
+DB_PARTITION_RETRY_SECONDS = int(os.getenv('DB_PARTITION_RETRY_SECONDS', '300'))
+
+PARTITION_PREFIX = "traffic_events_p"
+
+# --------------------------------------------------------------------------
+# Esquema Particionado
+# --------------------------------------------------------------------------
+
+
+def create_partitioned_schema(cur):
+    """
+    Crea traffic_events particionada por rango con índices BRIN para el
+    tiempo y btree para tipo/comuna. Como un UNIQUE sobre una tabla
+    particionada debe incluir la llave de partición, la unicidad global de
+    waze_uuid se delega a la tabla traffic_event_uuids.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS traffic_events (
+            id BIGSERIAL,
+            waze_uuid VARCHAR(100),
+            event_uuid VARCHAR(100),
+            timestamp_scraped TIMESTAMP NOT NULL,
+            location GEOMETRY(Point, 4326),
+            type VARCHAR(50),
+            subtype VARCHAR(50),
+            description TEXT,
+            street VARCHAR(200),
+            city VARCHAR(100),
+            raw_data JSONB,
+            PRIMARY KEY (id, timestamp_scraped)
+        ) PARTITION BY RANGE (timestamp_scraped);
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS traffic_event_uuids (
+            waze_uuid VARCHAR(100) PRIMARY KEY,
+            first_seen TIMESTAMP NOT NULL
+        );
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_event_uuids_first_seen
+        ON traffic_event_uuids (first_seen);
+    """)
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {PARTITION_PREFIX}default
+        PARTITION OF traffic_events DEFAULT;
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_traffic_location
+        ON traffic_events USING GIST (location);
+        CREATE INDEX IF NOT EXISTS idx_traffic_ts_brin
+        ON traffic_events USING BRIN (timestamp_scraped);
+        CREATE INDEX IF NOT EXISTS idx_traffic_type
+        ON traffic_events (type);
+        CREATE INDEX IF NOT EXISTS idx_traffic_city
+        ON traffic_events (city);
+        CREATE INDEX IF NOT EXISTS idx_traffic_waze_uuid
+        ON traffic_events (waze_uuid);
+    """)
+
+
+def is_partitioned(cur):
+    """Indica si traffic_events existe como tabla particionada."""
+    cur.execute("""
+        SELECT 1 FROM pg_partitioned_table p
+        JOIN pg_class c ON c.oid = p.partrelid
+        WHERE c.relname = 'traffic_events';
+    """)
+    return cur.fetchone() is not None
+
+# --------------------------------------------------------------------------
+# Mantenimiento de Particiones
+# --------------------------------------------------------------------------
+
+
+def _period_start(day, interval):
+    return day.replace(day=1) if interval == 'month' else day
+
+
+def _next_period(start, interval):
+    if interval == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def _partition_name(start, interval):
+    fmt = "%Y%m" if interval == 'month' else "%Y%m%d"
+    return f"{PARTITION_PREFIX}{start.strftime(fmt)}"
+
+
+def _parse_partition_start(name, interval):
+    suffix = name[len(PARTITION_PREFIX):]
+    fmt = "%Y%m" if interval == 'month' else "%Y%m%d"
+    try:
+        return datetime.strptime(suffix, fmt).date()
+    except ValueError:
+        return None
+
+
+def create_partition(cur, start, end, name):
+    """
+    Crea la partición [start, end). Si la partición DEFAULT ya tiene filas
+    de ese rango (tras una pausa más larga que DB_PARTITION_PREMAKE o un
+    timestamp fuera de rango), PostgreSQL rechazaría el CREATE: se separa la
+    DEFAULT, se crea la partición, se le mueven esas filas y se vuelve a
+    adjuntar. Los movimientos se hacen directo sobre las particiones, así
+    que no disparan los triggers de rollups del padre (los conteos no cambian).
+    """
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL;", (name,))
+    if cur.fetchone()[0]:
+        return
+
+    default = f"{PARTITION_PREFIX}default"
+    bounds = (start.isoformat(), end.isoformat())
+    cur.execute(f"""
+        SELECT EXISTS (SELECT 1 FROM {default}
+                       WHERE timestamp_scraped >= %s AND timestamp_scraped < %s);
+    """, bounds)
+    stranded = cur.fetchone()[0]
+
+    if stranded:
+        cur.execute(f"ALTER TABLE traffic_events DETACH PARTITION {default};")
+    cur.execute(f"""
+        CREATE TABLE {name}
+        PARTITION OF traffic_events
+        FOR VALUES FROM ('{bounds[0]}') TO ('{bounds[1]}');
+    """)
+    if stranded:
+        cur.execute(f"""
+            WITH moved AS (
+                DELETE FROM {default}
+                WHERE timestamp_scraped >= %s AND timestamp_scraped < %s
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved;
+        """, bounds)
+        print(f"Movidas {cur.rowcount} filas de {default} a {name}")
+        cur.execute(f"ALTER TABLE traffic_events ATTACH PARTITION {default} DEFAULT;")
+
+
+def ensure_partitions(cur, ahead=DB_PARTITION_PREMAKE, interval=DB_PARTITION_INTERVAL,
+                      today=None):
+    """
+    Crea la partición del periodo actual y las 'ahead' siguientes. Devuelve
+    la fecha hasta la que quedan cubiertas las inserciones.
+    """
+    start = _period_start(today or date.today(), interval)
+    for _ in range(ahead + 1):
+        end = _next_period(start, interval)
+        create_partition(cur, start, end, _partition_name(start, interval))
+        start = end
+    return start
+
+
+def list_partitions(cur, interval=DB_PARTITION_INTERVAL):
+    """Lista (nombre, inicio) de las particiones de rango creadas por este módulo."""
+    cur.execute("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = 'traffic_events';
+    """)
+    partitions = []
+    for (name,) in cur.fetchall():
+        start = _parse_partition_start(name, interval)
+        if start is not None:
+            partitions.append((name, start))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def drop_expired_partitions(cur, retention_days=DB_RETENTION_DAYS,
+                            interval=DB_PARTITION_INTERVAL, rollup_sql=None, today=None):
+    """
+    Elimina con DROP TABLE las particiones cuyo rango terminó antes de la
+    ventana de retención, y poda los uuids registrados en ese periodo. Si
+    se entrega 'rollup_sql', se descuentan sus conteos de las tablas resumen
+    antes del DROP (que no dispara triggers de DELETE).
+    """
+    if retention_days <= 0:
+        return []
+
+    cutoff = (today or date.today()) - timedelta(days=retention_days)
+    dropped = []
+    dropped_until = None
+    for name, start in list_partitions(cur, interval):
+        end = _next_period(start, interval)
+        if end > cutoff:
+            continue
+        if rollup_sql:
+            cur.execute(rollup_sql.format(source=name, sign='-'))
+        cur.execute(f"DROP TABLE IF EXISTS {name};")
+        dropped.append(name)
+        dropped_until = max(dropped_until or end, end)
+
+    # Solo se olvidan los uuids cuyas filas ya no existen, para no permitir
+    # duplicados en particiones que siguen vivas
+    if dropped_until is not None:
+        cur.execute("DELETE FROM traffic_event_uuids WHERE first_seen < %s;",
+                    (dropped_until.isoformat(),))
+    return dropped
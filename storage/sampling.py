@@ -0,0 +1,293 @@
+import os
+import zlib
+import random
+
+# --------------------------------------------------------------------------
+# Configuración del Muestreo de Semillas
+# --------------------------------------------------------------------------
+# Métodos disponibles para get_simulation_seeds:
+#   bernoulli -> TABLESAMPLE BERNOULLI: fila a fila, sin ordenar la tabla
+#   system    -> TABLESAMPLE SYSTEM: por bloques, el más barato (menos uniforme)
+#   id_range  -> ids aleatorios entre MIN(id) y MAX(id) resueltos por índice
+#   random    -> ORDER BY RANDOM() (método original, ordena la tabla completa)
+#
+# El muestreo estratificado toma de un solo TABLESAMPLE los estratos grandes
+# y resuelve los pequeños (o los que quedaron cortos) con una consulta por
+# estrato sobre su índice, en vez de subir el porcentaje para toda la tabla.
+#
+# Con una semilla (RANDOM_SEED del generador) la muestra es reproducible
+# mientras la tabla no cambie: TABLESAMPLE ... REPEATABLE, setseed() antes de
+# random() y un random.Random propio para lo que se sortea en Python.
+
+SEED_SAMPLING = os.getenv('SEED_SAMPLING', 'bernoulli')
+SEED_OVERSAMPLE = float(os.getenv('SEED_OVERSAMPLE', '1.5'))
+# Rondas de TABLESAMPLE (ampliando el porcentaje) antes de completar por id_range
+SEED_SAMPLE_ROUNDS = int(os.getenv('SEED_SAMPLE_ROUNDS', '3'))
+# Cuántas veces el porcentaje proporcional puede crecer para cubrir un estrato
+SEED_STRATUM_MAX_FACTOR = float(os.getenv('SEED_STRATUM_MAX_FACTOR', '4'))
+
+STRATA_COLUMNS = {'city': 'city', 'type': 'type'}
+# Posición del estrato en las filas de SEED_COLUMNS
+STRATA_INDEX = {'city': 3, 'type': 4}
+ROLLUP_TABLES = {'city': 'rollup_by_comuna', 'type': 'rollup_by_type'}
+
+SEED_COLUMNS = "waze_uuid, ST_X(location) as lon, ST_Y(location) as lat, city, type"
+
+# --------------------------------------------------------------------------
+# Estimaciones
+# --------------------------------------------------------------------------
+
+
+def estimate_rows(cur):
+    """
+    Estima las filas de traffic_events desde las estadísticas del catálogo
+    (sumando particiones si las hay). Si nunca se ha ejecutado ANALYZE,
+    recurre a COUNT(*).
+    """
+    cur.execute("""
+        SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)
+        FROM pg_class c
+        WHERE c.oid = 'traffic_events'::regclass
+           OR c.oid IN (SELECT inhrelid FROM pg_inherits
+                        WHERE inhparent = 'traffic_events'::regclass);
+    """)
+    estimate = cur.fetchone()[0]
+    if estimate > 0:
+        return int(estimate)
+    cur.execute("SELECT COUNT(*) FROM traffic_events;")
+    return cur.fetchone()[0]
+
+
+def _repeatable(seed):
+    """Semilla estable (no el hash() salado de Python) para REPEATABLE y setseed()."""
+    return zlib.crc32(str(seed).encode())
+
+
+def _tablesample(sampler, seed):
+    """Cláusula TABLESAMPLE con el porcentaje como parámetro (%s)."""
+    clause = f"TABLESAMPLE {sampler} (%s)"
+    if seed is not None:
+        clause += f" REPEATABLE ({_repeatable(seed)})"
+    return clause
+
+
+def _setseed(cur, seed):
+    """Fija la semilla de random() en la sesión (setseed acepta [-1, 1])."""
+    if seed is not None:
+        cur.execute("SELECT setseed(%s);", (_repeatable(seed) / 0xFFFFFFFF * 2 - 1,))
+
+
+def _sample_percent(limit, total_rows, oversample=SEED_OVERSAMPLE):
+    if total_rows <= 0:
+        return 100.0
+    return min(100.0, max(0.0001, limit * oversample / total_rows * 100))
+
+
+def stratum_counts(cur, stratify_by, use_rollups=False):
+    """Tamaño poblacional de cada estrato (desde los rollups si existen)."""
+    column = STRATA_COLUMNS[stratify_by]
+    if use_rollups:
+        cur.execute(
+            f"SELECT {column}, total FROM {ROLLUP_TABLES[stratify_by]} WHERE total > 0;")
+    else:
+        cur.execute(
+            f"SELECT {column}, COUNT(*) FROM traffic_events GROUP BY {column};")
+    return cur.fetchall()
+
+
+def allocate_quotas(counts, limit):
+    """
+    Reparte 'limit' semillas entre estratos de forma proporcional (método
+    del mayor resto), garantizando al menos una por estrato mientras alcance.
+    """
+    total = sum(n for _, n in counts)
+    if total == 0 or limit <= 0:
+        return {}
+
+    exact = [(stratum, limit * n / total) for stratum, n in counts]
+    quotas = {stratum: int(share) for stratum, share in exact}
+    remaining = limit - sum(quotas.values())
+    for stratum, share in sorted(exact, key=lambda e: e[1] - int(e[1]), reverse=True):
+        if remaining <= 0:
+            break
+        quotas[stratum] += 1
+        remaining -= 1
+
+    # Los estratos pequeños no quedan fuera: se toma de los más grandes
+    for stratum in [s for s, q in quotas.items() if q == 0]:
+        donor = max(quotas, key=quotas.get)
+        if quotas[donor] <= 1:
+            break
+        quotas[donor] -= 1
+        quotas[stratum] = 1
+    return quotas
+
+# --------------------------------------------------------------------------
+# Métodos de Muestreo
+# --------------------------------------------------------------------------
+
+
+def sample_tablesample(cur, limit, method='bernoulli', seed=None):
+    """
+    Muestra con TABLESAMPLE sobredimensionado y recorta a 'limit' en Python,
+    para no sesgar la muestra hacia los primeros bloques físicos. Si la
+    estimación de filas se queda corta, repite con un porcentaje mayor
+    (hasta SEED_SAMPLE_ROUNDS veces) y completa lo que falte sorteando ids
+    (sample_id_range), que se resuelven por índice sin ordenar la tabla.
+    """
+    pct = _sample_percent(limit, estimate_rows(cur))
+    sampler = 'SYSTEM' if method == 'system' else 'BERNOULLI'
+    rows = []
+    for _ in range(max(1, SEED_SAMPLE_ROUNDS)):
+        cur.execute(f"""
+            SELECT {SEED_COLUMNS}
+            FROM traffic_events {_tablesample(sampler, seed)};
+        """, (pct,))
+        rows = cur.fetchall()
+        if len(rows) >= limit or pct >= 100.0:
+            break
+        pct = min(100.0, pct * min(10.0, SEED_OVERSAMPLE * limit / max(1, len(rows))))
+
+    if len(rows) > limit:
+        return random.Random(seed).sample(rows, limit)
+    if len(rows) < limit and pct < 100.0:
+        rows += sample_id_range(cur, limit - len(rows), seed=seed,
+                                exclude={row[0] for row in rows})
+    return rows
+
+
+def sample_id_range(cur, limit, max_rounds=5, seed=None, exclude=()):
+    """
+    Sortea ids dentro de [MIN(id), MAX(id)] y los resuelve con el índice de
+    la llave primaria. Los huecos en la secuencia se compensan con rondas
+    adicionales sobredimensionadas. 'exclude': uuids ya elegidos a omitir.
+    """
+    cur.execute("SELECT MIN(id), MAX(id) FROM traffic_events;")
+    min_id, max_id = cur.fetchone()
+    if min_id is None:
+        return []
+
+    span = max_id - min_id + 1
+    rng = random.Random(seed)
+    seeds = {}
+    for _ in range(max_rounds):
+        missing = limit - len(seeds)
+        if missing <= 0:
+            break
+        k = min(span, int(missing * SEED_OVERSAMPLE) + 1)
+        candidates = rng.sample(range(min_id, max_id + 1), k)
+        cur.execute(f"""
+            SELECT {SEED_COLUMNS}
+            FROM traffic_events
+            WHERE id = ANY(%s);
+        """, (candidates,))
+        for row in cur.fetchall():
+            if row[0] not in exclude:
+                seeds.setdefault(row[0], row)
+        if k == span:
+            break
+    return list(seeds.values())[:limit]
+
+
+def sample_random(cur, limit, seed=None):
+    """Método original: ordena toda la tabla por RANDOM()."""
+    _setseed(cur, seed)
+    cur.execute(f"""
+        SELECT {SEED_COLUMNS}
+        FROM traffic_events
+        ORDER BY RANDOM()
+        LIMIT %s;
+    """, (limit,))
+    return cur.fetchall()
+
+
+def _sample_strata(cur, column, quotas, pct, seed):
+    """Hasta 'quota' filas por estrato, ordenando al azar solo la muestra BERNOULLI."""
+    strata = list(quotas)
+    _setseed(cur, seed)
+    cur.execute(f"""
+        SELECT s.waze_uuid, s.lon, s.lat, s.city, s.type
+        FROM (
+            SELECT {SEED_COLUMNS}, {column} AS stratum,
+                   row_number() OVER (PARTITION BY {column} ORDER BY random()) AS rn
+            FROM traffic_events {_tablesample('BERNOULLI', seed)}
+        ) s
+        JOIN unnest(%s::text[], %s::int[]) AS q(stratum, quota)
+          ON q.stratum IS NOT DISTINCT FROM s.stratum
+        WHERE s.rn <= q.quota;
+    """, (pct, strata, [quotas[s] for s in strata]))
+    return cur.fetchall()
+
+
+def _sample_stratum(cur, column, stratum, limit, exclude=()):
+    """
+    Hasta 'limit' filas de un solo estrato vía su índice ({column} = valor):
+    solo se ordenan las filas de ese estrato, nunca la tabla completa.
+    """
+    condition = f"{column} IS NULL" if stratum is None else f"{column} = %s"
+    params = [] if stratum is None else [stratum]
+    cur.execute(f"""
+        SELECT {SEED_COLUMNS}
+        FROM traffic_events
+        WHERE {condition} AND waze_uuid <> ALL(%s)
+        ORDER BY random()
+        LIMIT %s;
+    """, (*params, list(exclude), limit))
+    return cur.fetchall()
+
+
+def sample_stratified(cur, limit, stratify_by, use_rollups=False, seed=None):
+    """
+    Muestra estratificada por comuna o tipo: cuotas proporcionales a la
+    población y selección aleatoria dentro de cada estrato sobre una muestra
+    BERNOULLI (solo se ordena la muestra, nunca la tabla completa). Siempre
+    usa BERNOULLI: sample_seeds rechaza otro 'method' junto a 'stratify_by'.
+
+    El porcentaje se limita a SEED_STRATUM_MAX_FACTOR veces el proporcional;
+    los estratos que con él no alcanzarían su cuota (típicamente los de una
+    sola semilla garantizada) y los que la muestra dejó cortos se completan
+    con una consulta indexada por estrato.
+    """
+    column = STRATA_COLUMNS[stratify_by]
+    counts = dict(stratum_counts(cur, stratify_by, use_rollups))
+    quotas = allocate_quotas(list(counts.items()), limit)
+    if not quotas:
+        return []
+
+    # Se sobredimensiona según el estrato más exigido, sin pasar del tope
+    base_pct = _sample_percent(limit, sum(counts.values()))
+    max_pct = min(100.0, base_pct * SEED_STRATUM_MAX_FACTOR)
+    needed = {s: quotas[s] / counts[s] * SEED_OVERSAMPLE * 100 for s in quotas if counts.get(s)}
+    pct = min(max_pct, max([base_pct, *needed.values()]))
+
+    sampled = {s: q for s, q in quotas.items() if needed.get(s, 0) <= pct}
+    rows = _sample_strata(cur, column, sampled, pct, seed) if sampled else []
+
+    chosen = {}
+    for row in rows:
+        chosen.setdefault(row[STRATA_INDEX[stratify_by]], []).append(row)
+    short = [(s, q) for s, q in quotas.items() if len(chosen.get(s, [])) < q]
+    if short:
+        _setseed(cur, seed)
+    for stratum, quota in short:
+        have = chosen.get(stratum, [])
+        rows += _sample_stratum(cur, column, stratum, quota - len(have),
+                                exclude=[row[0] for row in have])
+    return rows
+
+
+def sample_seeds(cur, limit, method=SEED_SAMPLING, stratify_by=None, use_rollups=False,
+                 seed=None):
+    """
+    Punto de entrada: despacha al método de muestreo configurado. Con
+    'seed' la muestra se repite mientras la tabla no cambie.
+    """
+    if stratify_by:
+        if method != 'bernoulli':
+            raise ValueError(f"El muestreo estratificado solo admite 'bernoulli' (se pidió '{method}')")
+        return sample_stratified(cur, limit, stratify_by, use_rollups, seed=seed)
+    if method == 'random':
+        return sample_random(cur, limit, seed=seed)
+    if method == 'id_range':
+        return sample_id_range(cur, limit, seed=seed)
+    return sample_tablesample(cur, limit, method, seed=seed)
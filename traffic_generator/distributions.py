@@ -0,0 +1,206 @@
+import os
+import math
+from collections import defaultdict
+
+# --------------------------------------------------------------------------
+# Configuración de la Popularidad de Llaves
+# --------------------------------------------------------------------------
+# KEY_DISTRIBUTION elige con qué probabilidad se consulta cada semilla:
+#   uniform  todas por igual (comportamiento original)
+#   zipf     p(rango r) ~ 1 / r^ZIPF_EXPONENT
+#   hotspot  HOTSPOT_PROBABILITY de las consultas van al HOTSPOT_FRACTION de las semillas
+#   drift    zipf cuyo ranking rota DRIFT_SHIFT cada DRIFT_PERIOD consultas
+#   geo      comuna según GEO_CITY_WEIGHTS (o su cantidad de semillas ^ GEO_CITY_EXPONENT)
+#            y luego zipf dentro de la comuna
+# Todas muestrean en O(1) con tablas alias precalculadas y el RNG del generador,
+# así RANDOM_SEED reproduce la misma secuencia.
+
+KEY_DISTRIBUTION = os.getenv('KEY_DISTRIBUTION', 'uniform')
+ZIPF_EXPONENT = float(os.getenv('ZIPF_EXPONENT', '1.0'))
+HOTSPOT_FRACTION = float(os.getenv('HOTSPOT_FRACTION', '0.1'))
+HOTSPOT_PROBABILITY = float(os.getenv('HOTSPOT_PROBABILITY', '0.9'))
+DRIFT_PERIOD = int(os.getenv('DRIFT_PERIOD', '5000'))
+# Fracción del ranking que se desplaza en cada periodo
+DRIFT_SHIFT = float(os.getenv('DRIFT_SHIFT', '0.1'))
+# 'Santiago:5,Providencia:3,...'; las comunas no listadas pesan 0
+GEO_CITY_WEIGHTS = os.getenv('GEO_CITY_WEIGHTS', '')
+GEO_CITY_EXPONENT = float(os.getenv('GEO_CITY_EXPONENT', '1.5'))
+
+# --------------------------------------------------------------------------
+# Tabla Alias (Vose)
+# --------------------------------------------------------------------------
+
+
+class AliasTable:
+    """Muestreo O(1) de una distribución discreta arbitraria; construcción O(n)."""
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("La tabla alias necesita al menos un peso positivo")
+        self.n = n
+        self.prob = [0.0] * n
+        self.alias = list(range(n))
+
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Los restantes valen 1 salvo error de redondeo
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def sample(self, rng):
+        i = int(rng.random() * self.n)
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+def zipf_weights(n, exponent):
+    return [1.0 / (rank + 1) ** exponent for rank in range(n)]
+
+# --------------------------------------------------------------------------
+# Distribuciones (devuelven índices de la lista de semillas)
+# --------------------------------------------------------------------------
+
+
+class UniformDistribution:
+    def __init__(self, n):
+        self.n = n
+
+    def sample(self, rng):
+        return int(rng.random() * self.n)
+
+    def ranking(self):
+        """Índices de la semilla más a la menos probable."""
+        return list(range(self.n))
+
+
+class ZipfDistribution:
+    """
+    Zipf sobre una permutación aleatoria de las semillas: el orden en que
+    llegan del muestreo no decide cuáles son las populares.
+    """
+    def __init__(self, n, rng, exponent=ZIPF_EXPONENT):
+        self.order = list(range(n))
+        rng.shuffle(self.order)
+        self.table = AliasTable(zipf_weights(n, exponent))
+
+    def sample(self, rng):
+        return self.order[self.table.sample(rng)]
+
+    def ranking(self):
+        return list(self.order)
+
+
+class HotspotDistribution:
+    """Un conjunto caliente recibe 'probability' de las consultas; el resto, lo demás."""
+    def __init__(self, n, rng, fraction=HOTSPOT_FRACTION, probability=HOTSPOT_PROBABILITY):
+        self.order = list(range(n))
+        rng.shuffle(self.order)
+        self.hot = max(1, min(n, math.ceil(n * fraction)))
+        self.probability = probability if self.hot < n else 1.0
+
+    def sample(self, rng):
+        if rng.random() < self.probability:
+            return self.order[int(rng.random() * self.hot)]
+        return self.order[self.hot + int(rng.random() * (len(self.order) - self.hot))]
+
+    def ranking(self):
+        return list(self.order)
+
+
+class DriftDistribution:
+    """
+    Zipf cuyo ranking avanza 'shift' posiciones cada 'period' consultas: las
+    llaves calientes se enfrían y otras toman su lugar durante la corrida.
+    Se mide en consultas (no en segundos) para que RANDOM_SEED la reproduzca.
+    """
+    def __init__(self, n, rng, exponent=ZIPF_EXPONENT, period=DRIFT_PERIOD, shift=DRIFT_SHIFT):
+        self.zipf = ZipfDistribution(n, rng, exponent)
+        self.n = n
+        self.period = max(1, period)
+        self.step = max(1, int(n * shift))
+        self.samples = 0
+
+    def offset(self):
+        return (self.samples // self.period) * self.step % self.n
+
+    def sample(self, rng):
+        rank = self.zipf.table.sample(rng)
+        index = self.zipf.order[(rank + self.offset()) % self.n]
+        self.samples += 1
+        return index
+
+    def ranking(self):
+        offset = self.offset()
+        return self.zipf.order[offset:] + self.zipf.order[:offset]
+
+
+def parse_city_weights(spec):
+    weights = {}
+    for item in spec.split(','):
+        if ':' in item:
+            city, weight = item.rsplit(':', 1)
+            weights[city.strip().upper()] = float(weight)
+    return weights
+
+
+class GeoDistribution:
+    """
+    Localidad geográfica: primero la comuna (campo city de la semilla) y
+    luego una semilla de esa comuna con Zipf, ambas con tablas alias.
+    """
+    def __init__(self, seeds, rng, city_weights=GEO_CITY_WEIGHTS,
+                 exponent=GEO_CITY_EXPONENT, zipf_exponent=ZIPF_EXPONENT):
+        by_city = defaultdict(list)
+        for i, seed in enumerate(seeds):
+            by_city[(seed[3] or "DESCONOCIDA").strip().upper()].append(i)
+
+        configured = parse_city_weights(city_weights) if city_weights else None
+        self.cities = []
+        weights = []
+        for city, members in sorted(by_city.items()):
+            weight = configured.get(city, 0.0) if configured else len(members) ** exponent
+            if weight > 0:
+                rng.shuffle(members)
+                self.cities.append((city, members, AliasTable(zipf_weights(len(members), zipf_exponent))))
+                weights.append(weight)
+        if not self.cities:
+            raise ValueError("Ninguna comuna de GEO_CITY_WEIGHTS aparece en las semillas")
+        self.city_table = AliasTable(weights)
+        self.city_prob = [w / sum(weights) for w in weights]
+        self.zipf_exponent = zipf_exponent
+
+    def sample(self, rng):
+        _, members, table = self.cities[self.city_table.sample(rng)]
+        return members[table.sample(rng)]
+
+    def ranking(self):
+        scored = []
+        for (_, members, _), city_p in zip(self.cities, self.city_prob):
+            weights = zipf_weights(len(members), self.zipf_exponent)
+            total = sum(weights)
+            scored.extend((city_p * w / total, index) for index, w in zip(members, weights))
+        return [index for _, index in sorted(scored, key=lambda item: -item[0])]
+
+
+def build_distribution(name, seeds, rng):
+    """Distribución 'name' (ver KEY_DISTRIBUTION) sobre la lista de semillas."""
+    n = len(seeds)
+    if name == 'uniform' or n == 0:
+        return UniformDistribution(n)
+    if name == 'zipf':
+        return ZipfDistribution(n, rng)
+    if name == 'hotspot':
+        return HotspotDistribution(n, rng)
+    if name == 'drift':
+        return DriftDistribution(n, rng)
+    if name == 'geo':
+        return GeoDistribution(seeds, rng)
+    raise ValueError(f"KEY_DISTRIBUTION desconocida: {name} "
+                     "(uniform, zipf, hotspot, drift o geo)")
@@ -2,13 +2,31 @@ import time
 import random
 import os
 import csv
-from storage.db_client import pg_manager
+from datetime import date, timedelta
+from storage.db_client import pg_manager, DB_ROLLUPS
 from cache_service.redis_client import cache_manager
+from cache_service.codecs import codec_label
+from cache_service.latency import merge_histograms
+from cache_service.warmup import hottest_keys, start_warmup, WARMUP_MAX_KEYS, POPULARITY_TRACKING
+from traffic_generator.request_log import RequestLog, REQUEST_LOG
+from traffic_generator.distributions import build_distribution, KEY_DISTRIBUTION
+from traffic_generator.workload_trace import (WorkloadTraceWriter, read_trace, trace_digest,
+                                              WORKLOAD_TRACE_RECORD)
 
 # --------------------------------------------------------------------------
 # Generador de Tráfico
 # --------------------------------------------------------------------------
 
+# Reporte JSON que contiene la respuesta de cada consulta estructurada
+_SLICE_REPORTS = {'top_type': 'by_type', 'top_comuna': 'by_comuna',
+                  'comuna': 'temporal', 'date_range': 'temporal'}
+
+
+def _simulated_events(uuids):
+    """Loader de READ_THROUGH=0: payload simulado sin consultar PostgreSQL."""
+    return {uuid: {"uuid": uuid, "info": "Simulated"} for uuid in uuids}
+
+
 class TrafficGenerator:
     """
     Simula tráfico de consultas operacionales y analíticas para probar el
@@ -17,98 +35,421 @@ class TrafficGenerator:
     def __init__(self):
         self.traffic_type = os.getenv('TRAFFIC_TYPE', 'operational')
         self.data_source = os.getenv('DATA_SOURCE', 'redis')
+        if self.data_source == 'postgres_rollup' and not DB_ROLLUPS:
+            # Sin las tablas resumen cada consulta fallaría
+            raise ValueError("DATA_SOURCE=postgres_rollup requiere DB_ROLLUPS=1")
+        # RANDOM_SEED fija la muestra de semillas, modos, pausas y llaves (y las
+        # llegadas del lazo abierto): misma semilla y misma tabla, misma secuencia
+        self.random_seed = os.getenv('RANDOM_SEED')
+        self.rng = random.Random(self.random_seed)
 
         print(
             f"Inicializando Generador ({self.traffic_type.upper()}) apuntando a -> {self.data_source.upper()}")
 
-        self.seeds = pg_manager.get_simulation_seeds(limit=50)
+        # L1_CACHE=1 -> L1 (en proceso) + L2 (Redis); L1_CACHE=0 -> solo L2
+        if os.getenv('L1_CACHE', '0') == '1':
+            if cache_manager.l1 is None:
+                cache_manager.enable_l1()
+        else:
+            cache_manager.disable_l1()
+
+        seed_count = int(os.getenv('SEED_COUNT', '50'))
+        seed_method = os.getenv('SEED_SAMPLING', 'bernoulli')
+        seed_stratify = os.getenv('SEED_STRATIFY') or None
+        seeds_start = time.time()
+        self.seeds = pg_manager.get_simulation_seeds(
+            limit=seed_count, method=seed_method, stratify_by=seed_stratify,
+            seed=self.random_seed)
+        print(f"{len(self.seeds)} semillas obtenidas ({seed_method}"
+              f"{', estratificado por ' + seed_stratify if seed_stratify else ''}) "
+              f"en {(time.time() - seeds_start) * 1000:.1f} ms")
+        # KEY_DISTRIBUTION: popularidad de las semillas (ver distributions)
+        self.key_distribution = build_distribution(KEY_DISTRIBUTION, self.seeds, self.rng)
+        if self.seeds:
+            print(f"Distribución de llaves: {KEY_DISTRIBUTION}")
         self.exp_name = os.getenv('EXPERIMENT_NAME', 'default_run')
         self.csv_file = f"results/{self.exp_name}.csv"
+        self.latency_file = f"results/{self.exp_name}_latency.json"
+        # Log binario con cada solicitud (ver request_log para leerlo por ventanas)
+        self.request_log = RequestLog(f"results/{self.exp_name}_requests.bin") if REQUEST_LOG else None
+        # WORKLOAD_TRACE_RECORD=<ruta> graba la secuencia exacta de solicitudes
+        self.trace = None
+        if WORKLOAD_TRACE_RECORD:
+            self.trace = WorkloadTraceWriter(
+                WORKLOAD_TRACE_RECORD, exp_name=self.exp_name, traffic_type=self.traffic_type,
+                data_source=self.data_source, random_seed=self.random_seed)
+
+        # Operaciones cuyos percentiles por ventana se registran en el CSV
+        if self.traffic_type != 'analytical':
+            self.latency_ops = ("get_event",)
+        elif self.data_source == 'redis':
+            self.latency_ops = ("get_analytics", "analytics_query")
+        else:
+            self.latency_ops = ("pg_analytics",)
+
+        # ANALYTICAL_WORKLOAD: reports (reporte completo), structured (top-N,
+        # comuna y rango de fechas) o mixed (mitad y mitad)
+        self.analytical_workload = os.getenv('ANALYTICAL_WORKLOAD', 'reports')
+        self.top_n = int(os.getenv('ANALYTICS_TOP_N', '10'))
+        self.range_days = int(os.getenv('ANALYTICS_RANGE_DAYS', '7'))
+        self.analytics_comunas = []
+        self.analytics_last_date = date.today()
+        if self.traffic_type == 'analytical' and self.data_source == 'redis':
+            self.check_analytics_codec()
+        if self.traffic_type == 'analytical' and self.analytical_workload != 'reports':
+            self.load_analytics_dimensions()
+
+        # OPERATIONAL_BATCH_SIZE > 1 agrupa las consultas operacionales en MGET + pipeline
+        self.batch_size = max(1, int(os.getenv('OPERATIONAL_BATCH_SIZE', '1')))
+        # READ_THROUGH=0 vuelve al payload simulado sin consultar PostgreSQL
+        self.read_through = os.getenv('READ_THROUGH', '1') == '1'
+        # WARMUP: none, access (popularidad persistida por CacheMiddleware) o
+        # seeds (las semillas de esta corrida, de más a menos probable)
+        self.warmup = os.getenv('WARMUP', 'none')
 
         self.total_latency = 0
         self.query_count = 0
+        self.last_logged_count = 0
+        # hits/misses al registro anterior, para el hit rate de cada ventana
+        self.last_logged_stats = (0, 0)
 
         os.makedirs("results", exist_ok=True)
         if not os.path.exists(self.csv_file):
             with open(self.csv_file, mode='w', newline='') as f:
                 writer = csv.writer(f)
                 writer.writerow(["timestamp", "seconds_elapsed",
-                                "total_queries", "hit_rate", "avg_latency_ms"])
+                                "total_queries", "hit_rate", "avg_latency_ms", "l1_hit_rate",
+                                 "p50_ms", "p90_ms", "p99_ms", "p999_ms", "max_ms",
+                                 "window_hit_rate", "stale_served", "early_refreshes"])
+
+    def check_analytics_codec(self):
+        """Avisa si las analíticas se cargaron con otro CACHE_CODEC (sus llaves no coincidirían)."""
+        codec = cache_manager.codec
+        print(f"Codec de caché: {codec.name} (llaves '{codec.key('analytics:<reporte>')}')")
+        loaded_with = cache_manager.get_analytics_codec()
+        if loaded_with and loaded_with != codec_label(codec):
+            print(f"Advertencia: las analíticas se cargaron con el codec {loaded_with}; "
+                  f"con {codec_label(codec)} get_analytics no las encontrará")
+
+    def load_analytics_dimensions(self):
+        """Comunas y última fecha disponibles para parametrizar las consultas estructuradas."""
+        if self.data_source == 'redis':
+            top, _ = cache_manager.get_top_n('comuna', 1000)
+            self.analytics_comunas = [comuna for comuna, _ in top or []]
+            bounds = cache_manager.get_analytics_date_bounds()
+            if bounds:
+                self.analytics_last_date = date.fromisoformat(bounds[1])
+        else:
+            self.analytics_comunas = sorted({seed[3] for seed in self.seeds if seed[3]})
+            _, last_timestamp = pg_manager.get_watermark()
+            if last_timestamp:
+                self.analytics_last_date = last_timestamp.date()
+        print(f"Consultas estructuradas: {len(self.analytics_comunas)} comunas, "
+              f"rango de {self.range_days} días hasta {self.analytics_last_date}")
+
+    def next_seed(self):
+        """Semilla de la próxima consulta operacional."""
+        return self.seeds[self.key_distribution.sample(self.rng)]
+
+    def seed_popularity(self):
+        """uuids de las semillas ordenados por su probabilidad de ser consultados."""
+        return [self.seeds[i][0] for i in self.key_distribution.ranking()]
+
+    def log_request(self, op, key, source, latency_ms, timestamp=None):
+        if self.request_log is not None:
+            self.request_log.record(time.time() if timestamp is None else timestamp,
+                                    op, key, source, latency_ms)
+
+    def trace_request(self, op, timestamp=None, **fields):
+        if self.trace is not None:
+            self.trace.record(op, timestamp=timestamp, **fields)
+
+    def warm_up(self):
+        """Precarga en segundo plano las llaves más populares antes del tráfico."""
+        if self.warmup == 'access':
+            keys = hottest_keys()
+            if not keys and not POPULARITY_TRACKING:
+                print("WARMUP=access sin popularidad persistida: active POPULARITY_TRACKING=1 "
+                      "para registrarla en esta corrida")
+        elif self.warmup == 'seeds':
+            keys = self.seed_popularity()[:WARMUP_MAX_KEYS]
+        else:
+            return None
+        print(f"Warm-up ({self.warmup}): precargando hasta {len(keys)} llaves en segundo plano")
+        return start_warmup(cache_manager, keys)
 
     def log_metrics(self, start_time):
-        """Registra las métricas de rendimiento en un archivo CSV."""
+        """
+        Registra las métricas de rendimiento en un archivo CSV. Los
+        percentiles corresponden solo a la ventana desde el registro anterior.
+        """
+        l1_hit_rate = 0
+        window_hit_rate = 0
+        metrics = cache_manager.stats
         if self.traffic_type == 'analytical':
             hit_rate = 100.0 if self.data_source == 'redis' else 0.0
             avg_latency = (self.total_latency /
                            self.query_count) if self.query_count > 0 else 0
         else:
-            metrics = cache_manager.stats
             total = metrics["hits"] + metrics["misses"]
             hit_rate = (metrics["hits"] / total * 100) if total > 0 else 0
             avg_latency = (metrics["total_time"] / total) if total > 0 else 0
+            l1_hit_rate = (metrics["l1_hits"] / total * 100) if total > 0 else 0
+
+            # Los picos de misses (p. ej. expiraciones sincronizadas) se ven por ventana
+            prev_hits, prev_misses = self.last_logged_stats
+            window_hits = metrics["hits"] - prev_hits
+            window_total = window_hits + metrics["misses"] - prev_misses
+            window_hit_rate = (window_hits / window_total * 100) if window_total > 0 else 0
+            self.last_logged_stats = (metrics["hits"], metrics["misses"])
+
+        window, _ = cache_manager.latency.roll_window()
+        tail = merge_histograms(
+            window[op] for op in self.latency_ops if op in window).summary()
 
         elapsed = time.time() - start_time
         with open(self.csv_file, mode='a', newline='') as f:
             writer = csv.writer(f)
             writer.writerow([time.strftime("%H:%M:%S"), round(
-                elapsed, 2), self.query_count, round(hit_rate, 2), round(avg_latency, 2)])
+                elapsed, 2), self.query_count, round(hit_rate, 2), round(avg_latency, 2),
+                round(l1_hit_rate, 2)] + [
+                round(tail.get(column, 0), 3)
+                for column in ("p50_ms", "p90_ms", "p99_ms", "p999_ms", "max_ms")] + [
+                round(window_hit_rate, 2), metrics["stale_served"], metrics["early_refreshes"]])
+        if self.request_log is not None:
+            self.request_log.flush()
 
-    def simulate_operational_query(self):
-        """Simula una consulta operacional a la caché o base de datos."""
+    def next_request(self):
+        """
+        Sortea la próxima solicitud según TRAFFIC_TYPE, ANALYTICAL_WORKLOAD y
+        OPERATIONAL_BATCH_SIZE, con el formato de la traza ({'op': ..., campos}).
+        None si no hay semillas para el tráfico operacional.
+        """
+        if self.traffic_type == 'analytical':
+            return self.next_analytical_request()
         if not self.seeds:
-            return
-        target = random.choice(self.seeds)
-        uuid = target[0]
-        source, _ = cache_manager.get_event(uuid)
-        if source and source.startswith("DB"):
-            cache_manager.save_to_cache(
-                uuid, {"uuid": uuid, "info": "Simulated"})
+            return None
+        if self.batch_size > 1:
+            return {"op": "get_events",
+                    "keys": [self.next_seed()[0] for _ in range(self.batch_size)]}
+        return {"op": "get_event", "key": self.next_seed()[0]}
+
+    def next_analytical_request(self):
+        """Reporte completo o, según ANALYTICAL_WORKLOAD, una consulta estructurada."""
+        if self.analytical_workload == 'structured' or (
+                self.analytical_workload == 'mixed' and self.rng.random() < 0.5):
+            return self.next_structured_request()
 
-    def simulate_analytical_query(self):
-        """Simula una consulta analítica a la caché o base de datos."""
         reports = ['by_comuna', 'by_type', 'temporal']
-        report = random.choice(reports)
+        return {"op": "analytics", "report": self.rng.choice(reports)}
+
+    def next_structured_request(self):
+        """
+        Consulta analítica filtrada: top-N por tipo o comuna, desglose de
+        una comuna o rango de fechas del reporte temporal.
+        """
+        query = self.rng.choice(['top_type', 'top_comuna', 'comuna', 'date_range'])
+        if query == 'comuna' and not self.analytics_comunas:
+            query = 'top_comuna'
+
+        if query.startswith('top_'):
+            params = (self.top_n,)
+        elif query == 'comuna':
+            params = (self.rng.choice(self.analytics_comunas),)
+        else:
+            start = self.analytics_last_date - timedelta(days=self.range_days - 1)
+            params = (start.isoformat(), self.analytics_last_date.isoformat())
+
+        return {"op": "analytics_query", "query": query, "params": list(params),
+                "key": ":".join(["analytics_query", query] + [str(p) for p in params])}
+
+    def simulate_request(self):
+        """Sortea, graba en la traza y ejecuta una solicitud; devuelve cuántas consultas hizo."""
+        request = self.next_request()
+        if request is None:
+            return 0
+        self.trace_request(**request)
+        return len(self.execute(request))
+
+    def execute(self, request, log=True):
+        """
+        Ejecuta una solicitud con el formato de la traza contra la fuente
+        configurada. Devuelve sus registros [(op, llave, source, latency_ms)],
+        uno por consulta; con log=True los agrega al log por solicitud.
+        """
+        op = request["op"]
+        if op == "get_event":
+            records = self.query_event(request["key"])
+        elif op == "get_events":
+            records = self.query_events(request["keys"])
+        elif op == "analytics":
+            records = self.query_report(request["report"])
+        else:
+            records = self.query_slice(request["query"], tuple(request["params"]))
+        if log:
+            for record in records:
+                self.log_request(*record)
+        return records
+
+    def query_event(self, uuid):
+        """Consulta un evento por la ruta configurada (read-through o get_event)."""
+        if self.read_through:
+            _, source, elapsed = cache_manager.get_or_load(uuid)
+            return [("get_event", uuid, source, elapsed)]
+        source, elapsed = cache_manager.get_event(uuid, loader=_simulated_events)
+        if source and source.startswith("DB"):
+            cache_manager.save_to_cache(uuid, _simulated_events([uuid])[uuid])
+        return [("get_event", uuid, source, elapsed)]
 
-        if self.data_source == 'postgres':
-            elapsed = pg_manager.calculate_analytics_on_the_fly(report)
-            self.total_latency += elapsed
+    def query_events(self, uuids):
+        """Resuelve un lote de uuids con un MGET y carga los faltantes."""
+        results = cache_manager.get_events(
+            uuids, loader=None if self.read_through else _simulated_events)
+        # Un uuid repetido en el lote cuenta como un miss por solicitud
+        missed = [uuid for uuid, source, _ in results if source.startswith("DB")]
+        if self.read_through:
+            cache_manager.load_many(missed)
+        else:
+            cache_manager.save_many(_simulated_events(missed))
+        return [("get_events", uuid, source, elapsed) for uuid, source, elapsed in results]
+
+    def query_report(self, report):
+        """Obtiene un reporte completo desde la fuente configurada."""
+        if self.data_source in ('postgres', 'postgres_rollup'):
+            elapsed = pg_manager.calculate_analytics_on_the_fly(
+                report, use_rollup=self.data_source == 'postgres_rollup')
+            if elapsed is None:
+                return [("analytics", report, "error", 0.0)]
+            cache_manager.latency.record("pg_analytics", elapsed)
         else:
             _, elapsed = cache_manager.get_analytics(report)
-            self.total_latency += elapsed
+        self.total_latency += elapsed
+        return [("analytics", report, self.data_source, elapsed)]
+
+    def query_slice(self, query, params):
+        """Ejecuta una consulta analítica filtrada en la fuente configurada."""
+        if self.data_source in ('postgres', 'postgres_rollup'):
+            elapsed = pg_manager.calculate_slice_on_the_fly(
+                query, params, use_rollup=self.data_source == 'postgres_rollup')
+            if elapsed is None:
+                return [("analytics_query", query, "error", 0.0)]
+            cache_manager.latency.record("pg_analytics", elapsed)
+        else:
+            if query.startswith('top_'):
+                result, elapsed = cache_manager.get_top_n(query[len('top_'):], *params)
+            elif query == 'comuna':
+                result, elapsed = cache_manager.get_comuna_analytics(*params)
+            else:
+                result, elapsed = cache_manager.get_analytics_range(*params)
+            if result is None:
+                # Llaves ax:* desalojadas: se responde con el reporte JSON completo
+                report, fallback = cache_manager.get_analytics(_SLICE_REPORTS[query])
+                elapsed += fallback
+                if report is None:
+                    fallback = pg_manager.calculate_slice_on_the_fly(query, params)
+                    if fallback is None:
+                        return [("analytics_query", query, "error", elapsed)]
+                    elapsed += fallback
+        self.total_latency += elapsed
+        return [("analytics_query", query, self.data_source, elapsed)]
 
     def start_mixed_traffic(self, duration_hours):
         """Inicia la simulación de tráfico mixto con ráfagas y pausas."""
         print(
             f"--- INICIANDO EXPERIMENTO DE {duration_hours} HORAS ({self.exp_name}) ---")
+        if self.traffic_type != 'analytical':
+            self.warm_up()
+
         start_time = time.time()
         end_time = start_time + (duration_hours * 3600)
 
         try:
             while time.time() < end_time:
-                mode = random.choice(['normal', 'normal', 'normal', 'burst'])
+                mode = self.rng.choice(['normal', 'normal', 'normal', 'burst'])
                 iterations = 20 if mode == 'normal' else 50
-                sleep_time = random.expovariate(
+                sleep_time = self.rng.expovariate(
                     5.0) if mode == 'normal' else 0.01
 
                 for _ in range(iterations):
-                    if self.traffic_type == 'analytical':
-                        self.simulate_analytical_query()
-                    else:
-                        self.simulate_operational_query()
-
-                    self.query_count += 1
+                    self.query_count += self.simulate_request()
                     time.sleep(sleep_time)
 
-                if self.query_count % 100 == 0:
+                if self.query_count // 100 > self.last_logged_count // 100:
+                    self.last_logged_count = self.query_count
                     self.log_metrics(start_time)
                     print(f"Log registrado. Consultas: {self.query_count}")
 
         except KeyboardInterrupt:
             print("\nExperimento detenido.")
 
+        self.finish_run()
+
+    def replay_trace(self, path, speed):
+        """
+        Reemite una traza grabada con WORKLOAD_TRACE_RECORD contra la fuente
+        configurada (DATA_SOURCE), respetando los intervalos entre llegadas
+        divididos por 'speed' (0 = sin pausas).
+        """
+        meta, requests = read_trace(path)
+        print(f"--- REPRODUCIENDO {path} ({'máxima velocidad' if speed <= 0 else f'{speed:g}x'}, "
+              f"{self.exp_name}) sha1={trace_digest(path)[:12]} ---")
+        if meta.get("data_source") and meta["data_source"] != self.data_source:
+            print(f"Traza grabada contra {meta['data_source']}; se reproduce contra {self.data_source}")
+        if self.traffic_type != 'analytical':
+            self.warm_up()
+
+        start_time = time.time()
+        try:
+            for request in requests:
+                if speed > 0:
+                    delay = request["t"] / speed - (time.time() - start_time)
+                    if delay > 0:
+                        time.sleep(delay)
+                self.query_count += len(self.execute(request))
+
+                if self.query_count // 100 > self.last_logged_count // 100:
+                    self.last_logged_count = self.query_count
+                    self.log_metrics(start_time)
+                    print(f"Log registrado. Consultas: {self.query_count}")
+        except KeyboardInterrupt:
+            print("\nReproducción detenida.")
+
+        self.log_metrics(start_time)
+        self.finish_run()
+
+    def finish_run(self):
+        """Exporta histogramas, popularidad y cierra los logs de la corrida."""
+        # Acumulados por operación, combinables con los de otros procesos (es_loader)
+        cache_manager.latency.dump(self.latency_file)
+        print(f"Histogramas de latencia exportados a: {self.latency_file}")
+        cache_manager.save_popularity()
+        if self.request_log is not None:
+            self.request_log.close()
+            print(f"Log por solicitud en: {self.request_log.path}")
+        if self.trace is not None:
+            self.trace.close()
+            print(f"Traza de carga grabada en: {self.trace.path}")
+
 
 if __name__ == "__main__":
     gen = TrafficGenerator()
-    if gen.seeds or gen.traffic_type == 'analytical':
+    # LOAD_MODE=replay: reemite WORKLOAD_TRACE a REPLAY_SPEED (ver workload_trace)
+    if os.getenv('LOAD_MODE', 'closed') == 'replay':
+        from traffic_generator.workload_trace import WORKLOAD_TRACE, REPLAY_SPEED
+        if not WORKLOAD_TRACE:
+            print("LOAD_MODE=replay requiere WORKLOAD_TRACE=<ruta de la traza>")
+        else:
+            gen.replay_trace(WORKLOAD_TRACE, REPLAY_SPEED)
+    elif gen.seeds or gen.traffic_type == 'analytical':
         duration = float(os.getenv('EXPERIMENT_DURATION', '1.0'))
-        gen.start_mixed_traffic(duration_hours=duration)
+        # LOAD_MODE=open: llegadas a tasa fija con workers asyncio (ver open_loop)
+        if os.getenv('LOAD_MODE', 'closed') == 'open':
+            from traffic_generator.open_loop import run_open_loop
+            if gen.traffic_type != 'analytical':
+                gen.warm_up()
+            try:
+                run_open_loop(gen, duration_hours=duration)
+            finally:
+                gen.finish_run()
+        else:
+            gen.start_mixed_traffic(duration_hours=duration)
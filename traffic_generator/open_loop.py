@@ -0,0 +1,242 @@
+import os
+import csv
+import time
+import random
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from cache_service.latency import LatencyRecorder
+
+# --------------------------------------------------------------------------
+# Configuración del Generador de Carga en Lazo Abierto
+# --------------------------------------------------------------------------
+# Las solicitudes se programan a una tasa objetivo sin esperar a que
+# terminen las anteriores, y la latencia se mide desde el instante en que
+# cada una *debía* enviarse: si el sistema se satura, la cola crece y esa
+# espera aparece en los percentiles (sin omisión coordinada).
+
+OPEN_LOOP_RATES = [float(r) for r in os.getenv('OPEN_LOOP_RATES', '200').split(',')]
+OPEN_LOOP_WORKERS = int(os.getenv('OPEN_LOOP_WORKERS', '32'))
+OPEN_LOOP_ARRIVALS = os.getenv('OPEN_LOOP_ARRIVALS', 'poisson')
+OPEN_LOOP_REPORT_SECONDS = float(os.getenv('OPEN_LOOP_REPORT_SECONDS', '5'))
+# Tiempo máximo para vaciar la cola al terminar cada tasa
+OPEN_LOOP_DRAIN_SECONDS = float(os.getenv('OPEN_LOOP_DRAIN_SECONDS', '30'))
+
+CSV_HEADER = ["timestamp", "row_type", "target_rps", "seconds_elapsed", "achieved_rps",
+              "queue_depth", "completed", "errors", "p50_ms", "p90_ms", "p99_ms",
+              "p999_ms", "max_ms", "service_p50_ms", "service_p99_ms", "timeouts"]
+
+# --------------------------------------------------------------------------
+# Ejecutor en Lazo Abierto (asyncio)
+# --------------------------------------------------------------------------
+
+
+class OpenLoopRunner:
+    """
+    Reproduce la carga del TrafficGenerator (mismas semillas, tipo de
+    tráfico, ANALYTICAL_WORKLOAD y fuente de datos) con N workers asyncio.
+    Cada solicitud se sortea con el generador y se ejecuta con
+    TrafficGenerator.execute en un pool de hilos del mismo tamaño, así pasa
+    por CacheMiddleware igual que en lazo cerrado (L1, caché negativa,
+    jitter, SWR/XFetch, single-flight y estadísticas).
+    """
+    def __init__(self, generator, workers=OPEN_LOOP_WORKERS, arrivals=OPEN_LOOP_ARRIVALS):
+        self.gen = generator
+        self.workers = workers
+        self.arrivals = arrivals
+        # Llegadas con su propio rng (derivado de RANDOM_SEED) para no
+        # alterar la secuencia de solicitudes que sortea el generador
+        self.rng = random.Random(None if generator.random_seed is None
+                                 else f"{generator.random_seed}:arrivals")
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="open-loop")
+        self.latency = None
+        self.completed = 0
+        self.errors = 0
+        self.timeouts = 0
+        # worker -> (instante previsto, solicitud) de lo que está atendiendo
+        self._in_flight = {}
+
+    async def _request(self, request):
+        """Ejecuta la solicitud en el pool de hilos y devuelve sus registros."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.gen.execute, request, False)
+
+    async def _worker(self, queue, worker_id):
+        loop = asyncio.get_running_loop()
+        while True:
+            intended = await queue.get()
+            self._in_flight[worker_id] = (intended, None)
+            try:
+                started = loop.time()
+                # Se sortea al atenderla: el rng del generador solo se usa en este hilo
+                request = self.gen.next_request()
+                self._in_flight[worker_id] = (intended, request)
+                if request:
+                    # Con el instante previsto, para que la reproducción respete las llegadas
+                    self.gen.trace_request(timestamp=self._wall(intended), **request)
+                op = request["op"] if request else "idle"
+                records = []
+                try:
+                    if request:
+                        records = await self._request(request)
+                        if any(source == "error" for _, _, source, _ in records):
+                            raise RuntimeError(f"{op} falló")
+                except Exception:
+                    self.errors += 1
+                    records = [(op, key, "error", None) for key in request_keys(request)]
+                    op = "error"
+                done = loop.time()
+                self.latency.record(op, (done - intended) * 1000)
+                self.latency.record("response", (done - intended) * 1000)
+                self.latency.record("service", (done - started) * 1000)
+                self.completed += 1
+                del self._in_flight[worker_id]
+                self._log(records, intended, done)
+            finally:
+                queue.task_done()
+
+    @staticmethod
+    def _wall(loop_time):
+        """Instante del reloj del event loop expresado en epoch."""
+        return time.time() - (asyncio.get_running_loop().time() - loop_time)
+
+    def _log(self, records, intended, done):
+        """
+        Agrega los registros al log por solicitud con el instante de envío
+        previsto y la latencia hasta completarse (no solo la de servicio).
+        """
+        sent_at = self._wall(intended)
+        latency_ms = (done - intended) * 1000
+        for op, key, source, _ in records:
+            self.gen.log_request(op, key, source, latency_ms, timestamp=sent_at)
+
+    def _abandon(self, queue):
+        """
+        Registra como 'timeout' las solicitudes que quedaron en cola o en
+        curso al agotarse OPEN_LOOP_DRAIN_SECONDS, con la latencia desde su
+        instante previsto hasta ahora (si no, la saturación las ocultaría).
+        """
+        now = asyncio.get_running_loop().time()
+        abandoned = list(self._in_flight.values())
+        self._in_flight.clear()
+        while not queue.empty():
+            abandoned.append((queue.get_nowait(), None))
+            queue.task_done()
+        for intended, request in abandoned:
+            self.latency.record("timeout", (now - intended) * 1000)
+            self.latency.record("response", (now - intended) * 1000)
+            op = request["op"] if request else "timeout"
+            self._log([(op, key, "timeout", None) for key in request_keys(request) or [""]],
+                      intended, now)
+        self.timeouts += len(abandoned)
+        self.errors += len(abandoned)
+
+    async def _schedule(self, queue, rate, duration):
+        """Encola los instantes de envío previstos (Poisson o uniformes) a 'rate' por segundo."""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        intended = start
+        while intended < start + duration:
+            delay = intended - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            queue.put_nowait(intended)
+            intended += self.rng.expovariate(rate) if self.arrivals == 'poisson' else 1 / rate
+
+    def _row(self, row_type, rate, elapsed, window_seconds, completed, queue, window):
+        response = window.get("response")
+        service = window.get("service")
+        tail = response.summary() if response else {}
+        service_tail = service.summary() if service else {}
+        return [time.strftime("%H:%M:%S"), row_type, rate, round(elapsed, 2),
+                round(completed / window_seconds, 1) if window_seconds > 0 else 0,
+                queue.qsize(), completed, self.errors] + [
+                round(tail.get(column, 0), 3)
+                for column in ("p50_ms", "p90_ms", "p99_ms", "p999_ms", "max_ms")] + [
+                round(service_tail.get("p50_ms", 0), 3), round(service_tail.get("p99_ms", 0), 3),
+                self.timeouts]
+
+    async def _report(self, queue, rate, writer, f):
+        step_start = time.time()
+        last_completed = 0
+        while True:
+            await asyncio.sleep(OPEN_LOOP_REPORT_SECONDS)
+            window, seconds = self.latency.roll_window()
+            completed = self.completed - last_completed
+            last_completed = self.completed
+            row = self._row("window", rate, time.time() - step_start, seconds, completed, queue, window)
+            writer.writerow(row)
+            f.flush()
+            print(f"[{rate:.0f} rps] logrado {row[4]} rps | cola {row[5]} | "
+                  f"p50 {row[8]} ms | p99 {row[10]} ms")
+
+    async def run_step(self, rate, duration, writer, f):
+        """Sostiene 'rate' solicitudes/s durante 'duration' segundos y resume el paso."""
+        self.latency = LatencyRecorder()
+        self.completed = 0
+        self.errors = 0
+        self.timeouts = 0
+        self._in_flight = {}
+        queue = asyncio.Queue()
+        workers = [asyncio.create_task(self._worker(queue, i)) for i in range(self.workers)]
+        reporter = asyncio.create_task(self._report(queue, rate, writer, f))
+
+        start = time.time()
+        await self._schedule(queue, rate, duration)
+        try:
+            await asyncio.wait_for(queue.join(), OPEN_LOOP_DRAIN_SECONDS)
+        except asyncio.TimeoutError:
+            print(f"[{rate:.0f} rps] la cola no se vació en {OPEN_LOOP_DRAIN_SECONDS}s "
+                  f"({queue.qsize()} pendientes): tasa por sobre la saturación")
+        elapsed = time.time() - start
+
+        for task in workers + [reporter]:
+            task.cancel()
+        await asyncio.gather(*workers, reporter, return_exceptions=True)
+        self._abandon(queue)
+
+        totals = {op: self.latency.merged([op]) for op in ("response", "service")}
+        row = self._row("step", rate, elapsed, elapsed, self.completed, queue, totals)
+        writer.writerow(row)
+        f.flush()
+        return row
+
+    async def run(self, duration_seconds, rates=None):
+        rates = rates or OPEN_LOOP_RATES
+        step_seconds = duration_seconds / len(rates)
+        csv_file = f"results/{self.gen.exp_name}_open_loop.csv"
+        os.makedirs("results", exist_ok=True)
+
+        print(f"--- LAZO ABIERTO: {len(rates)} tasas x {step_seconds:.0f}s, "
+              f"{self.workers} workers ({self.gen.exp_name}) ---")
+        summary = []
+        try:
+            with open(csv_file, mode='w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(CSV_HEADER)
+                for rate in rates:
+                    summary.append(await self.run_step(rate, step_seconds, writer, f))
+        finally:
+            self.executor.shutdown(wait=False)
+
+        print("Tasa objetivo -> lograda | p99 | p999 (ms)")
+        for row in summary:
+            print(f"{row[2]:>8.0f} -> {row[4]:>8} | {row[10]:>8} | {row[11]:>8}")
+        print(f"Resultados exportados a: {csv_file}")
+
+
+def request_keys(request):
+    """Llaves de una solicitud con el formato de la traza (las del log por solicitud)."""
+    if request is None:
+        return []
+    if request["op"] == "get_events":
+        return request["keys"]
+    return [request.get("key", request.get("report", ""))]
+
+
+def run_open_loop(generator, duration_hours):
+    """Punto de entrada desde traffic_generator.generator (LOAD_MODE=open)."""
+    runner = OpenLoopRunner(generator)
+    try:
+        asyncio.run(runner.run(duration_hours * 3600))
+    except KeyboardInterrupt:
+        print("\nExperimento detenido.")
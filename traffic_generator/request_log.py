@@ -0,0 +1,183 @@
+import os
+import sys
+import csv
+import struct
+import threading
+from cache_service.latency import LatencyHistogram
+
+# --------------------------------------------------------------------------
+# Formato del Log de Solicitudes
+# --------------------------------------------------------------------------
+# Archivo binario de solo-agregado con registros de tamaño fijo (24 bytes):
+#
+#   timestamp  float64  segundos epoch del fin de la solicitud (en el lazo
+#                       abierto, el envío previsto; ver open_loop)
+#   latency    float32  ms
+#   key_id     uint32   llave (uuid, reporte o consulta) internada
+#   op_id      uint32   operación internada
+#   source_id  uint32   fuente (L1, CACHE, DB, postgres, ...) internada
+#
+# Los textos se internan en un archivo hermano '.names' (uno por línea, el id
+# es el número de línea), así cada solicitud cuesta un struct.pack y una
+# escritura a un buffer. Llaves, operaciones y fuentes comparten la tabla de
+# ids, por eso los tres campos son uint32.
+
+REQUEST_LOG = os.getenv('REQUEST_LOG', '1') == '1'
+REQUEST_LOG_WINDOW_SECONDS = float(os.getenv('REQUEST_LOG_WINDOW_SECONDS', '60'))
+REQUEST_LOG_BUFFER_BYTES = 1 << 16
+
+MAGIC = b"WZRL\x02\x00\x00\x00"
+RECORD = struct.Struct("<dfIII")
+# Registros leídos por bloque: la memoria del lector no depende del largo del log
+READ_CHUNK_RECORDS = 65536
+
+
+def names_path(path):
+    return f"{path}.names"
+
+# --------------------------------------------------------------------------
+# Escritura
+# --------------------------------------------------------------------------
+
+
+class RequestLog:
+    """
+    Escritor del log por solicitud. Si el archivo ya existe se agrega al
+    final conservando los ids internados, de modo que una corrida repetida
+    con el mismo EXPERIMENT_NAME continúa el mismo log.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ids = {}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        if os.path.exists(names_path(path)):
+            with open(names_path(path), 'r', encoding='utf-8') as f:
+                for line in f:
+                    self._ids[line.rstrip('\n')] = len(self._ids)
+
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not is_new:
+            with open(path, 'rb') as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f"{path} tiene otro formato de log; use otro EXPERIMENT_NAME")
+        self._file = open(path, 'ab', buffering=REQUEST_LOG_BUFFER_BYTES)
+        if is_new:
+            self._file.write(MAGIC)
+        self._names = open(names_path(path), 'a', encoding='utf-8')
+
+    def _intern(self, name):
+        name_id = self._ids.get(name)
+        if name_id is None:
+            name_id = len(self._ids)
+            self._ids[name] = name_id
+            # Se escribe de inmediato: el lector necesita el nombre antes que el registro
+            self._names.write(f"{name}\n")
+            self._names.flush()
+        return name_id
+
+    def record(self, timestamp, op, key, source, latency_ms):
+        with self._lock:
+            self._file.write(RECORD.pack(
+                timestamp, latency_ms, self._intern(str(key)),
+                self._intern(op), self._intern(str(source))))
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+            self._names.close()
+
+# --------------------------------------------------------------------------
+# Lectura por Ventanas
+# --------------------------------------------------------------------------
+
+
+def load_names(path):
+    with open(names_path(path), 'r', encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in f]
+
+
+def iter_records(path):
+    """Recorre el log por bloques entregando (timestamp, latency_ms, key_id, op_id, source_id)."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} no es un log de solicitudes")
+        chunk_bytes = RECORD.size * READ_CHUNK_RECORDS
+        while True:
+            data = f.read(chunk_bytes)
+            if not data:
+                break
+            # Un registro truncado al final (escritura interrumpida) se descarta
+            usable = len(data) - len(data) % RECORD.size
+            yield from RECORD.iter_unpack(data[:usable])
+
+
+def iter_windows(path, window_seconds=REQUEST_LOG_WINDOW_SECONDS, ops=None, sources=None):
+    """
+    Recorre el log y entrega un resumen por ventana de 'window_seconds':
+    inicio relativo, solicitudes, throughput y percentiles de latencia.
+    Los registros no vienen ordenados por timestamp (el lazo abierto los
+    escribe al completarse), así que se mantiene un histograma por ventana
+    y se entregan en orden al final.
+    """
+    names = load_names(path)
+    op_ids = None if ops is None else {i for i, name in enumerate(names) if name in ops}
+    source_ids = None if sources is None else {
+        i for i, name in enumerate(names) if name in sources}
+
+    hists = {}
+    for timestamp, latency_ms, _, op_id, source_id in iter_records(path):
+        if op_ids is not None and op_id not in op_ids:
+            continue
+        if source_ids is not None and source_id not in source_ids:
+            continue
+        window = int(timestamp // window_seconds)
+        hist = hists.get(window)
+        if hist is None:
+            hist = hists[window] = LatencyHistogram()
+        hist.record(latency_ms)
+    if not hists:
+        return
+    first = min(hists)
+    for window in sorted(hists):
+        yield _window_summary(window - first, window_seconds, hists[window])
+
+
+def _window_summary(window, window_seconds, hist):
+    summary = hist.summary()
+    return {"window_start_s": window * window_seconds, "requests": summary["count"],
+            "throughput_rps": summary["count"] / window_seconds,
+            **{column: summary[column] for column in
+               ("mean_ms", "p50_ms", "p90_ms", "p99_ms", "p999_ms", "max_ms")}}
+
+
+def write_windows_csv(path, output, window_seconds=REQUEST_LOG_WINDOW_SECONDS, ops=None):
+    """Exporta iter_windows a CSV y devuelve la cantidad de ventanas."""
+    count = 0
+    with open(output, mode='w', newline='') as f:
+        writer = None
+        for row in iter_windows(path, window_seconds, ops):
+            if writer is None:
+                writer = csv.DictWriter(f, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow({k: round(v, 3) if isinstance(v, float) else v
+                             for k, v in row.items()})
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python -m traffic_generator.request_log <log.bin> [segundos_ventana] [op,...]")
+        sys.exit(1)
+    log_path = sys.argv[1]
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else REQUEST_LOG_WINDOW_SECONDS
+    selected = set(sys.argv[3].split(',')) if len(sys.argv) > 3 else None
+    output_csv = log_path.rsplit('.', 1)[0] + "_windows.csv"
+    windows = write_windows_csv(log_path, output_csv, seconds, selected)
+    print(f"{windows} ventanas de {seconds:.0f}s exportadas a: {output_csv}")
@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import time
+import hashlib
+from cache_service.latency import LatencyRecorder
+
+# --------------------------------------------------------------------------
+# Configuración de la Traza de Carga
+# --------------------------------------------------------------------------
+# Una solicitud por línea JSON, con el mismo formato que lee
+# cache_service.policy_simulator ('key', 'keys' o 'report'):
+#
+#   {"op": "meta", "traffic_type": ..., "data_source": ..., "random_seed": ...}
+#   {"t": 0.0,   "op": "get_event",       "key": "<uuid>"}
+#   {"t": 0.21,  "op": "get_events",      "keys": ["<uuid>", ...]}
+#   {"t": 0.43,  "op": "analytics",       "report": "by_type"}
+#   {"t": 0.65,  "op": "analytics_query", "query": "comuna", "params": ["Maipú"],
+#                "key": "analytics_query:comuna:Maipú"}
+#
+# 't' son los segundos desde la primera solicitud: al reproducir se respetan
+# los intervalos entre llegadas (divididos por REPLAY_SPEED).
+
+WORKLOAD_TRACE_RECORD = os.getenv('WORKLOAD_TRACE_RECORD')
+WORKLOAD_TRACE = os.getenv('WORKLOAD_TRACE')
+# 1 = tiempo real, N = N veces más rápido, 0 = sin pausas (máxima velocidad)
+REPLAY_SPEED = float(os.getenv('REPLAY_SPEED', '1'))
+
+# --------------------------------------------------------------------------
+# Grabación
+# --------------------------------------------------------------------------
+
+
+class WorkloadTraceWriter:
+    """Agrega las solicitudes de una corrida a una traza JSON por línea."""
+    def __init__(self, path, **meta):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._file = open(path, 'w', encoding='utf-8')
+        self._start = None
+        self._file.write(json.dumps({"op": "meta", **meta}) + "\n")
+
+    def record(self, op, timestamp=None, **fields):
+        """Agrega una solicitud; 'timestamp' (epoch) reemplaza al instante actual."""
+        now = time.time() if timestamp is None else timestamp
+        if self._start is None:
+            self._start = now
+        self._file.write(json.dumps({"t": round(now - self._start, 6), "op": op, **fields},
+                                    ensure_ascii=False) + "\n")
+
+    def close(self):
+        self._file.close()
+
+# --------------------------------------------------------------------------
+# Lectura
+# --------------------------------------------------------------------------
+
+
+def read_trace(path):
+    """(meta, iterador de solicitudes) de una traza grabada."""
+    f = open(path, 'r', encoding='utf-8')
+    first = f.readline()
+    meta = json.loads(first) if first.strip() else {}
+    if meta.get("op") != "meta":
+        f.seek(0)
+        meta = {}
+
+    def requests():
+        with f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    return meta, requests()
+
+
+def trace_digest(path):
+    """SHA-1 de la traza, para confirmar que dos corridas usaron la misma entrada."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# --------------------------------------------------------------------------
+# Comparación de Corridas
+# --------------------------------------------------------------------------
+
+
+def compare_latency(baseline_path, candidate_path):
+    """
+    Compara los histogramas exportados por dos corridas (results/*_latency.json)
+    y devuelve {op: {percentil: (base, candidata, variación %)}}.
+    """
+    summaries = []
+    for path in (baseline_path, candidate_path):
+        recorder = LatencyRecorder()
+        with open(path, 'r', encoding='utf-8') as f:
+            recorder.merge_dict(json.load(f))
+        summary = recorder.snapshot()
+        # Entre fuentes distintas (get_analytics vs pg_analytics) solo coincide el total
+        summary["(total)"] = recorder.merged().summary()
+        summaries.append(summary)
+
+    baseline, candidate = summaries
+    comparison = {}
+    for op in sorted(set(baseline) & set(candidate)):
+        comparison[op] = {}
+        for column in ("p50_ms", "p90_ms", "p99_ms", "p999_ms", "max_ms"):
+            before, after = baseline[op][column], candidate[op][column]
+            change = (after - before) / before * 100 if before else 0.0
+            comparison[op][column] = (before, after, change)
+    return comparison
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Uso: python -m traffic_generator.workload_trace <base_latency.json> <candidata_latency.json>")
+        sys.exit(1)
+    for op, columns in compare_latency(sys.argv[1], sys.argv[2]).items():
+        print(f"{op}:")
+        for column, (before, after, change) in columns.items():
+            print(f"  {column:8} {before:10.3f} -> {after:10.3f} ms ({change:+.1f}%)")